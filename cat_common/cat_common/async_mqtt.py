@@ -0,0 +1,107 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+from cat_common.mqtt_messages import DELIVERY_ALL, MQTTClient
+
+# handler(topic, payload, hora de recepción en time.time())
+Handler = Callable[[str, bytes, float], Awaitable[None]]
+
+
+@dataclass
+class TopicHandler:
+    callback: Handler
+    concurrency: Optional[int] = None
+    active: int = 0
+
+
+class AsyncMQTTClient(MQTTClient):
+    """Variante de MQTTClient que entrega los mensajes dentro del event loop de asyncio.
+
+    El hilo de paho guarda cada mensaje en el buzón de su topic y, solo cuando el buzón estaba
+    vacío, agenda un aviso en el loop con ``call_soon_threadsafe``. El loop despacha los
+    mensajes al handler registrado para el topic respetando su límite de concurrencia; mientras
+    el handler está ocupado los mensajes esperan en el buzón, donde se aplica su modo de
+    entrega. Los mensajes de topics sin handler se pueden esperar con ``receive``.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop = None,
+        topics=(),
+        transport=None,
+        share_group: str = None,
+    ):
+        self.loop = loop or asyncio.get_event_loop()
+        self.handlers = {}
+        self.inbox = asyncio.Queue()
+        self._tasks = set()
+        super().__init__(topics=topics, transport=transport, share_group=share_group)
+
+    def register_handler(
+        self,
+        topic: str,
+        callback: Handler,
+        concurrency: int = None,
+        mode: str = DELIVERY_ALL,
+        maxlen: int = None,
+    ):
+        """Registra un handler asíncrono para el topic y se suscribe a él.
+
+        ``concurrency`` limita cuántas invocaciones del handler pueden correr a la vez;
+        ``None`` no impone límite. ``mode`` y ``maxlen`` definen qué mensajes se conservan
+        mientras el handler está ocupado (ver ``MQTTClient.subscribe``).
+        """
+        self.handlers[topic] = TopicHandler(callback, concurrency)
+        self.subscribe(topic, mode, maxlen)
+
+    def notify_ready(self, topic):
+        """Se ejecuta en el hilo de paho: solo agenda el aviso en el event loop."""
+        try:
+            self.loop.call_soon_threadsafe(self._dispatch, topic)
+        except RuntimeError:
+            # El loop ya se cerró (apagado del servicio)
+            pass
+
+    def _dispatch(self, topic):
+        handler = self.handlers.get(topic)
+        if handler is None:
+            self.inbox.put_nowait(topic)
+            return
+
+        mailbox = self.mailboxes[topic]
+        while handler.concurrency is None or handler.active < handler.concurrency:
+            try:
+                payload, received_time, _ = mailbox.get()
+            except IndexError:
+                return
+            handler.active += 1
+            task = self.loop.create_task(
+                self._run_handler(handler, topic, payload, received_time)
+            )
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_handler(self, handler: TopicHandler, topic, payload, received_time):
+        try:
+            await handler.callback(topic, payload, received_time)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            print(f"Error procesando el mensaje de {topic}: {exc}")
+        finally:
+            handler.active -= 1
+            # Tomar lo que se haya acumulado en el buzón mientras el handler estaba ocupado
+            self._dispatch(topic)
+
+    async def receive(self):
+        """Espera el siguiente mensaje de un topic sin handler; regresa (topic, payload)."""
+        while True:
+            topic = await self.inbox.get()
+            try:
+                payload, _, remaining = self.mailboxes[topic].get()
+            except IndexError:
+                continue
+            if remaining:
+                self.inbox.put_nowait(topic)
+            return topic, payload
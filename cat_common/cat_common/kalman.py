@@ -0,0 +1,231 @@
+import bisect
+import dataclasses
+import math
+import os
+
+from cat_common.mqtt_messages import FaceDetection, FrameDetections
+
+CENTROID_FILTER_ENV = "GHOSTLYCAT_CENTROID_FILTER"
+FILTER_KALMAN = "kalman"
+FILTER_NONE = "none"
+
+
+class _AxisFilter:
+    """Kalman de velocidad constante en un eje: estado (posición, velocidad) y covarianza 2x2."""
+
+    def __init__(self, position: float, initial_velocity_var: float):
+        self.position = position
+        self.velocity = 0.0
+        self.p00 = 0.0  # var(posición); se inicializa en update con el ruido de medición
+        self.p01 = 0.0
+        self.p11 = initial_velocity_var
+
+    def predict(self, dt: float, accel_var: float):
+        self.position += self.velocity * dt
+        # P = F P F' + Q, con Q del modelo de aceleración blanca
+        dt2 = dt * dt
+        self.p00 += dt * (2 * self.p01 + dt * self.p11) + accel_var * dt2 * dt2 / 4
+        self.p01 += dt * self.p11 + accel_var * dt2 * dt / 2
+        self.p11 += accel_var * dt2
+
+    def innovation(self, measurement: float, measurement_var: float):
+        """Residuo al cuadrado entre su varianza (distancia de Mahalanobis² en este eje)."""
+        return (measurement - self.position) ** 2 / (self.p00 + measurement_var)
+
+    def update(self, measurement: float, measurement_var: float):
+        innovation_var = self.p00 + measurement_var
+        gain_position = self.p00 / innovation_var
+        gain_velocity = self.p01 / innovation_var
+        residual = measurement - self.position
+        self.position += gain_position * residual
+        self.velocity += gain_velocity * residual
+        self.p11 -= gain_velocity * self.p01
+        self.p01 -= gain_position * self.p01
+        self.p00 -= gain_position * self.p00
+
+
+class CentroidKalmanFilter:
+    """Filtro de velocidad constante para el centroide de una cara (pixeles y segundos).
+
+    ``measurement_std`` es el ruido del detector en pixeles y ``accel_std`` cuánto puede
+    cambiar la velocidad de la cara (pixeles/s²): valores bajos suavizan más pero reaccionan
+    más lento. Si pasa más de ``max_gap`` segundos sin mediciones el filtro se reinicia.
+
+    También se reinicia si la medición cae fuera de la compuerta: distancia de Mahalanobis²
+    a la predicción mayor que ``gate`` (13.8 = chi² con 2 grados de libertad al 99.9 %). Así,
+    cuando la cara visible pasa a ser la de otra persona, no se mezclan en un solo objetivo
+    con una velocidad enorme.
+    """
+
+    def __init__(
+        self,
+        measurement_std: float = 8.0,
+        accel_std: float = 1500.0,
+        initial_velocity_std: float = 500.0,
+        max_gap: float = 1.0,
+        gate: float = 13.8,
+    ):
+        self.measurement_var = measurement_std ** 2
+        self.accel_var = accel_std ** 2
+        self.initial_velocity_var = initial_velocity_std ** 2
+        self.max_gap = max_gap
+        self.gate = gate
+        self.x = None
+        self.y = None
+        self.timestamp = None
+
+    def reset(self, x: float, y: float, timestamp: float):
+        self.x = _AxisFilter(x, self.initial_velocity_var)
+        self.y = _AxisFilter(y, self.initial_velocity_var)
+        self.x.p00 = self.y.p00 = self.measurement_var
+        self.timestamp = timestamp
+
+    def update(self, x: float, y: float, timestamp: float):
+        """Incorpora una medición; regresa (x, y, velocidad_x, velocidad_y) filtrados."""
+        dt = None if self.timestamp is None else timestamp - self.timestamp
+        if dt is None or dt > self.max_gap or dt < 0:
+            self.reset(x, y, timestamp)
+            return self.x.position, self.y.position, self.x.velocity, self.y.velocity
+
+        measurements = ((self.x, x), (self.y, y))
+        for axis, _ in measurements:
+            axis.predict(dt, self.accel_var)
+        distance = sum(axis.innovation(m, self.measurement_var) for axis, m in measurements)
+        if distance > self.gate:
+            self.reset(x, y, timestamp)
+        else:
+            for axis, measurement in measurements:
+                axis.update(measurement, self.measurement_var)
+            self.timestamp = timestamp
+        return self.x.position, self.y.position, self.x.velocity, self.y.velocity
+
+    def predict(self, lead: float):
+        """Posición esperada ``lead`` segundos después de la última medición."""
+        return (
+            self.x.position + self.x.velocity * lead,
+            self.y.position + self.y.velocity * lead,
+        )
+
+
+class DetectionSmoother:
+    """Un CentroidKalmanFilter por track; reemplaza los centroides por los filtrados.
+
+    La caja (x1, y1, x2, y2) se conserva tal como la midió el detector, así que la medición
+    original sigue disponible en ``FaceDetection.box_center``. Las caras sin track (id 0)
+    solo se filtran cuando son la única del frame; si la cara cambia de una persona a otra,
+    la compuerta del filtro lo reinicia en lugar de mezclarlas.
+    """
+
+    def __init__(self, max_age: float = 1.0, **filter_kwargs):
+        self.max_age = max_age
+        self.filter_kwargs = filter_kwargs
+        self.filters = {}
+
+    def _filter_for(self, key):
+        kalman = self.filters.get(key)
+        if kalman is None:
+            kalman = self.filters[key] = CentroidKalmanFilter(**self.filter_kwargs)
+        return kalman
+
+    def smooth(self, detection: FaceDetection, timestamp: float):
+        key = detection.track_id
+        x, y, velocity_x, velocity_y = self._filter_for(key).update(
+            *detection.box_center, timestamp
+        )
+        return dataclasses.replace(
+            detection,
+            centroid_x=int(round(x)),
+            centroid_y=int(round(y)),
+            velocity_x=velocity_x,
+            velocity_y=velocity_y,
+        )
+
+    def apply(self, frame: FrameDetections) -> FrameDetections:
+        timestamp = frame.capture_time
+        tracked = all(detection.track_id for detection in frame.detections)
+        if not frame.detections or (not tracked and len(frame.detections) > 1):
+            return frame
+
+        detections = tuple(self.smooth(detection, timestamp) for detection in frame.detections)
+        # Olvidar los tracks que ya no aparecen
+        for key in [
+            key
+            for key, kalman in self.filters.items()
+            if kalman.timestamp is not None and timestamp - kalman.timestamp > self.max_age
+        ]:
+            del self.filters[key]
+        return dataclasses.replace(frame, detections=detections)
+
+
+def smoother_from_env():
+    """GHOSTLYCAT_CENTROID_FILTER: "kalman" para filtrar los centroides, "none" (por defecto) no."""
+    if os.environ.get(CENTROID_FILTER_ENV, FILTER_NONE) == FILTER_KALMAN:
+        return DetectionSmoother()
+    return None
+
+
+def predict_detection(detection: FaceDetection, lead: float, frame_width: int, frame_height: int):
+    """Centroide adelantado ``lead`` segundos con la velocidad publicada, dentro del frame."""
+    x = detection.centroid_x + detection.velocity_x * lead
+    y = detection.centroid_y + detection.velocity_y * lead
+    return (
+        min(max(x, 0), frame_width),
+        min(max(y, 0), frame_height),
+    )
+
+
+def _interpolate(samples, timestamps, timestamp):
+    """Posición medida en ``timestamp`` interpolando entre las mediciones vecinas."""
+    index = bisect.bisect_left(timestamps, timestamp)
+    if index >= len(samples):
+        return None
+    t1, x1, y1 = samples[index]
+    if index == 0 or t1 == timestamp:
+        return (x1, y1) if t1 == timestamp else None
+    t0, x0, y0 = samples[index - 1]
+    fraction = (timestamp - t0) / (t1 - t0) if t1 > t0 else 0.0
+    return x0 + (x1 - x0) * fraction, y0 + (y1 - y0) * fraction
+
+
+def evaluate_tracking(frames, lead: float, **filter_kwargs):
+    """Error de seguimiento sobre una sesión grabada, en pixeles (RMS).
+
+    La referencia es la propia medición del detector ``lead`` segundos después (interpolada
+    entre frames), con ``lead`` la latencia que se quiere compensar. Se compara:
+    - raw: usar la última medición sin filtrar (lo que hacía cat_control).
+    - filtered: el centroide filtrado, sin predicción.
+    - predicted: el centroide filtrado adelantado ``lead`` segundos con su velocidad.
+    """
+    tracks = {}
+    for frame in frames:
+        for detection in frame.detections:
+            if detection.track_id or len(frame.detections) == 1:
+                tracks.setdefault(detection.track_id, []).append(
+                    (frame.capture_time, *detection.box_center)
+                )
+
+    errors = {"raw": [], "filtered": [], "predicted": []}
+    for samples in tracks.values():
+        samples.sort()
+        timestamps = [sample[0] for sample in samples]
+        kalman = CentroidKalmanFilter(**filter_kwargs)
+        for timestamp, x, y in samples:
+            filtered_x, filtered_y, _, _ = kalman.update(x, y, timestamp)
+            truth = _interpolate(samples, timestamps, timestamp + lead)
+            if truth is None:
+                continue
+            predicted_x, predicted_y = kalman.predict(lead)
+            for name, (estimate_x, estimate_y) in (
+                ("raw", (x, y)),
+                ("filtered", (filtered_x, filtered_y)),
+                ("predicted", (predicted_x, predicted_y)),
+            ):
+                errors[name].append((estimate_x - truth[0]) ** 2 + (estimate_y - truth[1]) ** 2)
+
+    return {
+        name: {
+            "samples": len(values),
+            "rms_px": round(math.sqrt(sum(values) / len(values)), 2) if values else None,
+        }
+        for name, values in errors.items()
+    }
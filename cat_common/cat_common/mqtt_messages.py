@@ -1,58 +1,541 @@
 import paho.mqtt.client as mqtt
 from dataclasses import dataclass
+from typing import Tuple
+import collections
 import json
+import struct
 import threading
+import time
 import queue
 
 MQTT_BROKER = "localhost"
 MQTT_PORT = 1883
 MQTT_TOPIC = "cat/telemetry"
 MQTT_FACE_TOPIC = "cat/recognized"
+MQTT_DETECTIONS_TOPIC = "cat/detections"
+
+# Modos de entrega por topic
+DELIVERY_ALL = "all"  # Todos los mensajes en orden (comportamiento original)
+DELIVERY_LATEST = "latest"  # Solo el valor más reciente pendiente
+DELIVERY_RING = "ring"  # Los últimos N mensajes, se descartan los más viejos
+DELIVERY_MODES = (DELIVERY_ALL, DELIVERY_LATEST, DELIVERY_RING)
+
+# Qué hacer cuando el buffer de salida está lleno
+OVERFLOW_DROP_OLDEST = "drop_oldest"  # Descarta el mensaje más viejo pendiente
+OVERFLOW_DROP_NEWEST = "drop_newest"  # Rechaza el mensaje nuevo
+OVERFLOW_BLOCK = "block"  # Bloquea al productor hasta que haya espacio
+OVERFLOW_POLICIES = (OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST, OVERFLOW_BLOCK)
+
+# Formato binario: el primer byte es la versión del formato y el segundo el tipo de mensaje.
+# Un payload que empieza con "{" se interpreta como el JSON anterior.
+TELEMETRY_WIRE_VERSION = 2
+FRAME_WIRE_VERSION = 4
+MSG_TELEMETRY = 1
+MSG_FRAME_DETECTIONS = 2
+_JSON_PREFIX = ord("{")
+_HEADER = struct.Struct("<BB")
+_TELEMETRY_V1 = struct.Struct("<BBii")
+# v2 agrega el timestamp de captura (time.time() del productor)
+_TELEMETRY_V2 = struct.Struct("<BBiid")
+# versión, tipo, secuencia, timestamp de captura, ancho, alto, número de detecciones
+_FRAME_V1 = struct.Struct("<BBIdHHH")
+# v2 agrega los timestamps de fin de inferencia y de publicación para trazar la latencia
+_FRAME_V2 = struct.Struct("<BBIdddHHH")
+# Cada detección, nombrada por la versión del frame que la introdujo.
+# Frames v1 y v2: x1, y1, x2, y2, centroide x, centroide y, confianza, longitud de la identidad
+_DETECTION_FRAME_V1 = struct.Struct("<iiiiiifB")
+# Frame v3 (mismo encabezado que v2) agrega a cada detección el id del track (0 = sin track)
+_DETECTION_FRAME_V3 = struct.Struct("<iiiiiifIB")
+# Frame v4 agrega la velocidad del centroide filtrado (pixeles/s)
+_DETECTION_FRAME_V4 = struct.Struct("<iiiiiifffIB")
+
+# Formato de cada detección según la versión del mensaje de frame
+_DETECTION_FORMATS = {
+    1: _DETECTION_FRAME_V1,
+    2: _DETECTION_FRAME_V1,
+    3: _DETECTION_FRAME_V3,
+    4: _DETECTION_FRAME_V4,
+}
+
+
+def shared_topic(topic: str, group: str):
+    """Filtro de suscripción compartida: el broker reparte los mensajes entre el grupo."""
+    return f"$share/{group}/{topic}"
+
+
+def encode_payload(payload):
+    """Serializa los mensajes (objetos con ``to_bytes``) en el momento de enviarlos."""
+    if isinstance(payload, (bytes, bytearray, memoryview, str)):
+        return payload
+    return payload.to_bytes()
+
+
+def is_json_payload(binary_data) -> bool:
+    """Indica si el payload es JSON (formato anterior) en lugar del formato binario."""
+    return len(binary_data) > 0 and binary_data[0] == _JSON_PREFIX
+
+
+def read_header(binary_data):
+    """Regresa la tupla (versión, tipo de mensaje) de un payload binario sin copiarlo."""
+    if len(binary_data) < _HEADER.size:
+        raise ValueError(f"Payload demasiado corto: {len(binary_data)} bytes")
+    return _HEADER.unpack_from(binary_data)
 
 
 @dataclass(frozen=True)
 class CatTelemetry:
     centroid_x: int
     centroid_y: int
+    capture_time: float = 0.0  # time.time() del productor al capturar; 0 = desconocido
 
     def to_dict(self):
         """Convierte los datos en un diccionario, asegurando que sean de tipo int."""
         return {
             "centroid_x": int(self.centroid_x),  # Asegurarse de que sea un int
-            "centroid_y": int(self.centroid_y)
+            "centroid_y": int(self.centroid_y),
+            "capture_time": float(self.capture_time),
         }
 
-    def to_bytes(self):
+    def to_json_bytes(self):
         """Convierte el diccionario a JSON y luego a bytes con codificación UTF-8."""
         return bytes(json.dumps(self.to_dict()), "utf-8")
 
+    def to_bytes(self):
+        """Empaqueta la telemetría en el formato binario de tamaño fijo."""
+        return _TELEMETRY_V2.pack(
+            TELEMETRY_WIRE_VERSION,
+            MSG_TELEMETRY,
+            int(self.centroid_x),
+            int(self.centroid_y),
+            self.capture_time,
+        )
+
+    @staticmethod
+    def from_bytes(binary_data):
+        """Convierte los datos en bytes (binario o JSON) a una instancia de CatTelemetry."""
+        if is_json_payload(binary_data):
+            data = json.loads(bytes(binary_data).decode("utf-8"))
+            return CatTelemetry(
+                centroid_x=data["centroid_x"],
+                centroid_y=data["centroid_y"],
+                capture_time=data.get("capture_time", 0.0),
+            )
+
+        version, kind = read_header(binary_data)
+        if kind != MSG_TELEMETRY:
+            raise ValueError(f"Tipo de mensaje inesperado para CatTelemetry: {kind}")
+        if version == TELEMETRY_WIRE_VERSION:
+            _, _, centroid_x, centroid_y, capture_time = _TELEMETRY_V2.unpack_from(binary_data)
+            return CatTelemetry(centroid_x, centroid_y, capture_time)
+        if version == 1:
+            _, _, centroid_x, centroid_y = _TELEMETRY_V1.unpack_from(binary_data)
+            return CatTelemetry(centroid_x=centroid_x, centroid_y=centroid_y)
+        raise ValueError(f"Versión de formato no soportada: {version}")
+
+
+@dataclass(frozen=True)
+class FaceDetection:
+    x1: int
+    y1: int
+    x2: int
+    y2: int
+    centroid_x: int
+    centroid_y: int
+    confidence: float = 0.0
+    identity: str = ""
+    track_id: int = 0  # Id estable de la cara entre frames; 0 = sin seguimiento
+    velocity_x: float = 0.0  # Velocidad del centroide filtrado en pixeles/s
+    velocity_y: float = 0.0
+
+    @staticmethod
+    def from_box(x1, y1, x2, y2, confidence=0.0, identity="", track_id=0):
+        """Crea la detección a partir del bounding box calculando su centroide."""
+        x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+        return FaceDetection(
+            x1,
+            y1,
+            x2,
+            y2,
+            (x1 + x2) // 2,
+            (y1 + y2) // 2,
+            float(confidence),
+            identity,
+            int(track_id),
+        )
+
+    @property
+    def area(self):
+        return (self.x2 - self.x1) * (self.y2 - self.y1)
+
+    @property
+    def box_center(self):
+        """Centro de la caja tal como la midió el detector (el centroide puede estar filtrado)."""
+        return (self.x1 + self.x2) / 2, (self.y1 + self.y2) / 2
+
+    def to_dict(self):
+        return {
+            "box": [int(self.x1), int(self.y1), int(self.x2), int(self.y2)],
+            "centroid_x": int(self.centroid_x),
+            "centroid_y": int(self.centroid_y),
+            "confidence": float(self.confidence),
+            "identity": self.identity,
+            "track_id": int(self.track_id),
+            "velocity_x": float(self.velocity_x),
+            "velocity_y": float(self.velocity_y),
+        }
+
+    @staticmethod
+    def from_dict(data):
+        x1, y1, x2, y2 = data["box"]
+        return FaceDetection(
+            x1,
+            y1,
+            x2,
+            y2,
+            data["centroid_x"],
+            data["centroid_y"],
+            data.get("confidence", 0.0),
+            data.get("identity", ""),
+            data.get("track_id", 0),
+            data.get("velocity_x", 0.0),
+            data.get("velocity_y", 0.0),
+        )
+
+
+@dataclass(frozen=True)
+class FrameDetections:
+    """Todas las caras detectadas en un frame, publicadas en un solo mensaje."""
+
+    frame_seq: int
+    capture_time: float
+    frame_width: int
+    frame_height: int
+    detections: Tuple[FaceDetection, ...] = ()
+    inference_time: float = 0.0  # Fin de la inferencia (time.time())
+    publish_time: float = 0.0  # Momento en que se serializó para publicarse (time.time())
+
+    def to_dict(self):
+        return {
+            "frame_seq": int(self.frame_seq),
+            "capture_time": float(self.capture_time),
+            "inference_time": float(self.inference_time),
+            "publish_time": float(self.publish_time or time.time()),
+            "frame_width": int(self.frame_width),
+            "frame_height": int(self.frame_height),
+            "detections": [detection.to_dict() for detection in self.detections],
+        }
+
+    def to_json_bytes(self):
+        return bytes(json.dumps(self.to_dict()), "utf-8")
+
+    def to_bytes(self):
+        """Empaqueta el frame y sus detecciones en el formato binario.
+
+        Si no se fijó ``publish_time`` se toma el momento de serializar, así que conviene
+        serializar justo antes de enviar (RateLimitedPublisher lo hace).
+        """
+        parts = [
+            _FRAME_V2.pack(
+                FRAME_WIRE_VERSION,
+                MSG_FRAME_DETECTIONS,
+                self.frame_seq & 0xFFFFFFFF,
+                self.capture_time,
+                self.inference_time,
+                self.publish_time or time.time(),
+                self.frame_width,
+                self.frame_height,
+                len(self.detections),
+            )
+        ]
+        for detection in self.detections:
+            identity = detection.identity.encode("utf-8")[:255]
+            parts.append(
+                _DETECTION_FRAME_V4.pack(
+                    int(detection.x1),
+                    int(detection.y1),
+                    int(detection.x2),
+                    int(detection.y2),
+                    int(detection.centroid_x),
+                    int(detection.centroid_y),
+                    detection.confidence,
+                    detection.velocity_x,
+                    detection.velocity_y,
+                    int(detection.track_id) & 0xFFFFFFFF,
+                    len(identity),
+                )
+            )
+            parts.append(identity)
+        return b"".join(parts)
+
     @staticmethod
     def from_bytes(binary_data):
-        """Convierte los datos en bytes (JSON) a una instancia de CatTelemetry."""
-        data = json.loads(binary_data.decode("utf-8"))
-        return CatTelemetry(centroid_x=data["centroid_x"], centroid_y=data["centroid_y"])
+        """Convierte los datos en bytes (binario o JSON) a una instancia de FrameDetections."""
+        if is_json_payload(binary_data):
+            data = json.loads(bytes(binary_data).decode("utf-8"))
+            return FrameDetections(
+                frame_seq=data["frame_seq"],
+                capture_time=data["capture_time"],
+                frame_width=data["frame_width"],
+                frame_height=data["frame_height"],
+                detections=tuple(FaceDetection.from_dict(d) for d in data["detections"]),
+                inference_time=data.get("inference_time", 0.0),
+                publish_time=data.get("publish_time", 0.0),
+            )
+
+        view = memoryview(binary_data)
+        version, kind = read_header(view)
+        if kind != MSG_FRAME_DETECTIONS:
+            raise ValueError(f"Tipo de mensaje inesperado para FrameDetections: {kind}")
+        if version in (2, 3, FRAME_WIRE_VERSION):
+            (
+                _,
+                _,
+                frame_seq,
+                capture_time,
+                inference_time,
+                publish_time,
+                width,
+                height,
+                count,
+            ) = _FRAME_V2.unpack_from(view)
+            offset = _FRAME_V2.size
+        elif version == 1:
+            _, _, frame_seq, capture_time, width, height, count = _FRAME_V1.unpack_from(view)
+            inference_time = publish_time = 0.0
+            offset = _FRAME_V1.size
+        else:
+            raise ValueError(f"Versión de formato no soportada: {version}")
+
+        detection_format = _DETECTION_FORMATS[version]
+        detections = []
+        for _ in range(count):
+            values = detection_format.unpack_from(view, offset)
+            offset += detection_format.size
+            identity_len = values[-1]
+            identity = str(view[offset : offset + identity_len], "utf-8")
+            offset += identity_len
+            x1, y1, x2, y2, cx, cy, confidence = values[:7]
+            track_id = velocity_x = velocity_y = 0
+            if detection_format is _DETECTION_FRAME_V4:
+                velocity_x, velocity_y, track_id = values[7:10]
+            elif detection_format is _DETECTION_FRAME_V3:
+                track_id = values[7]
+            detections.append(
+                FaceDetection(
+                    x1, y1, x2, y2, cx, cy, confidence, identity, track_id, velocity_x, velocity_y
+                )
+            )
+
+        return FrameDetections(
+            frame_seq,
+            capture_time,
+            width,
+            height,
+            tuple(detections),
+            inference_time,
+            publish_time,
+        )
+
+
+class TopicMailbox:
+    """Buzón de mensajes pendientes de un topic con su política de entrega.
+
+    ``put`` se llama desde el hilo de paho y ``get`` desde el consumidor, por eso ambos
+    toman el lock. ``put`` regresa True cuando el buzón pasa de vacío a tener mensajes,
+    que es el único momento en que hay que avisar al consumidor.
+    """
+
+    def __init__(self, mode: str = DELIVERY_ALL, maxlen: int = None):
+        if mode not in DELIVERY_MODES:
+            raise ValueError(f"Modo de entrega desconocido: {mode}")
+        if mode == DELIVERY_LATEST:
+            maxlen = 1
+        elif mode == DELIVERY_RING and not maxlen:
+            raise ValueError("El modo ring requiere maxlen")
+        elif mode == DELIVERY_ALL:
+            maxlen = None
+        self.mode = mode
+        self.messages = collections.deque()
+        self.maxlen = maxlen
+        self.lock = threading.Lock()
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, payload, received_time: float) -> bool:
+        with self.lock:
+            was_empty = not self.messages
+            if self.maxlen is not None and len(self.messages) >= self.maxlen:
+                self.messages.popleft()
+                self.dropped += 1
+            self.messages.append((payload, received_time))
+            self.received += 1
+            return was_empty
+
+    def get(self):
+        """Regresa (payload, hora de recepción, mensajes restantes); IndexError si está vacío."""
+        with self.lock:
+            payload, received_time = self.messages.popleft()
+            return payload, received_time, len(self.messages)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "mode": self.mode,
+                "received": self.received,
+                "dropped": self.dropped,
+                "pending": len(self.messages),
+            }
 
 
 class MQTTClient:
     QOS = 0
+    RECONNECT_MIN_DELAY = 1  # Segundos; paho duplica la espera en cada intento fallido
+    RECONNECT_MAX_DELAY = 30
+
+    def __init__(
+        self,
+        topics=(MQTT_TOPIC, MQTT_DETECTIONS_TOPIC),
+        transport=None,
+        pending_limit: int = 32,
+        pending_overflow: str = OVERFLOW_DROP_OLDEST,
+        start_time: float = None,
+        share_group: str = None,
+    ):
+        """``transport`` es un transporte local opcional (p. ej. SharedMemoryTransport).
+
+        Con transporte local los topics suscritos se reciben por él en lugar del broker, y
+        cada publicación se escribe en él además de enviarse al broker para los
+        consumidores remotos.
 
-    def __init__(self):
+        La conexión al broker no se hace aquí: ``client_start``/``run`` la inician en segundo
+        plano. Lo que se publique mientras no hay conexión se guarda en un buffer de
+        ``pending_limit`` mensajes que descarta el más viejo (``drop_oldest``) o el más
+        nuevo (``drop_newest``) al llenarse, y se envía al conectar.
+
+        ``start_time`` (time.monotonic() al arrancar el servicio) es la referencia para medir
+        el tiempo hasta la conexión y hasta el primer publish; por defecto, la creación del
+        cliente.
+
+        Con ``share_group`` las suscripciones al broker son compartidas (``$share/<grupo>/``):
+        varios nodos de control del mismo grupo se reparten los mensajes del topic.
+        """
+        if pending_overflow not in (OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST):
+            raise ValueError(f"Política no soportada para el buffer: {pending_overflow}")
+        self.created_time = start_time if start_time is not None else time.monotonic()
+        self.connected_delay = None
+        self.first_publish_delay = None
         self.client = mqtt.Client()
-        self.mqtt_queue = queue.Queue()
+        self.transport = transport
+        self.share_group = share_group
+        self.mailboxes = {}
+        self.ready_topics = queue.Queue()
+        self.topics = []
+        self.pending_publishes = collections.deque()
+        self.pending_limit = pending_limit
+        self.pending_overflow = pending_overflow
+        self.pending_dropped = 0
+        self.flushing = False
+        self.publish_lock = threading.Lock()
+        self.connected = threading.Event()
+        for topic in topics:
+            self.subscribe(topic)
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message       
-        self.client.connect(MQTT_BROKER, MQTT_PORT, 60)
+        self.client.on_disconnect = self.on_disconnect
+        self.client.reconnect_delay_set(self.RECONNECT_MIN_DELAY, self.RECONNECT_MAX_DELAY)
+
+    def connect(self):
+        """Agenda la conexión; el loop de paho la hace y reintenta con backoff."""
+        self.client.connect_async(MQTT_BROKER, MQTT_PORT, 60)
 
     def client_start(self):
+        self.start_transport()
+        self.connect()
         self.client.loop_start()
 
     def run(self):     
-        thread = threading.Thread(target=self.client.loop_forever)
+        self.start_transport()
+        self.connect()
+        thread = threading.Thread(
+            target=self.client.loop_forever, kwargs={"retry_first_connection": True}
+        )
         thread.daemon = True
         thread.start()
 
+    def start_transport(self):
+        if self.transport is not None and self.topics:
+            self.transport.start(self.deliver_subscribed)
+
     def publish(self, topic, payload):
+        payload = encode_payload(payload)
+        if self.transport is not None:
+            self.transport.publish(topic, payload)
+        # client.publish nunca se llama con publish_lock tomado: paho toma su _callback_mutex
+        # dentro de publish y llama on_connect con ese mutex tomado (orden inverso).
+        with self.publish_lock:
+            if self.flushing or self.pending_publishes or not self.client.is_connected():
+                self._hold(topic, payload)
+                return
+        self._send(topic, payload)
+
+    def _hold(self, topic, payload):
+        """Guarda el mensaje hasta que haya conexión, respetando el límite del buffer."""
+        if len(self.pending_publishes) >= self.pending_limit:
+            self.pending_dropped += 1
+            if self.pending_overflow == OVERFLOW_DROP_NEWEST:
+                return
+            self.pending_publishes.popleft()
+        self.pending_publishes.append((topic, payload))
+
+    def _send(self, topic, payload):
         self.client.publish(topic, payload, qos=self.QOS)
+        if self.first_publish_delay is None:
+            self.first_publish_delay = time.monotonic() - self.created_time
+            print(f"Primer publish {self.first_publish_delay:.3f} s después del arranque")
+
+    def _flush_pending(self):
+        """Envía lo pendiente en orden; mientras tanto los mensajes nuevos se encolan detrás.
+
+        Solo un hilo vacía el buffer a la vez (``flushing``). Los mensajes se sacan con el lock
+        tomado y se envían después de soltarlo.
+        """
+        with self.publish_lock:
+            if self.flushing:
+                return
+            self.flushing = True
+        while True:
+            with self.publish_lock:
+                if not self.pending_publishes or not self.client.is_connected():
+                    # En la misma sección que la revisión, para no dejar mensajes varados
+                    self.flushing = False
+                    return
+                batch = list(self.pending_publishes)
+                self.pending_publishes.clear()
+            try:
+                for topic, payload in batch:
+                    self._send(topic, payload)
+            except Exception:
+                with self.publish_lock:
+                    self.flushing = False
+                raise
+
+    def subscribe(self, topic, mode: str = DELIVERY_ALL, maxlen: int = None):
+        """Suscribe el topic con su modo de entrega; se vuelve a suscribir en cada reconexión.
+
+        - ``DELIVERY_ALL``: entrega todos los mensajes (cola sin límite).
+        - ``DELIVERY_LATEST``: solo conserva el último mensaje pendiente.
+        - ``DELIVERY_RING``: conserva los últimos ``maxlen`` mensajes y descarta los más viejos.
+        """
+        self.mailboxes[topic] = TopicMailbox(mode, maxlen)
+        if topic not in self.topics:
+            self.topics.append(topic)
+            if self.transport is None and self.client.is_connected():
+                self.client.subscribe(self.subscription_filter(topic))
+
+    def subscription_filter(self, topic):
+        if self.share_group:
+            return shared_topic(topic, self.share_group)
+        return topic
 
     def on_connect(self, client, userdata, flags, rc):       
         message = f"Conectado a MQTT Broker con código {str(rc)}"
@@ -61,19 +544,71 @@ class MQTTClient:
         except UnicodeEncodeError:
             # En caso de error con la codificación ASCII, se reemplazan los caracteres especiales.
             print(message.encode('ascii', 'replace').decode('ascii'))
-        client.subscribe(MQTT_TOPIC)
-        #client.subscribe(MQTT_FACE_TOPIC)
+        if rc != 0:
+            return
+        if self.connected_delay is None:
+            self.connected_delay = time.monotonic() - self.created_time
+        self.connected.set()
+        if self.transport is None:
+            for topic in self.topics:
+                client.subscribe(self.subscription_filter(topic))
+        self._flush_pending()
+
+    def on_disconnect(self, client, userdata, rc):
+        self.connected.clear()
+
+    def wait_connected(self, timeout: float = None) -> bool:
+        """Espera a que haya conexión con el broker; regresa False si se agotó el tiempo."""
+        return self.connected.wait(timeout)
 
     def disconnect(self):       
+        if self.transport is not None:
+            self.transport.stop()
         self.client.loop_stop()  # Detiene el loop_start
         self.client.disconnect()  # Desconecta el cliente del broker
         print("Cliente MQTT desconectado")
 
-    
+    def stats(self):
+        """Contadores de mensajes recibidos, descartados y pendientes por topic."""
+        return {topic: mailbox.stats() for topic, mailbox in self.mailboxes.items()}
+
+    def deliver(self, topic, payload):
+        """Guarda el mensaje en el buzón de su topic y avisa si el buzón estaba vacío."""
+        mailbox = self.mailboxes.get(topic)
+        if mailbox is None:
+            # Topics que llegan por comodines usan la entrega por defecto
+            mailbox = self.mailboxes.setdefault(topic, TopicMailbox())
+        if mailbox.put(payload, time.time()):
+            self.notify_ready(topic)
+
+    def deliver_subscribed(self, topic, payload):
+        """Entrega desde el transporte local solo los topics a los que se suscribió el cliente."""
+        if topic in self.mailboxes:
+            self.deliver(topic, payload)
+
+    def notify_ready(self, topic):
+        self.ready_topics.put(topic)
+
     def on_message(self, client, userdata, msg):
-        """Manda a la cola tanto el topic como el payload recibido"""
+        """Manda al buzón del topic el payload recibido"""
         try:
-            # Colocar en la cola una tupla con el topic y el payload
-            self.mqtt_queue.put((msg.topic, msg.payload))
+            self.deliver(msg.topic, msg.payload)
         except Exception as e:
             print(f"Error procesando el mensaje: {e}")
+
+    def get_message(self, block=True, timeout=None):
+        """Regresa el siguiente (topic, payload) pendiente; lanza queue.Empty si no hay."""
+        topic, payload, _ = self.get_message_with_time(block, timeout)
+        return topic, payload
+
+    def get_message_with_time(self, block=True, timeout=None):
+        """Como ``get_message`` pero regresa también la hora de recepción (time.time())."""
+        while True:
+            topic = self.ready_topics.get(block=block, timeout=timeout)
+            try:
+                payload, received_time, remaining = self.mailboxes[topic].get()
+            except IndexError:
+                continue
+            if remaining:
+                self.ready_topics.put(topic)
+            return topic, payload, received_time
@@ -0,0 +1,163 @@
+import collections
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from cat_common.mqtt_messages import (
+    OVERFLOW_DROP_NEWEST,
+    OVERFLOW_DROP_OLDEST,
+    OVERFLOW_POLICIES,
+)
+
+
+@dataclass
+class TopicRate:
+    max_rate: Optional[float] = None  # Mensajes por segundo, None = sin límite
+    coalesce: bool = True  # Reemplazar el mensaje pendiente del topic por el más nuevo
+
+    @property
+    def interval(self):
+        return 1.0 / self.max_rate if self.max_rate else 0.0
+
+
+class RateLimitedPublisher:
+    """Capa de publicación con límite de frecuencia por topic, coalescencia y buffer acotado.
+
+    Expone el mismo ``publish(topic, payload)`` que MQTTClient, así que se puede pasar en su
+    lugar a los detectores. Un hilo propio envía los mensajes al cliente respetando la
+    frecuencia máxima de cada topic; mientras un mensaje espera su turno, los nuevos del mismo
+    topic lo reemplazan en lugar de encolarse (si el topic coalesce).
+    """
+
+    def __init__(self, mqtt_client, max_buffer: int = 64, overflow: str = OVERFLOW_DROP_OLDEST):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Política de desbordamiento desconocida: {overflow}")
+        self.mqtt_client = mqtt_client
+        self.max_buffer = max_buffer
+        self.overflow = overflow
+        self.rates = {}
+        self.default_rate = TopicRate(coalesce=False)
+        self.buffer = collections.deque()  # Entradas [topic, payload]
+        self.pending = {}  # topic -> entrada que aún no se envía (para coalescer)
+        self.next_allowed = {}  # topic -> time.monotonic() del siguiente envío permitido
+        self.condition = threading.Condition()
+        self.running = True
+        self.published = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.high_water = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def set_rate(self, topic: str, max_rate: float = None, coalesce: bool = True):
+        """Configura la frecuencia máxima (mensajes/s) y la coalescencia de un topic."""
+        with self.condition:
+            self.rates[topic] = TopicRate(max_rate, coalesce)
+            self.condition.notify()
+
+    def publish(self, topic, payload, timeout: float = None) -> bool:
+        """Encola el mensaje; regresa False si se descartó por desbordamiento.
+
+        ``payload`` puede ser bytes o un mensaje con ``to_bytes``; los mensajes se serializan
+        hasta enviarse, así que los que se coalescen nunca se serializan.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            rate = self.rates.get(topic, self.default_rate)
+            while True:
+                # Se revisa de nuevo tras esperar: otro productor pudo encolar el mismo topic
+                entry = self.pending.get(topic)
+                if rate.coalesce and entry is not None:
+                    entry[1] = payload
+                    self.coalesced += 1
+                    return True
+
+                if len(self.buffer) < self.max_buffer:
+                    break
+                if self.overflow == OVERFLOW_DROP_NEWEST:
+                    self.dropped += 1
+                    return False
+                if self.overflow == OVERFLOW_DROP_OLDEST:
+                    self._remove(self.buffer[0])
+                    self.dropped += 1
+                    break
+
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                if (
+                    not self.condition.wait_for(
+                        lambda: len(self.buffer) < self.max_buffer or not self.running, remaining
+                    )
+                    or not self.running
+                ):
+                    # Sin espacio a tiempo, o el publicador se detuvo mientras se esperaba
+                    self.dropped += 1
+                    return False
+
+            entry = [topic, payload]
+            self.buffer.append(entry)
+            if rate.coalesce:
+                self.pending[topic] = entry
+            self.high_water = max(self.high_water, len(self.buffer))
+            self.condition.notify_all()
+            return True
+
+    def _remove(self, entry):
+        # Por identidad: dos entradas pueden tener el mismo contenido
+        for index, candidate in enumerate(self.buffer):
+            if candidate is entry:
+                del self.buffer[index]
+                break
+        if self.pending.get(entry[0]) is entry:
+            del self.pending[entry[0]]
+
+    def _next_ready(self, now):
+        """Regresa (entrada lista para enviarse o None, segundos hasta la siguiente)."""
+        wait = None
+        for entry in self.buffer:
+            ready_at = self.next_allowed.get(entry[0], 0.0)
+            if ready_at <= now:
+                return entry, 0.0
+            wait = ready_at - now if wait is None else min(wait, ready_at - now)
+        return None, wait
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while True:
+                    if not self.running and not self.buffer:
+                        return
+                    entry, wait = self._next_ready(time.monotonic())
+                    if entry is not None:
+                        break
+                    self.condition.wait(wait)
+                self._remove(entry)
+                topic, payload = entry
+                rate = self.rates.get(topic, self.default_rate)
+                self.next_allowed[topic] = time.monotonic() + rate.interval
+                self.condition.notify_all()
+
+            try:
+                self.mqtt_client.publish(topic, payload)
+            except Exception as exc:
+                print(f"Error publicando en {topic}: {exc}")
+                continue
+            with self.condition:
+                self.published += 1
+
+    def stats(self):
+        with self.condition:
+            return {
+                "published": self.published,
+                "coalesced": self.coalesced,
+                "dropped": self.dropped,
+                "pending": len(self.buffer),
+                "high_water": self.high_water,
+            }
+
+    def stop(self, timeout: float = 2.0):
+        """Envía lo pendiente (respetando las frecuencias) y detiene el hilo."""
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        self.thread.join(timeout)
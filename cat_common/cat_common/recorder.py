@@ -0,0 +1,217 @@
+"""Grabación y reproducción de los topics de telemetría.
+
+Graba una sesión real de seguimiento en un log binario de solo escritura al final y la vuelve a
+publicar por MQTTClient, para tener carga reproducible de cat_control sin cámara.
+
+Uso:
+    python3 -m cat_common.recorder record sesion.gclog --duration 120
+    python3 -m cat_common.recorder replay sesion.gclog --speed 2
+    python3 -m cat_common.recorder replay sesion.gclog --max-speed --loops 10
+    python3 -m cat_common.recorder evaluate sesion.gclog --lead 0.2
+"""
+import argparse
+import dataclasses
+import json
+import queue
+import struct
+import time
+from pathlib import Path
+
+from cat_common.mqtt_messages import (
+    MQTT_DETECTIONS_TOPIC,
+    MQTT_FACE_TOPIC,
+    MQTT_TOPIC,
+    MSG_FRAME_DETECTIONS,
+    MSG_TELEMETRY,
+    CatTelemetry,
+    FrameDetections,
+    MQTTClient,
+    is_json_payload,
+    read_header,
+)
+from cat_common.kalman import evaluate_tracking
+
+LOG_MAGIC = b"GCATLOG1"
+# hora de recepción (time.time()), longitud del topic, longitud del payload
+_RECORD = struct.Struct("<dHI")
+DEFAULT_TOPICS = (MQTT_TOPIC, MQTT_DETECTIONS_TOPIC, MQTT_FACE_TOPIC)
+
+
+class TelemetryLogWriter:
+    """Agrega registros (timestamp, topic, payload) al final del log."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(LOG_MAGIC)
+
+    def write(self, timestamp: float, topic: str, payload: bytes):
+        topic_bytes = topic.encode("utf-8")
+        self.file.write(_RECORD.pack(timestamp, len(topic_bytes), len(payload)))
+        self.file.write(topic_bytes)
+        self.file.write(payload)
+
+    def close(self):
+        self.file.close()
+
+
+def read_log(path: Path):
+    """Generador de (timestamp, topic, payload) en el orden en que se grabaron."""
+    with open(path, "rb") as log_file:
+        if log_file.read(len(LOG_MAGIC)) != LOG_MAGIC:
+            raise ValueError(f"{path} no es un log de telemetría")
+        while True:
+            header = log_file.read(_RECORD.size)
+            if len(header) < _RECORD.size:
+                return  # Fin del archivo (o registro truncado al cortar la grabación)
+            timestamp, topic_len, payload_len = _RECORD.unpack(header)
+            topic = log_file.read(topic_len)
+            payload = log_file.read(payload_len)
+            if len(payload) < payload_len:
+                return
+            yield timestamp, topic.decode("utf-8"), payload
+
+
+def shift_timestamps(payload: bytes, shift: float) -> bytes:
+    """Recorre los timestamps de telemetría y frames para que parezcan capturados ahora.
+
+    Sin esto cat_control vería los mensajes reproducidos con la antigüedad de la grabación y
+    los descartaría por viejos. Los demás mensajes se regresan sin cambios.
+    """
+    if len(payload) < 2 or is_json_payload(payload):
+        return payload
+    kind = read_header(payload)[1]
+    if kind == MSG_TELEMETRY:
+        telemetry = CatTelemetry.from_bytes(payload)
+        if not telemetry.capture_time:
+            return payload
+        return dataclasses.replace(
+            telemetry, capture_time=telemetry.capture_time + shift
+        ).to_bytes()
+    if kind != MSG_FRAME_DETECTIONS:
+        return payload
+    frame = FrameDetections.from_bytes(payload)
+    return dataclasses.replace(
+        frame,
+        capture_time=frame.capture_time + shift,
+        inference_time=frame.inference_time + shift if frame.inference_time else 0.0,
+        publish_time=0.0,
+    ).to_bytes()
+
+
+def record(path: Path, topics, duration: float = None):
+    client = MQTTClient(topics=topics)
+    client.run()
+    writer = TelemetryLogWriter(path)
+    deadline = time.monotonic() + duration if duration else None
+    count = 0
+    print(f"Grabando {', '.join(topics)} en {path}")
+    try:
+        while deadline is None or time.monotonic() < deadline:
+            try:
+                topic, payload, received_time = client.get_message_with_time(timeout=0.5)
+            except queue.Empty:
+                continue
+            writer.write(received_time, topic, payload)
+            count += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.close()
+        client.disconnect()
+        print(f"{count} mensajes grabados")
+
+
+def replay(path: Path, speed: float = 1.0, loops: int = 1, restamp: bool = True):
+    """Publica el log respetando los tiempos originales divididos entre ``speed``.
+
+    ``speed=0`` publica tan rápido como sea posible.
+    """
+    client = MQTTClient(topics=())
+    client.client_start()
+    if not client.wait_connected(timeout=10):
+        raise RuntimeError("No se pudo conectar al broker MQTT")
+
+    count = 0
+    started = time.monotonic()
+    for _ in range(loops):
+        first_timestamp = None
+        loop_start = time.monotonic()
+        for timestamp, topic, payload in read_log(path):
+            if first_timestamp is None:
+                first_timestamp = timestamp
+            if speed > 0:
+                delay = loop_start + (timestamp - first_timestamp) / speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            if restamp:
+                payload = shift_timestamps(payload, time.time() - timestamp)
+            client.publish(topic, payload)
+            count += 1
+
+    elapsed = time.monotonic() - started
+    client.disconnect()
+    rate = count / max(elapsed, 1e-9)
+    print(f"{count} mensajes reproducidos en {elapsed:.2f} s ({rate:.0f} msg/s)")
+
+
+def read_frames(path: Path):
+    """Los FrameDetections del log, de cualquier topic, en el orden en que se grabaron."""
+    for _, _, payload in read_log(path):
+        if is_json_payload(payload):
+            if b'"frame_seq"' in payload:
+                yield FrameDetections.from_bytes(payload)
+        elif len(payload) >= 2 and read_header(payload)[1] == MSG_FRAME_DETECTIONS:
+            yield FrameDetections.from_bytes(payload)
+
+
+def evaluate(path: Path, lead: float):
+    """Imprime el error de seguimiento (raw, filtrado, predicho) de una sesión grabada."""
+    result = evaluate_tracking(read_frames(path), lead)
+    print(json.dumps({"lead": lead, "errors": result}, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    record_parser = subparsers.add_parser("record", help="grabar los topics en un log")
+    record_parser.add_argument("log", type=Path)
+    record_parser.add_argument("--topics", nargs="+", default=list(DEFAULT_TOPICS))
+    record_parser.add_argument("--duration", type=float, default=None, help="segundos")
+
+    replay_parser = subparsers.add_parser("replay", help="publicar un log grabado")
+    replay_parser.add_argument("log", type=Path)
+    replay_parser.add_argument("--speed", type=float, default=1.0, help="factor de velocidad")
+    replay_parser.add_argument("--max-speed", action="store_true", help="sin pausas")
+    replay_parser.add_argument("--loops", type=int, default=1)
+    replay_parser.add_argument(
+        "--keep-timestamps", action="store_true", help="no recorrer los timestamps de captura"
+    )
+
+    evaluate_parser = subparsers.add_parser(
+        "evaluate", help="error de seguimiento del filtro de Kalman sobre un log"
+    )
+    evaluate_parser.add_argument("log", type=Path)
+    evaluate_parser.add_argument(
+        "--lead", type=float, default=0.2, help="segundos a predecir (latencia del pipeline)"
+    )
+
+    opt = parser.parse_args()
+    if opt.command == "record":
+        record(opt.log, opt.topics, opt.duration)
+    elif opt.command == "evaluate":
+        evaluate(opt.log, opt.lead)
+    else:
+        replay(
+            opt.log,
+            speed=0 if opt.max_speed else opt.speed,
+            loops=opt.loops,
+            restamp=not opt.keep_timestamps,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import glob
+import mmap
+import os
+import socket
+import struct
+import threading
+import time
+
+SHM_DIRECTORY = "/dev/shm"
+SHM_NAME = "ghostlycat"
+TRANSPORT_ENV = "GHOSTLYCAT_TRANSPORT"
+TRANSPORT_MQTT = "mqtt"
+TRANSPORT_SHM = "shm"
+
+# magic, tamaño del slot, número de slots, secuencia del último mensaje escrito
+_RING_HEADER = struct.Struct("<4sIIQ")
+_RING_HEADER_SIZE = 64
+_WRITE_SEQ_OFFSET = 12
+_MAGIC = b"GCAT"
+# secuencia del mensaje, longitud del payload, longitud del topic
+_SLOT_HEADER = struct.Struct("<QIH")
+_SEQ = struct.Struct("<Q")
+
+
+class SharedMemoryRing:
+    """Ring buffer de mensajes (topic, payload) en un archivo mapeado en memoria compartida.
+
+    Hay un solo escritor por ring. Cada slot guarda la secuencia del mensaje que contiene; el
+    escritor invalida el slot, copia el mensaje y al final publica la secuencia, y el lector
+    vuelve a comparar la secuencia después de copiar para descartar un slot sobrescrito a
+    media lectura. Si el lector se queda más de ``slot_count`` mensajes atrás, los perdidos se
+    cuentan en ``dropped``.
+    """
+
+    def __init__(self, path: str, slot_count: int = 256, slot_size: int = 4096):
+        self.path = path
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            size = _RING_HEADER_SIZE + slot_count * slot_size
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self.mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+        magic, current_slot_size, current_slot_count, _ = _RING_HEADER.unpack_from(self.mm)
+        if magic != _MAGIC:
+            _RING_HEADER.pack_into(self.mm, 0, _MAGIC, slot_size, slot_count, 0)
+        elif (current_slot_size, current_slot_count) != (slot_size, slot_count):
+            raise ValueError(
+                f"{path} ya existe con {current_slot_count} slots de {current_slot_size} bytes"
+            )
+        self.slot_count = slot_count
+        self.slot_size = slot_size
+        self.read_seq = self.write_seq
+        self.dropped = 0
+
+    @property
+    def write_seq(self):
+        return _SEQ.unpack_from(self.mm, _WRITE_SEQ_OFFSET)[0]
+
+    def _slot_offset(self, seq):
+        return _RING_HEADER_SIZE + (seq % self.slot_count) * self.slot_size
+
+    def write(self, topic: bytes, payload: bytes):
+        length = _SLOT_HEADER.size + len(topic) + len(payload)
+        if length > self.slot_size:
+            raise ValueError(f"Mensaje de {length} bytes no cabe en un slot de {self.slot_size}")
+        seq = self.write_seq + 1
+        offset = self._slot_offset(seq)
+        _SLOT_HEADER.pack_into(self.mm, offset, 0, len(payload), len(topic))
+        start = offset + _SLOT_HEADER.size
+        self.mm[start : start + len(topic)] = topic
+        self.mm[start + len(topic) : start + len(topic) + len(payload)] = payload
+        _SEQ.pack_into(self.mm, offset, seq)
+        _SEQ.pack_into(self.mm, _WRITE_SEQ_OFFSET, seq)
+
+    def read(self):
+        """Regresa la lista de (topic, payload) escritos desde la última lectura."""
+        write_seq = self.write_seq
+        if write_seq < self.read_seq:
+            # El ring se reinició: empezar de nuevo
+            self.read_seq = 0
+        if write_seq - self.read_seq > self.slot_count:
+            self.dropped += write_seq - self.read_seq - self.slot_count
+            self.read_seq = write_seq - self.slot_count
+
+        messages = []
+        for seq in range(self.read_seq + 1, write_seq + 1):
+            offset = self._slot_offset(seq)
+            slot_seq, payload_len, topic_len = _SLOT_HEADER.unpack_from(self.mm, offset)
+            start = offset + _SLOT_HEADER.size
+            topic = self.mm[start : start + topic_len]
+            payload = self.mm[start + topic_len : start + topic_len + payload_len]
+            if slot_seq != seq or _SEQ.unpack_from(self.mm, offset)[0] != seq:
+                self.dropped += 1
+                continue
+            messages.append((topic.decode("utf-8"), payload))
+        self.read_seq = write_seq
+        return messages
+
+    def close(self):
+        self.mm.close()
+
+
+class SharedMemoryTransport:
+    """Transporte local para servicios en el mismo host (``ipc: host``).
+
+    El publicador escribe en un ``SharedMemoryRing`` y toca el "timbre" de cada suscriptor:
+    un datagrama de un byte a su socket Unix. El suscriptor espera en su socket, sin hacer
+    polling, y al despertar vacía el ring. Implementa la parte de publish/subscribe que usa
+    MQTTClient, así que se conecta con ``MQTTClient(transport=...)``.
+    """
+
+    DOORBELL_REFRESH = 1.0  # Segundos entre búsquedas de suscriptores nuevos
+    IDLE_TIMEOUT = 0.5  # Revisar el ring aunque no llegue timbre
+
+    def __init__(
+        self,
+        name: str = SHM_NAME,
+        directory: str = SHM_DIRECTORY,
+        slot_count: int = 256,
+        slot_size: int = 4096,
+    ):
+        self.ring = SharedMemoryRing(os.path.join(directory, f"{name}.ring"), slot_count, slot_size)
+        self.doorbell_pattern = os.path.join(directory, f"{name}.*.sock")
+        self.doorbell_path = os.path.join(directory, f"{name}.{os.getpid()}.sock")
+        self.sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sender.setblocking(False)
+        self.doorbells = []
+        self.doorbells_refreshed = 0.0
+        self.lock = threading.Lock()
+        self.receiver = None
+        self.thread = None
+        self.running = False
+
+    def publish(self, topic: str, payload: bytes):
+        with self.lock:
+            self.ring.write(topic.encode("utf-8"), bytes(payload))
+            self._ring_doorbells()
+
+    def _ring_doorbells(self):
+        now = time.monotonic()
+        if now - self.doorbells_refreshed > self.DOORBELL_REFRESH:
+            self.doorbells = [
+                path for path in glob.glob(self.doorbell_pattern) if path != self.doorbell_path
+            ]
+            self.doorbells_refreshed = now
+        for path in self.doorbells:
+            try:
+                self.sender.sendto(b"\x01", path)
+            except BlockingIOError:
+                # El suscriptor tiene timbres pendientes: ya se va a despertar
+                pass
+            except OSError:
+                # Suscriptor que ya no existe; se limpia en la siguiente búsqueda
+                pass
+
+    def start(self, deliver):
+        """Empieza a entregar los mensajes del ring con ``deliver(topic, payload)``."""
+        if os.path.exists(self.doorbell_path):
+            os.unlink(self.doorbell_path)
+        self.receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.receiver.bind(self.doorbell_path)
+        self.receiver.settimeout(self.IDLE_TIMEOUT)
+        self.running = True
+        self.thread = threading.Thread(target=self._receive_loop, args=(deliver,), daemon=True)
+        self.thread.start()
+
+    def _receive_loop(self, deliver):
+        while self.running:
+            try:
+                self.receiver.recv(64)
+            except socket.timeout:
+                pass
+            except OSError:
+                break
+            for topic, payload in self.ring.read():
+                try:
+                    deliver(topic, payload)
+                except Exception as exc:
+                    print(f"Error entregando el mensaje de {topic}: {exc}")
+
+    @property
+    def dropped(self):
+        return self.ring.dropped
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(self.IDLE_TIMEOUT * 2)
+        if self.receiver is not None:
+            self.receiver.close()
+            if os.path.exists(self.doorbell_path):
+                os.unlink(self.doorbell_path)
+        self.sender.close()
+
+
+def transport_from_env():
+    """Regresa el transporte local configurado en GHOSTLYCAT_TRANSPORT (None = solo MQTT)."""
+    kind = os.environ.get(TRANSPORT_ENV, TRANSPORT_MQTT)
+    if kind == TRANSPORT_SHM:
+        return SharedMemoryTransport()
+    if kind != TRANSPORT_MQTT:
+        raise ValueError(f"{TRANSPORT_ENV} desconocido: {kind}")
+    return None
@@ -0,0 +1,92 @@
+import collections
+import os
+import threading
+
+MAX_AGE_ENV = "GHOSTLYCAT_MAX_TELEMETRY_AGE"
+CLOCK_OFFSET_ENV = "GHOSTLYCAT_CLOCK_OFFSET"
+CLOCK_OFFSET_AUTO = "auto"
+DEFAULT_MAX_AGE = 0.5  # Segundos
+
+
+class ClockOffsetEstimator:
+    """Estima la diferencia entre el reloj local y el del productor.
+
+    Con un offset fijo (0 cuando ambos servicios corren en el mismo host) solo lo regresa. En
+    modo automático toma el mínimo de ``recepción - envío`` de las últimas ``window``
+    muestras: el mensaje más rápido es el que menos tiempo pasó en tránsito, así que ese
+    mínimo es el offset más la latencia mínima de la red. Las edades calculadas con él quedan
+    medidas respecto al mejor caso observado.
+    """
+
+    def __init__(self, fixed_offset: float = None, window: int = 256):
+        self.fixed_offset = fixed_offset
+        self.samples = collections.deque(maxlen=window)
+
+    @property
+    def automatic(self):
+        return self.fixed_offset is None
+
+    def update(self, sent_time: float, received_time: float):
+        if self.automatic and sent_time:
+            self.samples.append(received_time - sent_time)
+
+    @property
+    def offset(self):
+        if not self.automatic:
+            return self.fixed_offset
+        return min(self.samples) if self.samples else 0.0
+
+
+class StalenessFilter:
+    """Descarta la telemetría más vieja que ``max_age`` segundos en lugar de actuar sobre ella."""
+
+    def __init__(self, max_age: float = DEFAULT_MAX_AGE, clock: ClockOffsetEstimator = None):
+        self.max_age = max_age
+        self.clock = clock or ClockOffsetEstimator(fixed_offset=0.0)
+        self.lock = threading.Lock()
+        self.accepted = 0
+        self.dropped = 0
+        self.last_age = None
+
+    def age(self, capture_time: float, now: float):
+        """Antigüedad del mensaje en el reloj local; None si no trae hora de captura."""
+        if not capture_time:
+            return None
+        return now - (capture_time + self.clock.offset)
+
+    def is_stale(self, capture_time: float, sent_time: float, received_time: float, now: float):
+        """Registra la muestra de reloj y decide si el mensaje ya es demasiado viejo."""
+        with self.lock:
+            self.clock.update(sent_time or capture_time, received_time)
+            age = self.age(capture_time, now)
+            self.last_age = age
+            if self.max_age and age is not None and age > self.max_age:
+                self.dropped += 1
+                return True
+            self.accepted += 1
+            return False
+
+    def stats(self):
+        with self.lock:
+            return {
+                "max_age": self.max_age,
+                "accepted": self.accepted,
+                "dropped": self.dropped,
+                "clock_offset": round(self.clock.offset, 4),
+                "last_age": None if self.last_age is None else round(self.last_age, 4),
+            }
+
+
+def staleness_filter_from_env():
+    """Crea el filtro a partir de las variables de entorno.
+
+    GHOSTLYCAT_MAX_TELEMETRY_AGE: segundos (0 = no descartar nada).
+    GHOSTLYCAT_CLOCK_OFFSET: segundos, o "auto" si el productor corre en otro host.
+    """
+    max_age = float(os.environ.get(MAX_AGE_ENV, DEFAULT_MAX_AGE))
+    offset = os.environ.get(CLOCK_OFFSET_ENV, "0")
+    if offset == CLOCK_OFFSET_AUTO:
+        clock = ClockOffsetEstimator()
+    else:
+        clock = ClockOffsetEstimator(fixed_offset=float(offset))
+    return StalenessFilter(max_age, clock)
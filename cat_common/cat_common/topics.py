@@ -0,0 +1,109 @@
+import dataclasses
+import os
+import socket
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Tuple
+
+from cat_common.mqtt_messages import MQTT_DETECTIONS_TOPIC, FrameDetections
+
+DEVICE_ID_ENV = "GHOSTLYCAT_DEVICE_ID"
+TARGET_DEVICES_ENV = "GHOSTLYCAT_TARGET_DEVICES"
+SHARE_GROUP_ENV = "GHOSTLYCAT_SHARE_GROUP"
+MACHINE_ID_PATH = Path("/etc/machine-id")
+DEVICE_ID_LENGTH = 12
+
+
+def device_id():
+    """Identificador del dispositivo: GHOSTLYCAT_DEVICE_ID, /etc/machine-id o el hostname."""
+    configured = os.environ.get(DEVICE_ID_ENV)
+    if configured:
+        return configured
+    try:
+        machine_id = MACHINE_ID_PATH.read_text().strip()
+    except OSError:
+        machine_id = ""
+    return machine_id[:DEVICE_ID_LENGTH] if machine_id else socket.gethostname()
+
+
+def device_topic(topic: str, device: str):
+    """Inserta el dispositivo después del primer nivel: cat/telemetry -> cat/<device>/telemetry."""
+    root, _, rest = topic.partition("/")
+    return f"{root}/{device}/{rest}" if rest else f"{root}/{device}"
+
+
+def share_group():
+    """Grupo de suscripción compartida de GHOSTLYCAT_SHARE_GROUP (None = sin compartir)."""
+    return os.environ.get(SHARE_GROUP_ENV) or None
+
+
+@dataclass(frozen=True)
+class ControllerRoute:
+    """Un cat_control destino y la franja horizontal del frame (fracción 0-1) que atiende.
+
+    La franja es semiabierta, [x_min, x_max), salvo la que llega al borde derecho (x_max >= 1):
+    una cara justo en el límite entre dos franjas va solo a la de la derecha.
+    """
+
+    device: str
+    x_min: float = 0.0
+    x_max: float = 1.0
+
+    def accepts(self, centroid_x, frame_width):
+        position = centroid_x / frame_width if frame_width else 0.0
+        if self.x_max >= 1.0:
+            return self.x_min <= position <= self.x_max
+        return self.x_min <= position < self.x_max
+
+    @staticmethod
+    def parse(spec: str):
+        """Lee "device" o "device:x_min-x_max", p. ej. "gato1:0-0.5"."""
+        device, _, region = spec.strip().partition(":")
+        if not region:
+            return ControllerRoute(device)
+        x_min, _, x_max = region.partition("-")
+        return ControllerRoute(device, float(x_min), float(x_max))
+
+
+class DetectionRouter:
+    """Reparte las detecciones de cada frame entre los cat_control configurados.
+
+    Sin rutas publica todo en el topic global (comportamiento de un solo gato). Con rutas, cada
+    controlador recibe en ``cat/<device>/detections`` solo las caras de su franja del frame.
+    """
+
+    def __init__(self, routes: List[ControllerRoute] = ()):
+        self.routes = list(routes)
+
+    @staticmethod
+    def from_env():
+        """Rutas desde GHOSTLYCAT_TARGET_DEVICES, p. ej. "gato1:0-0.5,gato2:0.5-1"."""
+        specs = os.environ.get(TARGET_DEVICES_ENV, "")
+        return DetectionRouter(
+            [ControllerRoute.parse(spec) for spec in specs.split(",") if spec.strip()]
+        )
+
+    def topics(self):
+        if not self.routes:
+            return [MQTT_DETECTIONS_TOPIC]
+        return [device_topic(MQTT_DETECTIONS_TOPIC, route.device) for route in self.routes]
+
+    def route(self, frame: FrameDetections) -> List[Tuple[str, FrameDetections]]:
+        if not self.routes:
+            return [(MQTT_DETECTIONS_TOPIC, frame)]
+
+        routed = []
+        for route in self.routes:
+            detections = tuple(
+                detection
+                for detection in frame.detections
+                if route.accepts(detection.centroid_x, frame.frame_width)
+            )
+            if detections:
+                routed.append(
+                    (
+                        device_topic(MQTT_DETECTIONS_TOPIC, route.device),
+                        dataclasses.replace(frame, detections=detections),
+                    )
+                )
+        return routed
@@ -0,0 +1,99 @@
+import collections
+import json
+import threading
+from pathlib import Path
+
+# Etapas del recorrido de un frame, de la cámara al servo
+STAGE_INFERENCE = "inference"  # captura -> fin de la inferencia
+STAGE_PUBLISH = "publish"  # fin de la inferencia -> publicación
+STAGE_TRANSPORT = "transport"  # publicación -> recepción en cat_control
+STAGE_QUEUE = "queue"  # recepción -> el handler toma el mensaje
+STAGE_MOTION = "motion"  # el handler toma el mensaje -> primera escritura al servo
+STAGE_TOTAL = "total"  # captura -> primera escritura al servo
+STAGES = (STAGE_INFERENCE, STAGE_PUBLISH, STAGE_TRANSPORT, STAGE_QUEUE, STAGE_MOTION, STAGE_TOTAL)
+
+
+class LatencyHistogram:
+    """Ventana móvil de las últimas ``window`` latencias (en segundos) de una etapa."""
+
+    def __init__(self, window: int = 512):
+        self.samples = collections.deque(maxlen=window)
+        self.count = 0
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def percentile(self, fraction: float, ordered=None):
+        ordered = ordered if ordered is not None else sorted(self.samples)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+    def summary(self):
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "p50_ms": _to_ms(self.percentile(0.50, ordered)),
+            "p95_ms": _to_ms(self.percentile(0.95, ordered)),
+            "p99_ms": _to_ms(self.percentile(0.99, ordered)),
+        }
+
+
+def _to_ms(seconds):
+    return None if seconds is None else round(seconds * 1000.0, 2)
+
+
+class LatencyTracker:
+    """Histogramas de latencia por etapa a partir de los timestamps de cada mensaje."""
+
+    def __init__(self, window: int = 512):
+        self.window = window
+        self.histograms = {stage: LatencyHistogram(window) for stage in STAGES}
+        self.lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float):
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = LatencyHistogram(self.window)
+            histogram.record(seconds)
+
+    def record_trace(
+        self,
+        capture_time: float,
+        inference_time: float,
+        publish_time: float,
+        received_time: float,
+        dequeued_time: float,
+        servo_time: float,
+    ):
+        """Registra todas las etapas de un mensaje; los timestamps en 0 se omiten."""
+        stamps = [
+            (STAGE_INFERENCE, capture_time, inference_time),
+            (STAGE_PUBLISH, inference_time, publish_time),
+            (STAGE_TRANSPORT, publish_time, received_time),
+            (STAGE_QUEUE, received_time, dequeued_time),
+            (STAGE_MOTION, dequeued_time, servo_time),
+            (STAGE_TOTAL, capture_time, servo_time),
+        ]
+        for stage, start, end in stamps:
+            if start and end:
+                self.record(stage, end - start)
+
+    def percentile(self, stage: str, fraction: float):
+        """Percentil en segundos de una etapa; None si aún no hay muestras."""
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            return histogram.percentile(fraction) if histogram is not None else None
+
+    def summary(self):
+        with self.lock:
+            return {stage: histogram.summary() for stage, histogram in self.histograms.items()}
+
+    def write(self, path: Path):
+        """Escribe el resumen en JSON (p. ej. en /var/ghostlycat/metrics)."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.summary(), indent=2))
+        tmp_path.replace(path)
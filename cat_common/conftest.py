@@ -0,0 +1,6 @@
+"""Configuración de pytest para cat_common.
+
+Al cargarse, pytest agrega este directorio al sys.path, así que el paquete ``cat_common`` se
+importa igual con ``python -m pytest cat_common/tests`` desde la raíz del repositorio que con
+``python -m pytest tests`` desde aquí.
+"""
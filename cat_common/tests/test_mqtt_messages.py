@@ -0,0 +1,153 @@
+"""Ida y vuelta de los formatos de cable de CatTelemetry y FrameDetections.
+
+Los payloads de versiones anteriores se arman aquí a mano con los formatos de struct tal como
+se publicaron, para que un cambio en el decodificador que rompa a productores viejos falle.
+"""
+import json
+import struct
+
+import pytest
+
+from cat_common.mqtt_messages import (
+    MSG_FRAME_DETECTIONS,
+    MSG_TELEMETRY,
+    CatTelemetry,
+    FaceDetection,
+    FrameDetections,
+)
+
+FRAME_V1 = "<BBIdHHH"
+FRAME_V2 = "<BBIdddHHH"
+DETECTION_FRAME_V1 = "<iiiiiifB"
+DETECTION_FRAME_V3 = "<iiiiiifIB"
+DETECTION_FRAME_V4 = "<iiiiiifffIB"
+
+# Valores exactos en float32 para poder comparar sin tolerancia
+DETECTIONS = (
+    FaceDetection(10, 20, 110, 140, 60, 80, 0.75, "michi", 7, 12.5, -3.25),
+    FaceDetection(300, 40, 360, 100, 330, 70, 0.5, "", 8, 0.0, 0.0),
+)
+
+
+def pack_frame(version, frame_format, detection_format, fields):
+    """Payload con el encabezado ``fields`` y DETECTIONS en ``detection_format``."""
+    parts = [struct.pack(frame_format, version, MSG_FRAME_DETECTIONS, *fields, len(DETECTIONS))]
+    for d in DETECTIONS:
+        identity = d.identity.encode("utf-8")
+        values = [d.x1, d.y1, d.x2, d.y2, d.centroid_x, d.centroid_y, d.confidence]
+        if detection_format == DETECTION_FRAME_V4:
+            values += [d.velocity_x, d.velocity_y]
+        if detection_format != DETECTION_FRAME_V1:
+            values.append(d.track_id)
+        parts.append(struct.pack(detection_format, *values, len(identity)))
+        parts.append(identity)
+    return b"".join(parts)
+
+
+def expected_detections(track_id=True, velocity=True):
+    """DETECTIONS sin los campos que un formato anterior no transporta."""
+    return tuple(
+        FaceDetection(
+            d.x1,
+            d.y1,
+            d.x2,
+            d.y2,
+            d.centroid_x,
+            d.centroid_y,
+            d.confidence,
+            d.identity,
+            d.track_id if track_id else 0,
+            d.velocity_x if velocity else 0.0,
+            d.velocity_y if velocity else 0.0,
+        )
+        for d in DETECTIONS
+    )
+
+
+def test_telemetry_round_trip():
+    telemetry = CatTelemetry(320, 240, 1700000000.25)
+    assert CatTelemetry.from_bytes(telemetry.to_bytes()) == telemetry
+
+
+def test_telemetry_v1():
+    payload = struct.pack("<BBii", 1, MSG_TELEMETRY, -5, 480)
+    assert CatTelemetry.from_bytes(payload) == CatTelemetry(-5, 480)
+
+
+def test_telemetry_json():
+    telemetry = CatTelemetry(320, 240, 1700000000.25)
+    assert CatTelemetry.from_bytes(telemetry.to_json_bytes()) == telemetry
+    assert CatTelemetry.from_bytes(b'{"centroid_x": 1, "centroid_y": 2}') == CatTelemetry(1, 2)
+
+
+def test_telemetry_rejects_other_kinds():
+    payload = struct.pack("<BBii", 1, MSG_FRAME_DETECTIONS, 0, 0)
+    with pytest.raises(ValueError):
+        CatTelemetry.from_bytes(payload)
+
+
+def test_frame_v1():
+    payload = pack_frame(1, FRAME_V1, DETECTION_FRAME_V1, (42, 100.5, 640, 480))
+    assert FrameDetections.from_bytes(payload) == FrameDetections(
+        42, 100.5, 640, 480, expected_detections(track_id=False, velocity=False)
+    )
+
+
+def test_frame_unknown_version():
+    payload = struct.pack(FRAME_V1, 99, MSG_FRAME_DETECTIONS, 0, 0.0, 0, 0, 0)
+    with pytest.raises(ValueError):
+        FrameDetections.from_bytes(payload)
+
+
+def test_frame_json_without_new_fields():
+    """JSON de un productor anterior a track_id, velocidad y tiempos de inferencia."""
+    payload = json.dumps(
+        {
+            "frame_seq": 3,
+            "capture_time": 5.0,
+            "frame_width": 640,
+            "frame_height": 480,
+            "detections": [
+                {"box": [10, 20, 110, 140], "centroid_x": 60, "centroid_y": 80},
+            ],
+        }
+    ).encode("utf-8")
+    assert FrameDetections.from_bytes(payload) == FrameDetections(
+        3, 5.0, 640, 480, (FaceDetection(10, 20, 110, 140, 60, 80),)
+    )
+
+
+def test_frame_v2():
+    payload = pack_frame(2, FRAME_V2, DETECTION_FRAME_V1, (42, 100.5, 100.75, 101.0, 640, 480))
+    assert FrameDetections.from_bytes(payload) == FrameDetections(
+        42, 100.5, 640, 480, expected_detections(track_id=False, velocity=False), 100.75, 101.0
+    )
+
+
+def test_frame_round_trip():
+    frame = FrameDetections(42, 100.5, 640, 480, DETECTIONS, 100.75, 101.0)
+    assert FrameDetections.from_bytes(frame.to_bytes()) == frame
+
+
+def test_frame_round_trip_without_detections():
+    frame = FrameDetections(0xFFFFFFFF, 1.0, 1280, 720, (), 2.0, 3.0)
+    assert FrameDetections.from_bytes(frame.to_bytes()) == frame
+
+
+def test_frame_json():
+    frame = FrameDetections(42, 100.5, 640, 480, DETECTIONS, 100.75, 101.0)
+    assert FrameDetections.from_bytes(frame.to_json_bytes()) == frame
+
+
+def test_frame_v3():
+    payload = pack_frame(3, FRAME_V2, DETECTION_FRAME_V3, (42, 100.5, 100.75, 101.0, 640, 480))
+    assert FrameDetections.from_bytes(payload) == FrameDetections(
+        42, 100.5, 640, 480, expected_detections(velocity=False), 100.75, 101.0
+    )
+
+
+def test_frame_v4():
+    payload = pack_frame(4, FRAME_V2, DETECTION_FRAME_V4, (42, 100.5, 100.75, 101.0, 640, 480))
+    assert FrameDetections.from_bytes(payload) == FrameDetections(
+        42, 100.5, 640, 480, expected_detections(), 100.75, 101.0
+    )
@@ -0,0 +1,70 @@
+"""SharedMemoryRing: lectura en orden, vuelta del ring y conteo de mensajes perdidos."""
+import pytest
+
+from cat_common.shm_transport import SharedMemoryRing
+
+
+@pytest.fixture
+def ring_path(tmp_path):
+    return str(tmp_path / "test.ring")
+
+
+def message(index):
+    return ("cat/detections", f"payload {index}".encode("utf-8"))
+
+
+def write(ring, indexes):
+    for index in indexes:
+        topic, payload = message(index)
+        ring.write(topic.encode("utf-8"), payload)
+
+
+def test_read_in_order(ring_path):
+    writer = SharedMemoryRing(ring_path, slot_count=4, slot_size=64)
+    reader = SharedMemoryRing(ring_path, slot_count=4, slot_size=64)
+    write(writer, range(3))
+    assert reader.read() == [message(i) for i in range(3)]
+    assert reader.read() == []
+    assert reader.dropped == 0
+
+
+def test_wraparound(ring_path):
+    writer = SharedMemoryRing(ring_path, slot_count=4, slot_size=64)
+    reader = SharedMemoryRing(ring_path, slot_count=4, slot_size=64)
+    for start in range(0, 12, 3):
+        write(writer, range(start, start + 3))
+        assert reader.read() == [message(i) for i in range(start, start + 3)]
+    assert reader.dropped == 0
+
+
+def test_slow_reader_counts_dropped(ring_path):
+    writer = SharedMemoryRing(ring_path, slot_count=4, slot_size=64)
+    reader = SharedMemoryRing(ring_path, slot_count=4, slot_size=64)
+    write(writer, range(6))
+    assert reader.read() == [message(i) for i in range(2, 6)]
+    assert reader.dropped == 2
+
+    write(writer, range(6, 15))
+    assert reader.read() == [message(i) for i in range(11, 15)]
+    assert reader.dropped == 7
+
+
+def test_new_reader_starts_at_write_seq(ring_path):
+    writer = SharedMemoryRing(ring_path, slot_count=4, slot_size=64)
+    write(writer, range(3))
+    reader = SharedMemoryRing(ring_path, slot_count=4, slot_size=64)
+    assert reader.read() == []
+    write(writer, [3])
+    assert reader.read() == [message(3)]
+
+
+def test_message_larger_than_slot(ring_path):
+    ring = SharedMemoryRing(ring_path, slot_count=4, slot_size=64)
+    with pytest.raises(ValueError):
+        ring.write(b"cat/detections", bytes(64))
+
+
+def test_dimension_mismatch(ring_path):
+    SharedMemoryRing(ring_path, slot_count=4, slot_size=64)
+    with pytest.raises(ValueError):
+        SharedMemoryRing(ring_path, slot_count=8, slot_size=64)
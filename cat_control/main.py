@@ -1,7 +1,20 @@
 import asyncio
 import time
 from adafruit_servokit import ServoKit
-from cat_common.mqtt_messages import CatTelemetry, MQTTClient, MQTT_TOPIC, MQTT_FACE_TOPIC
+from cat_common.async_mqtt import AsyncMQTTClient
+from cat_common.kalman import predict_detection
+from cat_common.shm_transport import transport_from_env
+from cat_common.staleness import staleness_filter_from_env
+from cat_common.topics import device_id, device_topic, share_group
+from cat_common.tracing import STAGE_MOTION, LatencyTracker
+from cat_common.mqtt_messages import (
+    CatTelemetry,
+    DELIVERY_LATEST,
+    FrameDetections,
+    MQTT_DETECTIONS_TOPIC,
+    MQTT_TOPIC,
+    MQTT_FACE_TOPIC,
+)
 from abc import ABC
 import random
 import queue
@@ -11,6 +24,10 @@ from pathlib import Path
 IMAGE_WIDTH = 1920
 IMAGE_HEIGHT = 1080
 MIN_PIXELS_TO_PROCESS = 100
+LATENCY_REPORT_INTERVAL = 30  # Segundos entre reportes de latencia
+LATENCY_METRICS_PATH = Path("/var/ghostlycat/metrics/latency.json")
+# "1" para adelantar el objetivo con su velocidad
+PREDICT_LATENCY_ENV = "GHOSTLYCAT_PREDICT_LATENCY"
 
 
 def convert_audio(target_path: Path, current_audio: Path):
@@ -65,19 +82,26 @@ class AbstractServo(ABC):
         await asyncio.sleep(1)
 
     async def move_servo_with_steps(self, target_angle, steps=20):
-        """ Mueve el servo suavemente desde el ángulo actual hacia el ángulo objetivo en pasos. """
+        """ Mueve el servo suavemente desde el ángulo actual hacia el ángulo objetivo en pasos.
+
+        Regresa el momento (time.time()) de la primera escritura al PCA9685.
+        """
         step_size = (target_angle - self.current_angle) / steps
         total_time = abs(target_angle - self.current_angle) * 0.005
         step_delay = total_time / steps
+        first_write_time = None
 
         for _ in range(steps):
             self.current_angle += step_size
             self.current_angle = max(self.min_angle, min(self.max_angle, self.current_angle))
             self.kit.servo[self.servo_channel].angle = self.current_angle
+            if first_write_time is None:
+                first_write_time = time.time()
             await asyncio.sleep(step_delay)
 
         #print(f"Servo {self.__class__.__name__} movido en pasos a {target_angle}° en {total_time:.2f} segundos")
         self.current_angle = target_angle
+        return first_write_time
 
     async def move_naturally(self, stop_flag = None, audio_playing_event=None):
         while True:
@@ -191,17 +215,41 @@ class ServoController:
         self.left_right_servo = LeftRightServo(self.kit)
         self.up_down_servo = UpDownServo(self.kit)
         self.eye_brightness = EyeBrightnessControl(self.kit)
-        self.mqtt_client = MQTTClient()
+        self.mqtt_client = AsyncMQTTClient(
+            transport=transport_from_env(), share_group=share_group()
+        )
+        # Topics globales (un solo gato) y los de este dispositivo (cat/<device>/...)
+        self.device_id = device_id()
+        telemetry_topics = (MQTT_TOPIC, device_topic(MQTT_TOPIC, self.device_id))
+        detections_topics = (
+            MQTT_DETECTIONS_TOPIC,
+            device_topic(MQTT_DETECTIONS_TOPIC, self.device_id),
+        )
+        # Mientras los servos se mueven solo se conserva la telemetría más reciente
+        for topic in telemetry_topics:
+            self.mqtt_client.register_handler(
+                topic, self.handle_telemetry, concurrency=1, mode=DELIVERY_LATEST
+            )
+        for topic in detections_topics:
+            self.mqtt_client.register_handler(
+                topic, self.handle_detections, concurrency=1, mode=DELIVERY_LATEST
+            )
+        #self.mqtt_client.register_handler(MQTT_FACE_TOPIC, self.handle_recognized_face)
         self.mqtt_client.run()
         self.last_telemetry_time = 0
         self.min_time_between_updates = 0.4  # Tiempo mínimo entre movimientos (200ms)
         self.last_centroid = None  # Último centroide procesado
+        self.last_target = None  # Última cara seguida dentro de un FrameDetections
         self.stop_natural_movement = asyncio.Event()
         self.audio_playing_event = asyncio.Event()
         self.last_message_time = time.time()
         self.time_without_messages = 5 
         self.audio_queue = asyncio.Queue()
         self.last_audio_played = None  
+        self.latency_tracker = LatencyTracker()
+        # Descarta la telemetría que llega después de su deadline en lugar de mover la cabeza
+        self.staleness = staleness_filter_from_env()
+        self.predict_latency = os.environ.get(PREDICT_LATENCY_ENV, "0") == "1"
 
         # self.audio_files = {
         #     "yare": YARE_AUDIO,
@@ -283,40 +331,118 @@ class ServoController:
         self.last_centroid = telemetry
         return True
 
-    async def control_servos(self, telemetry: CatTelemetry):
+    def select_target(self, frame: FrameDetections):
+        """Elige la cara a seguir: el mismo track, la más cercana al objetivo anterior o la
+        más grande."""
+        if not frame.detections:
+            return None
+
+        same_track = [
+            detection
+            for detection in frame.detections
+            if self.last_target is not None
+            and self.last_target.track_id
+            and detection.track_id == self.last_target.track_id
+        ]
+        if same_track:
+            target = same_track[0]
+        elif self.last_target is None:
+            target = max(frame.detections, key=lambda detection: detection.area)
+        else:
+            last_x, last_y = self.last_target.centroid_x, self.last_target.centroid_y
+            target = min(
+                frame.detections,
+                key=lambda detection: (detection.centroid_x - last_x) ** 2
+                + (detection.centroid_y - last_y) ** 2,
+            )
+
+        self.last_target = target
+        return target
+
+    async def control_servos(self, telemetry: CatTelemetry, frame_width=IMAGE_WIDTH, frame_height=IMAGE_HEIGHT):
         """ Mapea las coordenadas del centroide a los ángulos de los servos y los mueve suavemente. """
-        servo_left_right_mapped_angle = self.map_value(telemetry.centroid_x, 0, IMAGE_WIDTH, self.left_right_servo.max_angle, self.left_right_servo.min_angle)
-        servo_up_down_mapped_angle = self.map_value(telemetry.centroid_y, 0, IMAGE_HEIGHT, self.up_down_servo.max_angle, self.up_down_servo.min_angle)
+        servo_left_right_mapped_angle = self.map_value(telemetry.centroid_x, 0, frame_width, self.left_right_servo.max_angle, self.left_right_servo.min_angle)
+        servo_up_down_mapped_angle = self.map_value(telemetry.centroid_y, 0, frame_height, self.up_down_servo.max_angle, self.up_down_servo.min_angle)
 
         # Mover los servos suavemente a los ángulos calculados
-        await self.left_right_servo.move_servo_with_steps(servo_left_right_mapped_angle, 50)
+        first_write_time = await self.left_right_servo.move_servo_with_steps(servo_left_right_mapped_angle, 50)
         await self.up_down_servo.move_servo_with_steps(servo_up_down_mapped_angle, 50)
+        return first_write_time
+
+    async def handle_telemetry(self, topic, payload, received_time):
+        telemetry = CatTelemetry.from_bytes(payload)
+        if self.staleness.is_stale(telemetry.capture_time, 0.0, received_time, time.time()):
+            return
+        self.stop_natural_movement.set()
+        await self.control_servos(telemetry)
+        self.last_message_time = time.time()
+
+    async def handle_detections(self, topic, payload, received_time):
+        dequeued_time = time.time()
+        frame = FrameDetections.from_bytes(payload)
+        if self.staleness.is_stale(
+            frame.capture_time, frame.publish_time, received_time, dequeued_time
+        ):
+            return
+        target = self.select_target(frame)
+        if target is not None:
+            self.stop_natural_movement.set()
+            aim = target
+            if self.predict_latency:
+                aim = self.predict_target(target, frame, dequeued_time)
+            servo_time = await self.control_servos(aim, frame.frame_width, frame.frame_height)
+            self.last_message_time = time.time()
+            self.latency_tracker.record_trace(
+                frame.capture_time,
+                frame.inference_time,
+                frame.publish_time,
+                received_time,
+                dequeued_time,
+                servo_time,
+            )
+
+    def predict_target(self, target, frame: FrameDetections, now: float):
+        """Apunta a donde estará la cara en la primera escritura al servo.
+
+        Adelanta el centroide con su velocidad por la edad del mensaje más la p50 de
+        STAGE_MOTION, que termina al escribir el ángulo, no cuando el servo llega a él.
+        """
+        age = self.staleness.age(frame.capture_time, now) or 0.0
+        motion = self.latency_tracker.percentile(STAGE_MOTION, 0.5) or 0.0
+        x, y = predict_detection(
+            target, max(age, 0.0) + motion, frame.frame_width, frame.frame_height
+        )
+        return CatTelemetry(int(x), int(y), frame.capture_time)
+
+    async def handle_recognized_face(self, topic, payload, received_time):
+        face_detected = payload.decode("utf-8")
+        #print(f"Rostro detectado: {face_detected}")
+        #await self.play_face_audio(face_detected)
 
-    async def process_mqtt_messages(self):
+    async def report_latency(self):
+        """ Publica periódicamente los percentiles de latencia por etapa. """
         while True:
+            await asyncio.sleep(LATENCY_REPORT_INTERVAL)
+            summary = self.latency_tracker.summary()
+            print(f"Latencia por etapa: {summary}")
+            print(f"Buzones MQTT: {self.mqtt_client.stats()}")
+            print(f"Telemetría vieja descartada: {self.staleness.stats()}")
             try:
-                topic, payload = self.mqtt_client.mqtt_queue.get_nowait()
-                if topic == MQTT_TOPIC:
-                    telemetry = CatTelemetry.from_bytes(payload)
-                    self.stop_natural_movement.set()   
-                    await self.control_servos(telemetry)   
-                    self.last_message_time = time.time()
-                elif topic == MQTT_FACE_TOPIC:
-                    face_detected = payload.decode("utf-8")
-                    #print(face_detected)
-                    #print(f"Rostro detectado: {face_detected}")
-                    #await self.play_face_audio(face_detected)
-                #print(f"Centroid recibido: X={centroid_x}, Y={centroid_y}")     
-                #if self.should_process_telemetry(telemetry):      
-               
-                
-                                
-            except queue.Empty:
-                await asyncio.sleep(0.01)
-                if time.time() - self.last_message_time > self.time_without_messages:
-                    self.stop_natural_movement.clear()
-            except Exception as exc:
-                print(exc)
+                self.latency_tracker.write(LATENCY_METRICS_PATH)
+            except OSError as exc:
+                print(f"No se pudieron guardar las métricas de latencia: {exc}")
+
+    async def watch_idle(self):
+        """ Regresa al movimiento natural cuando deja de llegar telemetría. """
+        while True:
+            remaining = self.last_message_time + self.time_without_messages - time.time()
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+                continue
+            if self.stop_natural_movement.is_set():
+                self.stop_natural_movement.clear()
+                self.last_target = None
+            await asyncio.sleep(self.time_without_messages)
 
 
     async def main(self):
@@ -324,7 +450,8 @@ class ServoController:
         #await self.play_face_audio("hola")
         # Ejecutar los movimientos naturales de cada servo
         await asyncio.gather(
-            self.process_mqtt_messages(),
+            self.watch_idle(),
+            self.report_latency(),
             self.tail_servo.move_naturally(),      
             self.mouth_servo.move_naturally(audio_playing_event=self.audio_playing_event),
             self.eye_brightness.move_naturally(),  
@@ -0,0 +1,62 @@
+"""Benchmark de la cascada de Haar: frame completo contra frame reducido y mosaicos.
+
+La referencia es el camino original (escala de grises a resolución completa, ``minSize`` 30);
+para cada configuración se reporta la latencia p50/p95 por frame y ``recall``, la fracción de
+las caras de la referencia que también encontró (IoU >= 0.5).
+
+Uso (desde cat_video):
+    python3 -m benchmarks.haar
+    python3 -m benchmarks.haar --source images+loop --size 1920x1080 --widths 640 960 --tiles 2x2
+"""
+import argparse
+
+import cv2
+
+from modules.detectors import (
+    HaarBackend,
+    calibrate,
+    calibration_frames,
+    format_recall,
+    parse_grid,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", default="images+loop", help="ver open_frame_source")
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--size", default="1920x1080", help="resolución de la cámara a simular")
+    parser.add_argument("--widths", type=int, nargs="+", default=[960, 640])
+    parser.add_argument("--tiles", nargs="+", default=["1x1", "2x2"])
+    parser.add_argument("--workers", type=int, default=None, help="hilos para los mosaicos")
+    args = parser.parse_args()
+
+    width, height = (int(value) for value in args.size.split("x"))
+    frames = calibration_frames(args.source, args.frames)
+    frames = [cv2.resize(frame, (width, height)) for frame in frames]
+    if not frames:
+        parser.error(f"Sin frames en {args.source}")
+
+    backends = [HaarBackend(detect_width=0, tiles=(1, 1))]
+    backends[0].name = "original"
+    for detect_width in args.widths:
+        for tiles in args.tiles:
+            backend = HaarBackend(
+                detect_width=detect_width, tiles=parse_grid(tiles), workers=args.workers
+            )
+            backend.name = f"{detect_width}px_{tiles}"
+            backends.append(backend)
+    for backend in backends:
+        backend.load()
+
+    results = calibrate(backends, frames)
+    print(f"\n{len(frames)} frames de {args.size}")
+    for result in results:
+        print(
+            f"  {result.name:>12}: p50 {result.latency_p50 * 1000:7.1f} ms, "
+            f"p95 {result.latency_p95 * 1000:7.1f} ms, recall {format_recall(result.recall)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
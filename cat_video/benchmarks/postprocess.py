@@ -0,0 +1,145 @@
+"""Benchmark del post-procesamiento: ciclo por caja contra modules.postprocess.
+
+Simula la salida del SSD (200 propuestas, de las que 0, 1 o muchas pasan el umbral) y la de
+YOLOv5-face después del NMS (cajas y 10 coordenadas de landmarks en la entrada de 640), y
+mide el camino original (un ciclo de Python por propuesta, un arreglo de escala por caja y
+diez clamps para los landmarks) contra el vectorizado, hasta tener los FaceDetection.
+
+Uso (desde cat_video):
+    python3 -m benchmarks.postprocess
+    python3 -m benchmarks.postprocess --faces 0 1 5 50 --repeat 2000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from cat_common.mqtt_messages import FaceDetection
+from modules.detectors import Detections
+from modules.postprocess import keep_mask, scale_coords_landmarks, scale_to_frame
+
+FRAME_WIDTH, FRAME_HEIGHT = 1920, 1080
+INPUT_SHAPE = (384, 640)  # Entrada con letterbox de YOLOv5-face para 1920x1080
+SSD_PROPOSALS = 200
+
+
+def ssd_output(faces, rng):
+    """Salida (1, 1, 200, 7) del SSD con ``faces`` propuestas sobre el umbral."""
+    output = np.zeros((1, 1, SSD_PROPOSALS, 7), np.float32)
+    corners = rng.uniform(0.0, 0.8, (SSD_PROPOSALS, 2))
+    sizes = rng.uniform(0.05, 0.2, (SSD_PROPOSALS, 2))
+    output[0, 0, :, 3:5] = corners
+    output[0, 0, :, 5:7] = corners + sizes
+    output[0, 0, :, 2] = rng.uniform(0.0, 0.4, SSD_PROPOSALS)
+    output[0, 0, :faces, 2] = rng.uniform(0.6, 1.0, faces)
+    return output
+
+
+def yolo_output(faces, rng):
+    """Detecciones (N, 16) de YOLOv5-face después del NMS: caja, confianza, landmarks, clase."""
+    det = np.zeros((faces, 16), np.float32)
+    corners = rng.uniform(0, 500, (faces, 2)) + [0, 12]
+    det[:, 0:2] = corners
+    det[:, 2:4] = corners + rng.uniform(40, 120, (faces, 2))
+    det[:, 4] = rng.uniform(0.6, 1.0, faces)
+    det[:, 5:15] = np.tile(corners, 5) + rng.uniform(0, 40, (faces, 10))
+    return det
+
+
+def legacy_ssd(output):
+    faces = []
+    for i in range(0, output.shape[2]):
+        confidence = output[0, 0, i, 2]
+        if confidence > 0.5:
+            box = output[0, 0, i, 3:7] * np.array(
+                [FRAME_WIDTH, FRAME_HEIGHT, FRAME_WIDTH, FRAME_HEIGHT]
+            )
+            (startX, startY, endX, endY) = box.astype("int")
+            faces.append(FaceDetection.from_box(startX, startY, endX, endY, float(confidence)))
+    return faces
+
+
+def vectorized_ssd(output):
+    output = output[0, 0]
+    scale = np.array([FRAME_WIDTH, FRAME_HEIGHT, FRAME_WIDTH, FRAME_HEIGHT], np.float32)
+    detections = Detections(output[:, 3:7] * scale, output[:, 2])
+    detections = detections.filter(keep_mask(detections.boxes, detections.confidences, 0.5, 0))
+    return detections.to_faces()
+
+
+def _legacy_clamp_landmarks(coords, shape):
+    """scale_coords_landmarks original, con np.clip en lugar de clamp_ para no requerir torch."""
+    gain = min(INPUT_SHAPE[0] / shape[0], INPUT_SHAPE[1] / shape[1])
+    pad = (INPUT_SHAPE[1] - shape[1] * gain) / 2, (INPUT_SHAPE[0] - shape[0] * gain) / 2
+    coords[:, [0, 2, 4, 6, 8]] -= pad[0]
+    coords[:, [1, 3, 5, 7, 9]] -= pad[1]
+    coords[:, :10] /= gain
+    for column in range(10):
+        limit = shape[1] if column % 2 == 0 else shape[0]
+        np.clip(coords[:, column], 0, limit, out=coords[:, column])
+    return coords
+
+
+def legacy_yolo(det):
+    det = det.copy()
+    shape = (FRAME_HEIGHT, FRAME_WIDTH, 3)
+    gain = min(INPUT_SHAPE[0] / shape[0], INPUT_SHAPE[1] / shape[1])
+    pad = (INPUT_SHAPE[1] - shape[1] * gain) / 2, (INPUT_SHAPE[0] - shape[0] * gain) / 2
+    det[:, [0, 2]] -= pad[0]
+    det[:, [1, 3]] -= pad[1]
+    det[:, :4] /= gain
+    for column in range(4):
+        limit = shape[1] if column % 2 == 0 else shape[0]
+        np.clip(det[:, column], 0, limit, out=det[:, column])
+    det[:, :4] = det[:, :4].round()
+    det[:, 5:15] = _legacy_clamp_landmarks(det[:, 5:15], shape).round()
+    faces = []
+    for j in range(det.shape[0]):
+        xyxy = det[j, :4].tolist()
+        x1, y1, x2, y2 = (int(value) for value in xyxy)
+        faces.append(FaceDetection.from_box(x1, y1, x2, y2, float(det[j, 4])))
+    return faces
+
+
+def vectorized_yolo(det):
+    det = det.copy()
+    shape = (FRAME_HEIGHT, FRAME_WIDTH, 3)
+    boxes = np.round(scale_to_frame(INPUT_SHAPE, det[:, :4], shape))
+    landmarks = np.round(scale_coords_landmarks(INPUT_SHAPE, det[:, 5:15], shape))
+    return Detections(boxes, det[:, 4], landmarks).to_faces()
+
+
+def time_call(function, argument, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(argument)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--faces", type=int, nargs="+", default=[0, 1, 50])
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for faces in args.faces:
+        ssd = ssd_output(faces, rng)
+        yolo = yolo_output(faces, rng)
+        assert legacy_ssd(ssd) == vectorized_ssd(ssd)
+        assert legacy_yolo(yolo) == vectorized_yolo(yolo)
+        print(f"\n{faces} caras")
+        for name, legacy, vectorized, data in (
+            ("SSD", legacy_ssd, vectorized_ssd, ssd),
+            ("YOLOv5-face", legacy_yolo, vectorized_yolo, yolo),
+        ):
+            before = time_call(legacy, data, args.repeat)
+            after = time_call(vectorized, data, args.repeat)
+            print(
+                f"  {name:>11}: original {before * 1e6:8.1f} us, "
+                f"vectorizado {after * 1e6:8.1f} us ({before / after:.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Comparación de precisión y latencia de YOLOv5-face en CPU: PyTorch FP32 contra ONNX.
+
+Corre sobre el mismo conjunto fijo de frames el modelo original de PyTorch (FP32, modo eager,
+forzado a CPU) y cada .onnx disponible (FP32, INT8, FP16) con ONNX Runtime y con OpenCV DNN.
+La referencia de precisión es el modelo de PyTorch; si torch no está instalado, el ONNX FP32.
+Reporta latencia p50/p95 por frame y ``recall``: la fracción de las caras de la referencia que
+también encontró cada variante (IoU >= 0.5).
+
+Uso (desde cat_video, después de ``python3 export_onnx.py --int8 --fp16``):
+    python3 -m benchmarks.yolo_cpu --source images+loop --frames 50 --threads 4
+"""
+import argparse
+import json
+from dataclasses import asdict
+from pathlib import Path
+
+from modules.detectors import (
+    YOLO_ONNX_PATH,
+    YoloFaceBackend,
+    YoloOnnxBackend,
+    calibrate,
+    calibration_frames,
+    format_recall,
+)
+
+RUNTIMES = ("onnxruntime", "opencv")
+
+
+def variant_paths(fp32_path: Path):
+    return {
+        "fp32": fp32_path,
+        "int8": fp32_path.with_name(f"{fp32_path.stem}-int8.onnx"),
+        "fp16": fp32_path.with_name(f"{fp32_path.stem}-fp16.onnx"),
+    }
+
+
+def load_backends(fp32_path: Path, threads: int, runtimes):
+    backends = []
+    # Modo eager de verdad: sin trazar y sin tocar la caché de modelos de producción
+    eager = YoloFaceBackend(device="cpu", trace=False)
+    if eager.available():
+        if threads:
+            import torch
+
+            torch.set_num_threads(threads)
+        eager.load()
+        eager.name = "pytorch_fp32"
+        backends.append(eager)
+    else:
+        print("PyTorch o yolov5-face no disponibles: la referencia es ONNX FP32")
+
+    for precision, path in variant_paths(fp32_path).items():
+        if not path.exists():
+            print(f"No existe {path}, se omite {precision}")
+            continue
+        for runtime in runtimes:
+            backend = YoloOnnxBackend(path, runtime=runtime, threads=threads)
+            try:
+                backend.load()
+            except Exception as exc:  # Runtime no instalado u operador no soportado
+                print(f"{precision} con {runtime} no se pudo cargar: {exc}")
+                continue
+            backend.name = f"onnx_{precision}_{runtime}"
+            backends.append(backend)
+    return backends
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", type=Path, default=YOLO_ONNX_PATH, help="ONNX FP32")
+    parser.add_argument("--source", default="images+loop", help="ver open_frame_source")
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=None, help="hilos de inferencia")
+    parser.add_argument("--runtimes", nargs="+", choices=RUNTIMES, default=list(RUNTIMES))
+    parser.add_argument("--output", type=Path, default=None, help="guardar resultados en JSON")
+    args = parser.parse_args()
+
+    backends = load_backends(args.model, args.threads, args.runtimes)
+    if not backends:
+        parser.error("No hay modelos para comparar")
+    frames = calibration_frames(args.source, args.frames)
+    if not frames:
+        parser.error(f"Sin frames en {args.source}")
+
+    results = calibrate(backends, frames)
+    print(f"\n{len(frames)} frames, referencia {results[0].name}")
+    for result in results:
+        print(
+            f"  {result.name:>24}: p50 {result.latency_p50 * 1000:7.1f} ms, "
+            f"p95 {result.latency_p95 * 1000:7.1f} ms, recall {format_recall(result.recall)}"
+        )
+    if args.output:
+        args.output.write_text(json.dumps([asdict(result) for result in results], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Benchmark del preprocesamiento de YOLOv5-face: camino original contra LetterboxPreprocessor.
+
+Mide el tiempo por frame y el pico de memoria reservada durante cada frame (tracemalloc, que
+ve los buffers de numpy) a varias resoluciones. Sin torch instalado la conversión a float se
+hace con numpy en los dos caminos; con torch se usa el tensor del modelo, cuyas reservas no ve
+tracemalloc.
+
+También mide los recortes del ROI (RoiDetector), que cambian de tamaño casi en cada frame:
+recortes ajustados a la caja, cada uno de otra forma, contra los cuadrados redondeados a
+``bucket`` que usa RoiDetector.
+
+Uso (desde cat_video):
+    python3 -m benchmarks.yolo_preprocess
+    python3 -m benchmarks.yolo_preprocess --frames 500 --sizes 1280x720 1920x1080
+"""
+import argparse
+import copy
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from modules.detectors import HaarBackend
+from modules.preprocess import LetterboxPreprocessor
+from modules.roi import RoiDetector
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+try:
+    from utils.datasets import letterbox
+except ImportError:
+    letterbox = None
+
+
+def _letterbox(img, new_shape=640, stride=32, color=(114, 114, 114)):
+    """Mismo relleno que ``utils.datasets.letterbox(auto=True)`` si yolov5-face no está."""
+    height, width = img.shape[:2]
+    ratio = min(new_shape / height, new_shape / width)
+    new_unpad = int(round(width * ratio)), int(round(height * ratio))
+    dw, dh = (new_shape - new_unpad[0]) % stride / 2, (new_shape - new_unpad[1]) % stride / 2
+    if (width, height) != new_unpad:
+        img = cv2.resize(img, new_unpad, interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    img = cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
+    return img, ratio, (dw, dh)
+
+
+def legacy_preprocess(frame, img_size=640):
+    """El camino que tenía capture_video en main_yolov.py."""
+    orgimg = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    img0 = copy.deepcopy(orgimg)
+    h0, w0 = orgimg.shape[:2]
+    r = img_size / max(h0, w0)
+    if r != 1:
+        interp = cv2.INTER_AREA if r < 1 else cv2.INTER_LINEAR
+        img0 = cv2.resize(img0, (int(w0 * r), int(h0 * r)), interpolation=interp)
+    img = (letterbox or _letterbox)(img0, new_shape=img_size)[0]
+    img = img.transpose(2, 0, 1).copy()
+    if torch is not None:
+        img = torch.from_numpy(img).float()
+        img /= 255.0
+        return img.unsqueeze(0)
+    img = img.astype(np.float32)
+    img /= 255.0
+    return img[None]
+
+
+def time_per_frame(preprocess, frames, warmup=5):
+    for frame in frames[:warmup]:
+        preprocess(frame)
+    start = time.perf_counter()
+    for frame in frames:
+        preprocess(frame)
+    return (time.perf_counter() - start) / len(frames)
+
+
+def peak_allocated(preprocess, frames):
+    """Pico promedio de memoria reservada durante una llamada, en bytes."""
+    preprocess(frames[0])
+    peaks = []
+    for frame in frames:
+        # Reiniciar tracemalloc en cada llamada reinicia el pico (reset_peak no existe en 3.6)
+        tracemalloc.start()
+        preprocess(frame)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return sum(peaks) / len(peaks)
+
+
+def roi_crops(frame, count, bucketed, seed=0):
+    """Recortes alrededor de cajas al azar, como los de RoiDetector (con o sin redondeo)."""
+    rng = np.random.RandomState(seed)
+    roi = RoiDetector(HaarBackend()) if bucketed else None
+    height, width = frame.shape[:2]
+    crops = []
+    while len(crops) < count:
+        size = rng.uniform(60, 250)
+        x, y = rng.uniform(size, width - size), rng.uniform(size, height - size)
+        box = np.array([[x - size / 2, y - size / 2, x + size / 2, y + size / 2]])
+        if roi is not None:
+            roi.last_boxes = box
+            region = roi.region(frame.shape)
+            if region is None:
+                continue
+            x1, y1, x2, y2 = region
+        else:
+            half = max(size * 2.5, 320) / 2
+            x1, y1 = int(max(x - half, 0)), int(max(y - half * rng.uniform(0.8, 1.2), 0))
+            x2, y2 = int(min(x + half, width)), int(min(y + half, height))
+        crops.append(frame[y1:y2, x1:x2])
+    return crops
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--image", default="images/zidane.jpg")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--img-size", type=int, default=640)
+    parser.add_argument("--sizes", nargs="+", default=["1280x720", "1920x1080"])
+    args = parser.parse_args()
+
+    image = cv2.imread(args.image)
+    if image is None:
+        parser.error(f"No se pudo leer {args.image}")
+    print(
+        f"torch: {'sí' if torch is not None else 'no'}, "
+        f"letterbox de yolov5-face: {'sí' if letterbox is not None else 'no'}"
+    )
+
+    for size in args.sizes:
+        width, height = (int(value) for value in size.split("x"))
+        base = cv2.resize(image, (width, height))
+        # Frames distintos para que ninguna caché favorezca a un camino
+        frames = [np.roll(base, shift * 8, axis=1) for shift in range(8)]
+        frames = (frames * (args.frames // len(frames) + 1))[:args.frames]
+
+        preprocessor = (
+            LetterboxPreprocessor(args.img_size, torch=torch, device="cpu")
+            if torch is not None
+            else LetterboxPreprocessor(args.img_size)
+        )
+        # Sin torch, la entrada float del modelo es el blob de numpy
+        prepare = preprocessor.to_tensor if torch is not None else preprocessor.to_blob
+        paths = (
+            ("original", lambda frame: legacy_preprocess(frame, args.img_size)),
+            ("sin reservas", prepare),
+        )
+        reference = legacy_preprocess(frames[0], args.img_size)
+        result = prepare(frames[0])
+        difference = float(np.abs(np.asarray(reference) - np.asarray(result)).max())
+        print(f"\n{size} -> entrada {tuple(result.shape)}, diferencia máxima {difference:.4f}")
+        for name, preprocess in paths:
+            per_frame = time_per_frame(preprocess, frames)
+            allocated = peak_allocated(preprocess, frames[:20])
+            print(
+                f"  {name:>12}: {per_frame * 1000:7.2f} ms/frame, "
+                f"{allocated / 1e6:6.2f} MB reservados/frame"
+            )
+
+        for name, bucketed in (("ROI ajustado", False), ("ROI cuadrado", True)):
+            crops = roi_crops(base, args.frames, bucketed)
+            per_frame = time_per_frame(prepare, crops)
+            allocated = peak_allocated(prepare, crops[:20])
+            shapes = len({crop.shape for crop in crops})
+            print(
+                f"  {name:>12}: {per_frame * 1000:7.2f} ms/frame, "
+                f"{allocated / 1e6:6.2f} MB reservados/frame ({shapes} formas de recorte)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,12 @@
 # -*- coding: UTF-8 -*-
 import argparse
+import hashlib
+import json
+import queue
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
 import sys
 import os
@@ -33,42 +39,14 @@ from utils.general import (
 from utils.plots import plot_one_box
 from utils.torch_utils import select_device, load_classifier, time_synchronized
 
+from modules.postprocess import scale_coords_landmarks
+
 
 def load_model(weights, device):
     model = attempt_load(weights, map_location=device)  # load FP32 model
     return model
 
 
-def scale_coords_landmarks(img1_shape, coords, img0_shape, ratio_pad=None):
-    # Rescale coords (xyxy) from img1_shape to img0_shape
-    if ratio_pad is None:  # calculate from img0_shape
-        gain = min(
-            img1_shape[0] / img0_shape[0], img1_shape[1] / img0_shape[1]
-        )  # gain  = old / new
-        pad = (img1_shape[1] - img0_shape[1] * gain) / 2, (
-            img1_shape[0] - img0_shape[0] * gain
-        ) / 2  # wh padding
-    else:
-        gain = ratio_pad[0][0]
-        pad = ratio_pad[1]
-
-    coords[:, [0, 2, 4, 6, 8]] -= pad[0]  # x padding
-    coords[:, [1, 3, 5, 7, 9]] -= pad[1]  # y padding
-    coords[:, :10] /= gain
-    # clip_coords(coords, img0_shape)
-    coords[:, 0].clamp_(0, img0_shape[1])  # x1
-    coords[:, 1].clamp_(0, img0_shape[0])  # y1
-    coords[:, 2].clamp_(0, img0_shape[1])  # x2
-    coords[:, 3].clamp_(0, img0_shape[0])  # y2
-    coords[:, 4].clamp_(0, img0_shape[1])  # x3
-    coords[:, 5].clamp_(0, img0_shape[0])  # y3
-    coords[:, 6].clamp_(0, img0_shape[1])  # x4
-    coords[:, 7].clamp_(0, img0_shape[0])  # y4
-    coords[:, 8].clamp_(0, img0_shape[1])  # x5
-    coords[:, 9].clamp_(0, img0_shape[0])  # y5
-    return coords
-
-
 def show_results(img, xyxy, conf, landmarks, class_num):
     h, w, c = img.shape
     tl = 1 or round(0.002 * (h + w) / 2) + 1  # line/font thickness
@@ -120,6 +98,7 @@ def detect(model, source, device, project, name, exist_ok, save_img, view_img):
         dataset = LoadImages(source, img_size=imgsz)
         bs = 1  # batch_size
     vid_path, vid_writer = [None] * bs, [None] * bs
+    imgsz = check_img_size(img_size, s=model.stride.max())  # check img_size
 
     for path, im, im0s, vid_cap in dataset:
 
@@ -136,8 +115,6 @@ def detect(model, source, device, project, name, exist_ok, save_img, view_img):
             interp = cv2.INTER_AREA if r < 1 else cv2.INTER_LINEAR
             img0 = cv2.resize(img0, (int(w0 * r), int(h0 * r)), interpolation=interp)
 
-        imgsz = check_img_size(img_size, s=model.stride.max())  # check img_size
-
         img = letterbox(img0, new_shape=imgsz)[0]
         # Convert from w,h,c to c,w,h
         img = img.transpose(2, 0, 1).copy()
@@ -217,6 +194,293 @@ def detect(model, source, device, project, name, exist_ok, save_img, view_img):
                         print(e)
 
 
+# Modo offline -----------------------------------------------------------------------------
+# Para carpetas de fotos y grabaciones: la lectura, el hash, la decodificación y el letterbox
+# corren en un pool de hilos, un archivo por hilo, mientras el modelo procesa lotes de
+# ``batch_size`` frames en una sola pasada. Cada archivo terminado se agrega como una línea al
+# manifiesto JSONL; al volver a correr se saltan los archivos cuyo hash de contenido ya está en
+# el manifiesto.
+
+
+@dataclass
+class ManifestRecord:
+    path: str
+    sha256: str
+    kind: str  # "image" o "video"
+    frames: int = 0
+    processed: int = 0
+    closed: bool = False  # Ya se leyeron todos los frames del archivo
+    error: str = ""
+    detections: list = field(default_factory=list)
+
+    @property
+    def complete(self):
+        return self.closed and self.processed >= self.frames
+
+    def to_json(self):
+        record = {
+            "path": self.path,
+            "sha256": self.sha256,
+            "kind": self.kind,
+            "frames": self.frames,
+            "detections": self.detections,
+        }
+        if self.error:
+            record["error"] = self.error
+        return json.dumps(record)
+
+
+@dataclass
+class PreparedFrame:
+    record: ManifestRecord
+    frame_index: int
+    image: np.ndarray  # RGB, CHW, uint8, ya con letterbox; None si no se pudo leer
+    shape: tuple = ()  # Forma del frame original
+    ratio_pad: tuple = ()
+
+
+@dataclass
+class FileEnd:
+    record: ManifestRecord
+    frames: int
+
+
+def file_sha256(path: Path, data: bytes = None, chunk_size: int = 1 << 20):
+    digest = hashlib.sha256()
+    if data is not None:
+        digest.update(data)
+        return digest.hexdigest()
+    with open(path, "rb") as stream:
+        for chunk in iter(lambda: stream.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(path: Path):
+    """Hashes de los archivos ya procesados en el manifiesto.
+
+    Los registros con ``error`` (archivos que no se pudieron leer) se quedan en el manifiesto
+    como constancia pero no cuentan como hechos: se vuelven a intentar en la siguiente corrida.
+    """
+    done = set()
+    if not path.exists():
+        return done
+    with open(path) as manifest:
+        for line in manifest:
+            try:
+                record = json.loads(line)
+                if record.get("error"):
+                    continue
+                done.add(record["sha256"])
+            except (ValueError, KeyError):
+                continue  # Línea incompleta de una corrida interrumpida
+    return done
+
+
+def list_media(source: Path):
+    formats = {"." + extension for extension in img_formats + vid_formats}
+    if source.is_dir():
+        return sorted(path for path in source.rglob("*") if path.suffix.lower() in formats)
+    return [source]
+
+
+def prepare_frame(record, frame_index, img0, img_size):
+    """Escala y rellena el frame a img_size x img_size.
+
+    El tamaño es fijo para que todos los frames de un lote tengan la misma forma; al reducir se
+    usa INTER_AREA, como en ``detect``.
+    """
+    if img0 is None:
+        return PreparedFrame(record, frame_index, None)
+    h0, w0 = img0.shape[:2]
+    r = img_size / max(h0, w0)
+    img = img0
+    if r != 1:
+        interp = cv2.INTER_AREA if r < 1 else cv2.INTER_LINEAR
+        img = cv2.resize(img0, (int(round(w0 * r)), int(round(h0 * r))), interpolation=interp)
+    img, _, pad = letterbox(img, new_shape=img_size, auto=False)
+    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    return PreparedFrame(
+        record,
+        frame_index,
+        np.ascontiguousarray(img.transpose(2, 0, 1)),
+        img0.shape,
+        ((r, r), pad),
+    )
+
+
+def prepare_image(record, data, img_size):
+    img0 = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    return prepare_frame(record, 0, img0, img_size)
+
+
+def produce_file(path, image_suffixes, done_hashes, frames_queue, img_size):
+    """Lee, decodifica y prepara un archivo completo en un hilo del pool.
+
+    Encola sus PreparedFrame y al final un FileEnd. Regresa False si se saltó por hash. Un
+    error de lectura no detiene la corrida: queda en ``record.error`` del manifiesto.
+    """
+    kind = "image" if path.suffix.lower() in image_suffixes else "video"
+    record = ManifestRecord(str(path), "", kind)
+    frame_index = 0
+    try:
+        if kind == "image":
+            data = path.read_bytes()
+            record.sha256 = file_sha256(path, data)
+            if record.sha256 in done_hashes:
+                return False
+            frames_queue.put(prepare_image(record, data, img_size))
+            frame_index = 1
+        else:
+            record.sha256 = file_sha256(path)
+            if record.sha256 in done_hashes:
+                return False
+            cap = cv2.VideoCapture(str(path))
+            try:
+                while True:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    frames_queue.put(prepare_frame(record, frame_index, frame, img_size))
+                    frame_index += 1
+            finally:
+                cap.release()
+            if not frame_index:
+                record.error = "no se pudo leer"
+    except Exception as exc:
+        record.error = f"{type(exc).__name__}: {exc}"
+        print(f"Error leyendo {path}: {record.error}")
+    frames_queue.put(FileEnd(record, frame_index))
+    return True
+
+
+def produce_frames(files, done_hashes, pool, frames_queue, img_size, stats):
+    """Reparte los archivos entre los hilos del pool (uno por hilo) y encola None al final.
+
+    Cada hilo decodifica su archivo completo, así que varios videos se decodifican en paralelo;
+    la cola acotada frena a los hilos cuando van demasiado adelante del modelo.
+    """
+    image_suffixes = {"." + extension for extension in img_formats}
+    try:
+        futures = [
+            pool.submit(produce_file, path, image_suffixes, done_hashes, frames_queue, img_size)
+            for path in files
+        ]
+        for future in futures:
+            if not future.result():
+                stats["skipped"] += 1
+    finally:
+        frames_queue.put(None)
+
+
+def detect_batch(model, batch, device, conf_thres, iou_thres):
+    """Una pasada del modelo y NMS para todo el lote; agrega las caras a cada registro."""
+    img = torch.from_numpy(np.stack([prepared.image for prepared in batch])).to(device)
+    img = img.float()
+    img /= 255.0
+    with torch.no_grad():
+        pred = model(img)[0]
+    pred = non_max_suppression_face(pred, conf_thres, iou_thres)
+
+    for prepared, det in zip(batch, pred):
+        if len(det):
+            det[:, :4] = scale_coords(
+                img.shape[2:], det[:, :4], prepared.shape, prepared.ratio_pad
+            ).round()
+            det[:, 5:15] = scale_coords_landmarks(
+                img.shape[2:], det[:, 5:15], prepared.shape, prepared.ratio_pad
+            ).round()
+            for row in det.cpu().numpy():
+                prepared.record.detections.append(
+                    {
+                        "frame": prepared.frame_index,
+                        "box": [int(value) for value in row[:4]],
+                        "confidence": round(float(row[4]), 4),
+                        "landmarks": [int(value) for value in row[5:15]],
+                    }
+                )
+        prepared.record.processed += 1
+
+
+def detect_offline(
+    model,
+    source,
+    device,
+    manifest_path,
+    img_size=640,
+    batch_size=8,
+    workers=None,
+    conf_thres=0.6,
+    iou_thres=0.5,
+):
+    imgsz = check_img_size(img_size, s=model.stride.max())  # check img_size
+    manifest_path = Path(manifest_path)
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    done_hashes = load_manifest(manifest_path)
+    files = list_media(Path(source))
+    print(f"{len(files)} archivos, {len(done_hashes)} ya en {manifest_path}")
+
+    stats = {"skipped": 0, "files": 0, "frames": 0}
+    # La cola acotada es el prefetch: los hilos se adelantan a lo más unos cuantos lotes
+    frames_queue = queue.Queue(maxsize=batch_size * 4)
+    pool = ThreadPoolExecutor(max_workers=workers or os.cpu_count())
+    producer = threading.Thread(
+        target=produce_frames,
+        args=(files, done_hashes, pool, frames_queue, imgsz, stats),
+        daemon=True,
+    )
+    start = time.perf_counter()
+    producer.start()
+
+    batch = []
+    open_records = []
+    with open(manifest_path, "a") as manifest:
+
+        def write_complete():
+            for record in [record for record in open_records if record.complete]:
+                open_records.remove(record)
+                manifest.write(record.to_json() + "\n")
+                stats["files"] += 1
+            manifest.flush()
+
+        while True:
+            item = frames_queue.get()
+            if item is None:
+                break
+            if isinstance(item, FileEnd):
+                item.record.frames = item.frames
+                item.record.closed = True
+                open_records.append(item.record)
+                write_complete()
+                continue
+
+            if item.image is None:
+                item.record.error = "no se pudo leer"
+                item.record.processed += 1
+                continue
+            batch.append(item)
+            if len(batch) == batch_size:
+                detect_batch(model, batch, device, conf_thres, iou_thres)
+                stats["frames"] += len(batch)
+                batch = []
+                write_complete()
+
+        if batch:
+            detect_batch(model, batch, device, conf_thres, iou_thres)
+            stats["frames"] += len(batch)
+        write_complete()
+
+    producer.join()
+    pool.shutdown()
+    elapsed = time.perf_counter() - start
+    print(
+        f"{stats['files']} archivos ({stats['frames']} frames) en {elapsed:.1f} s, "
+        f"{stats['frames'] / elapsed if elapsed else 0:.1f} frames/s; "
+        f"{stats['skipped']} saltados por hash"
+    )
+    return stats
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument(
@@ -239,10 +503,30 @@ if __name__ == "__main__":
     )
     parser.add_argument("--save-img", action="store_true", help="save results")
     parser.add_argument("--view-img", action="store_true", help="show results")
+    parser.add_argument(
+        "--offline", action="store_true", help="batched run over a folder, results to --manifest"
+    )
+    parser.add_argument(
+        "--manifest", type=Path, default=None, help="JSONL manifest (project/manifest.jsonl)"
+    )
+    parser.add_argument("--batch-size", type=int, default=8, help="frames per forward pass")
+    parser.add_argument("--workers", type=int, default=None, help="decode threads (default: cpus)")
     opt = parser.parse_args()
 
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     model = load_model(opt.weights, device)
-    detect(
-        model, opt.source, device, opt.project, opt.name, opt.exist_ok, opt.save_img, opt.view_img
-    )
+    if opt.offline:
+        detect_offline(
+            model,
+            opt.source,
+            device,
+            opt.manifest or Path(opt.project) / "manifest.jsonl",
+            opt.img_size,
+            opt.batch_size,
+            opt.workers,
+        )
+    else:
+        detect(
+            model, opt.source, device, opt.project, opt.name, opt.exist_ok,
+            opt.save_img, opt.view_img,
+        )
@@ -0,0 +1,159 @@
+"""Exporta YOLOv5-face a ONNX para correrlo en CPU sin torch (YoloOnnxBackend).
+
+Genera el modelo FP32 con un tamaño de entrada fijo (el letterbox de la resolución de la
+cámara) y, opcionalmente, una versión cuantizada a INT8 (cuantización estática de ONNX
+Runtime, calibrada con frames reales) y otra en FP16. Junto a cada .onnx queda un .json con
+la forma de entrada, el stride, la precisión y el hash de los pesos de origen.
+
+Uso (desde cat_video, en el contenedor con yolov5-face en el PYTHONPATH):
+    python3 export_onnx.py --weights models/yolov5n-0.5.pt --frame-size 1280x720
+    python3 export_onnx.py --int8 --fp16 --calibration /var/ghostlycat/videos/output.avi
+
+La calibración de INT8 necesita frames variados de la escena real (``--calibration``): los
+rangos de las activaciones salen de ellos.
+"""
+import argparse
+import json
+from pathlib import Path
+
+import torch
+
+from models.experimental import attempt_load
+
+from modules.frame_sources import distinct_frames, open_frame_source
+from modules.model_cache import file_sha256
+from modules.preprocess import LetterboxGeometry, LetterboxPreprocessor
+
+
+class _DecodedOutput(torch.nn.Module):
+    """Solo la salida decodificada (1, N, 16) del Detect, sin los mapas crudos por escala."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, images):
+        return self.model(images)[0]
+
+
+def write_info(onnx_path: Path, info: dict, precision: str):
+    """JSON junto al .onnx que YoloOnnxBackend lee para saber la entrada y la precisión."""
+    info = {**info, "precision": precision}
+    onnx_path.with_suffix(".json").write_text(json.dumps(info, indent=2))
+
+
+def export_fp32(weights: Path, output: Path, input_shape, opset: int = 13):
+    model = attempt_load(str(weights), map_location=torch.device("cpu"))  # fusionado, FP32
+    model.eval()
+    stride = int(model.stride.max())
+    dummy = torch.zeros((1, 3) + tuple(input_shape))
+    with torch.no_grad():
+        torch.onnx.export(
+            _DecodedOutput(model),
+            dummy,
+            str(output),
+            opset_version=opset,
+            input_names=["images"],
+            output_names=["output"],
+        )
+    return stride
+
+
+MIN_CALIBRATION_FRAMES = 16  # Frames distintos mínimos para calibrar INT8
+
+
+class _FrameReader:
+    """CalibrationDataReader de ONNX Runtime sobre frames reales con el letterbox del modelo."""
+
+    def __init__(self, spec: str, input_shape, input_name: str, count: int):
+        self.preprocessor = LetterboxPreprocessor(max(input_shape), input_shape=input_shape)
+        self.input_name = input_name
+        self.blobs = []
+        source = open_frame_source(spec, realtime=False)
+        while len(self.blobs) < count:
+            ret, frame = source.read()
+            if not ret:
+                break
+            self.blobs.append(self.preprocessor.to_blob(frame).copy())
+        source.release()
+        self.iterator = iter(self.blobs)
+
+    def get_next(self):
+        blob = next(self.iterator, None)
+        return None if blob is None else {self.input_name: blob}
+
+
+def quantize_int8(fp32_path: Path, output: Path, calibration: str, input_shape, count: int):
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+
+    reader = _FrameReader(calibration, input_shape, "images", count)
+    distinct = distinct_frames(reader.blobs)
+    if distinct < min(count, MIN_CALIBRATION_FRAMES):
+        raise SystemExit(
+            f"Solo {distinct} frames distintos de calibración en {calibration}; "
+            f"hacen falta {min(count, MIN_CALIBRATION_FRAMES)}"
+        )
+    quantize_static(
+        str(fp32_path),
+        str(output),
+        reader,
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+    )
+
+
+def convert_fp16(fp32_path: Path, output: Path):
+    import onnx
+    from onnxconverter_common import float16
+
+    model = float16.convert_float_to_float16(onnx.load(str(fp32_path)), keep_io_types=True)
+    onnx.save(model, str(output))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--weights", type=Path, default=Path("models/yolov5n-0.5.pt"))
+    parser.add_argument("--output", type=Path, default=None, help="por defecto junto a los pesos")
+    parser.add_argument("--frame-size", default="1280x720", help="resolución de la cámara")
+    parser.add_argument("--img-size", type=int, default=640)
+    parser.add_argument("--int8", action="store_true", help="también la versión cuantizada")
+    parser.add_argument("--fp16", action="store_true", help="también la versión FP16")
+    parser.add_argument("--calibration", help="frames para INT8 (obligatorio con --int8)")
+    parser.add_argument("--calibration-frames", type=int, default=32)
+    parser.add_argument("--opset", type=int, default=13, help="13+ para INT8 por canal")
+    args = parser.parse_args()
+    if args.int8 and not args.calibration:
+        parser.error("--int8 necesita --calibration con frames reales de la escena")
+
+    width, height = (int(value) for value in args.frame_size.split("x"))
+    geometry = LetterboxGeometry.for_shape((height, width), args.img_size)
+    input_shape = (geometry.height, geometry.width)
+    fp32_path = args.output or args.weights.with_suffix(".onnx")
+
+    stride = export_fp32(args.weights, fp32_path, input_shape, args.opset)
+    info = {
+        "input_shape": list(input_shape),
+        "stride": stride,
+        "weights": str(args.weights),
+        "weights_sha256": file_sha256(args.weights),
+        "torch": torch.__version__,
+    }
+    write_info(fp32_path, info, "fp32")
+    print(f"FP32: {fp32_path} (entrada {input_shape})")
+
+    if args.int8:
+        int8_path = fp32_path.with_name(f"{fp32_path.stem}-int8.onnx")
+        quantize_int8(fp32_path, int8_path, args.calibration, input_shape, args.calibration_frames)
+        write_info(int8_path, info, "int8")
+        print(f"INT8: {int8_path}")
+    if args.fp16:
+        fp16_path = fp32_path.with_name(f"{fp32_path.stem}-fp16.onnx")
+        convert_fp16(fp32_path, fp16_path)
+        write_info(fp16_path, info, "fp16")
+        print(f"FP16: {fp16_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,57 @@
 import cv2
-import numpy as np
 import time
 from pathlib import Path
-from cat_common.mqtt_messages import CatTelemetry, MQTTClient, MQTT_TOPIC, MQTT_FACE_TOPIC
+from cat_common.mqtt_messages import (
+    FrameDetections,
+    MQTTClient,
+)
+from cat_common.kalman import DetectionSmoother, smoother_from_env
+from cat_common.publisher import RateLimitedPublisher
+from cat_common.shm_transport import transport_from_env
+from cat_common.topics import DetectionRouter
+from modules.detectors import DetectorBackend, detector_from_env
 from modules.face_manager import FaceTrainer
+from modules.frame_grabber import FrameGrabber
+from modules.frame_sources import ArgusSource, FrameSource, frame_source_from_env
+from modules.motion import motion_gate_from_env
+from modules.postprocess import normalized_boxes
+from modules.rate_control import RateController, rate_controller_from_env
+from modules.roi import roi_from_env
+from modules.startup import BackgroundLoader, StartupTimer
+from modules.tracking import TRACKED_MAX_RATE, DetectThenTrack, detect_every_from_env
+
+DETECTIONS_MAX_RATE = 10  # Mensajes por segundo hacia cat_control
+FRAME_TIMEOUT = 5.0  # Segundos sin frames nuevos antes de dar la cámara por perdida
+FRAME_WIDTH, FRAME_HEIGHT = 1920, 1080  # Resolución configurada de la cámara
 
 
 class CatFaceDetector:
-    def __init__(self, model_path: Path, prototxt_path:Path, mqtt_client: MQTTClient, face_trainer:FaceTrainer=None, video_output_path: Path=None, draw_boxes:bool=False, fps_limit:int=10):
-        self.model_path = str(model_path)
-        self.prototxt_path = str(prototxt_path)
+    def __init__(self, backend: DetectorBackend, mqtt_client: MQTTClient, face_trainer:FaceTrainer=None, video_output_path: Path=None, draw_boxes:bool=False, rate: RateController=None, router: DetectionRouter=None, source: FrameSource=None, detect_every: int=1, smoother: DetectionSmoother=None, startup: StartupTimer=None):
+        self.backend = backend
+        # Con detect_every > 1 el detector corre cada N frames y entre ellos se siguen las caras
+        self.tracker = DetectThenTrack(backend, detect_every)
         self.mqtt_client = mqtt_client
+        self.router = router or DetectionRouter()
+        self.smoother = smoother
+        self.startup = startup
         self.draw_boxes = draw_boxes
-        self.fps_limit = 1 / fps_limit
-        self.last_processed_time = time.monotonic()
         self.face_trainer = face_trainer
-       
-
-        self.net = cv2.dnn.readNetFromCaffe(self.prototxt_path, self.model_path)
 
-        self.gst_pipeline = (
-            "nvarguscamerasrc sensor-id=0 ! "
-            "video/x-raw(memory:NVMM), width=1920, height=1080, format=NV12, framerate=30/1 ! "
-            "nvvidconv ! video/x-raw, format=BGRx ! videoconvert ! appsink max-buffers=1 drop=true"
-        )
+        source = source or ArgusSource(1920, 1080)
+        # Frecuencia adaptativa: sube con una cara a la vista y baja sin nadie, por calor o carga.
+        # Reproduciendo sin pausas (modo "fast") se procesan todos los frames
+        self.rate = rate or rate_controller_from_env(source.realtime)
 
-        self.cap = cv2.VideoCapture(self.gst_pipeline, cv2.CAP_GSTREAMER)
+        # La cámara se lee en su propio hilo; la inferencia toma siempre el frame más reciente
+        self.cap = FrameGrabber(source)
 
         if not self.cap.isOpened():
             print("Error: No se pudo abrir la cámara.")
             exit()
 
-        self.frame_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        self.frame_height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.frame_width = self.cap.frame_width
+        self.frame_height = self.cap.frame_height
+        self.cap.start()
 
         if video_output_path:
             video_output_path.parent.mkdir(parents=True, exist_ok=True)
@@ -41,59 +60,62 @@ class CatFaceDetector:
         else:
             self.out = None
 
-    def publish_centroid(self, telemetry: CatTelemetry):
-        self.mqtt_client.publish(MQTT_TOPIC, telemetry.to_bytes())
-
-    def publish_recognized_name(self, name: str):
-        """Publicar el nombre de la persona reconocida"""       
-        self.mqtt_client.publish(MQTT_FACE_TOPIC, name.encode())
+    def publish_detections(self, frame_detections: FrameDetections):
+        """Publica las caras del frame en un solo mensaje por cada cat_control destino."""
+        if self.smoother:
+            frame_detections = self.smoother.apply(frame_detections)
+        # Se serializa al enviarse para que publish_time refleje el envío real
+        for topic, routed in self.router.route(frame_detections):
+            self.mqtt_client.publish(topic, routed)
 
     
     def process_frame(self):
-        ret, frame = self.cap.read()
+        # En lugar de leer y descartar frames, esperar el turno y tomar el más reciente
+        self.rate.wait()
 
-        if not ret:
+        grabbed = self.cap.read(timeout=FRAME_TIMEOUT)
+        if grabbed is None:
             print("Error: No se pudo capturar el frame.")
             return False
 
-        current_time = time.monotonic()
-
-        if (current_time - self.last_processed_time) < self.fps_limit:
-            return True
-
-        self.last_processed_time = current_time
-
-        blob = cv2.dnn.blobFromImage(frame, 1.0, (300, 300), (104.0, 177.0, 123.0), swapRB=False, crop=False)
-
-        self.net.setInput(blob)
-        detections = self.net.forward()
-
-        for i in range(0, detections.shape[2]):
-            confidence = detections[0, 0, i, 2]
-
-            if confidence > 0.5:
-                box = detections[0, 0, i, 3:7] * np.array([self.frame_width, self.frame_height, self.frame_width, self.frame_height])
-                (startX, startY, endX, endY) = box.astype("int")
-
-                if self.draw_boxes:
-                    cv2.rectangle(frame, (startX, startY), (endX, endY), (0, 255, 0), 2)
-                    text = f"{confidence * 100:.2f}%"
-                    y = startY - 10 if startY - 10 > 10 else startY + 10
-                    cv2.putText(frame, text, (startX, y), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 255, 0), 2)
-
-                centroid_x = (startX + endX) // 2
-                centroid_y = (startY + endY) // 2
-
-                self.publish_centroid(CatTelemetry(centroid_x, centroid_y))
-
-              
-
-                # Comparar con encodings entrenados     
-                if self.face_trainer:
-                    face_encoding = detections[0, 0, i, 3:7]
-                    name = self.face_trainer.compare_encodings(face_encoding)                
-                    # Publicar el nombre reconocido
-                    self.publish_recognized_name(name)
+        started = time.monotonic()
+        frame = grabbed.frame
+        capture_time = grabbed.capture_time
+
+        tracked = self.tracker.process(frame)
+        detections = tracked.detections
+        inference_time = time.time()
+
+        # Comparar con encodings entrenados (las cajas normalizadas, como en el entrenamiento)
+        names = None
+        if self.face_trainer and len(detections):
+            encodings = normalized_boxes(detections.boxes, self.frame_width, self.frame_height)
+            names = [self.face_trainer.compare_encodings(encoding) for encoding in encodings]
+
+        faces = detections.to_faces(names, tracked.track_ids)
+        if self.startup:
+            self.startup.frame_processed(bool(faces))
+
+        if self.draw_boxes:
+            for face in faces:
+                cv2.rectangle(frame, (face.x1, face.y1), (face.x2, face.y2), (0, 255, 0), 2)
+                text = f"{face.confidence * 100:.2f}%"
+                y = face.y1 - 10 if face.y1 - 10 > 10 else face.y1 + 10
+                cv2.putText(frame, text, (face.x1, y), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 255, 0), 2)
+
+        self.rate.update(time.monotonic() - started, bool(faces))
+
+        if faces:
+            self.publish_detections(
+                FrameDetections(
+                    frame_seq=grabbed.seq,
+                    capture_time=capture_time,
+                    frame_width=self.frame_width,
+                    frame_height=self.frame_height,
+                    detections=tuple(faces),
+                    inference_time=inference_time,
+                )
+            )
 
         if self.out:
             self.out.write(frame)
@@ -101,6 +123,13 @@ class CatFaceDetector:
         return True
 
     def release_resources(self):
+        print(f"Frame grabber stats: {self.cap.stats()}")
+        print(f"Tracker stats: {self.tracker.stats()}")
+        print(f"Detector stats: {self.backend.stats()}")
+        print(f"Rate stats: {self.rate.stats()}")
+        self.rate.write_metrics()
+        if self.startup:
+            print(f"Startup stats: {self.startup.stats()}")
         self.cap.release()
         if self.out:
             self.out.release()
@@ -119,21 +148,48 @@ class CatFaceDetector:
 
 
 if __name__ == "__main__":
+    START_TIME = time.monotonic()
+    # El modelo carga (desde la caché de modelos si se puede) mientras se abre la cámara
+    startup = StartupTimer(START_TIME)
+    # El calentamiento va detrás de la carga con la resolución configurada, sin esperar la cámara
+    loader = BackgroundLoader(
+        lambda: roi_from_env(detector_from_env()),
+        startup,
+        frame_shape=(FRAME_HEIGHT, FRAME_WIDTH, 3),
+    )
     MODEL_PATH = Path("models/res10_300x300_ssd_iter_140000.caffemodel")
     PROTOTXT_PATH = Path("models/deploy.prototxt.txt")
     VIDEO_OUTPUT_PATH = Path("/var/ghostlycat/videos/output.avi")
     ENCODINGS_PATH = Path("/var/ghostlycat/face_encodings/encodings.json")
     
-    mqtt_client = MQTTClient()
+    # El servicio de video solo publica: no se suscribe para no acumular sus propios mensajes
+    mqtt_client = MQTTClient(topics=(), transport=transport_from_env(), start_time=START_TIME)
     mqtt_client.client_start()
+    publisher = RateLimitedPublisher(mqtt_client)
+    router = DetectionRouter.from_env()
+    detect_every = detect_every_from_env()
+    max_rate = TRACKED_MAX_RATE if detect_every > 1 else DETECTIONS_MAX_RATE
+    for topic in router.topics():
+        publisher.set_rate(topic, max_rate=max_rate)
 
     #face_trainer = FaceTrainer(ENCODINGS_PATH, PROTOTXT_PATH, MODEL_PATH)
 
+    source = frame_source_from_env(FRAME_WIDTH, FRAME_HEIGHT)
+    startup.mark("camera_opened")
+
+    # GHOSTLYCAT_DETECTOR elige el modelo (ssd, haar, yolo, yolo_onnx o auto); por defecto el SSD
     detector = CatFaceDetector(
-        model_path=MODEL_PATH,
-        prototxt_path=PROTOTXT_PATH,
-        mqtt_client=mqtt_client,       
-        fps_limit=10
+        backend=motion_gate_from_env(loader.result()),
+        mqtt_client=publisher,
+        router=router,
+        source=source,
+        detect_every=detect_every,
+        smoother=smoother_from_env(),
+        startup=startup,
        
     )
-    detector.run()
+    try:
+        detector.run()
+    finally:
+        publisher.stop()
+        print(f"Publisher stats: {publisher.stats()}")
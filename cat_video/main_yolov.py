@@ -1,93 +1,50 @@
 import cv2
 import multiprocessing
+import queue
 import time
-import torch
-from models.experimental import attempt_load
-import copy
-from utils.datasets import letterbox
-from utils.general import check_img_size, non_max_suppression_face, scale_coords
-import json
-from cat_common.mqtt_messages import CatTelemetry, MQTTClient
-
-
-mqtt_client = MQTTClient()
-mqtt_client.client_start()
-
-
-def load_model(weights, device):
-    model = attempt_load(weights, map_location=device)  # load FP32 model
-    return model
-
-
-def publish_centroid(telemetry: CatTelemetry):
-    """Publica los centroides en formato JSON a través de MQTT."""
-    payload = json.dumps(telemetry.to_dict())
-    mqtt_client.publish(payload)
-    print(f"Published Centroids {payload}")
-
-
-def scale_coords_landmarks(img1_shape, coords, img0_shape, ratio_pad=None):
-    # Rescale coords (xyxy) from img1_shape to img0_shape
-    if ratio_pad is None:  # calculate from img0_shape
-        gain = min(
-            img1_shape[0] / img0_shape[0], img1_shape[1] / img0_shape[1]
-        )  # gain  = old / new
-        pad = (img1_shape[1] - img0_shape[1] * gain) / 2, (
-            img1_shape[0] - img0_shape[0] * gain
-        ) / 2  # wh padding
-    else:
-        gain = ratio_pad[0][0]
-        pad = ratio_pad[1]
-
-    coords[:, [0, 2, 4, 6, 8]] -= pad[0]  # x padding
-    coords[:, [1, 3, 5, 7, 9]] -= pad[1]  # y padding
-    coords[:, :10] /= gain
-    # clip_coords(coords, img0_shape)
-    coords[:, 0].clamp_(0, img0_shape[1])  # x1
-    coords[:, 1].clamp_(0, img0_shape[0])  # y1
-    coords[:, 2].clamp_(0, img0_shape[1])  # x2
-    coords[:, 3].clamp_(0, img0_shape[0])  # y2
-    coords[:, 4].clamp_(0, img0_shape[1])  # x3
-    coords[:, 5].clamp_(0, img0_shape[0])  # y3
-    coords[:, 6].clamp_(0, img0_shape[1])  # x4
-    coords[:, 7].clamp_(0, img0_shape[0])  # y4
-    coords[:, 8].clamp_(0, img0_shape[1])  # x5
-    coords[:, 9].clamp_(0, img0_shape[0])  # y5
-    return coords
-
-def calculate_centroid(xyxy, min_area=500):
-    """
-    Calcula el centroide de los bounding boxes y filtra por tamaño.
-
-    Parámetros:
-    - xyxy: Lista de coordenadas [x1, y1, x2, y2] que definen el bounding box.
-    - min_area: Área mínima requerida para considerar el bounding box.
-
-    Retorna:
-    - centroid: Una tupla con las coordenadas (centroid_x, centroid_y) del centroide si pasa el filtro.
-    - None: Si el bounding box es demasiado pequeño.
-    """
-    x1 = int(xyxy[0])
-    y1 = int(xyxy[1])
-    x2 = int(xyxy[2])
-    y2 = int(xyxy[3])
-
-    # Calcular el área del bounding box
-    bbox_width = x2 - x1
-    bbox_height = y2 - y1
-    bbox_area = bbox_width * bbox_height
-
-    # Filtrar bounding boxes que no cumplan con el tamaño mínimo
-    if bbox_area < min_area:
-        return None  # No retornar nada si el área es menor al umbral
-
-    # Calcular el centroide
-    centroid_x = (x1 + x2) / 2
-    centroid_y = (y1 + y2) / 2
-
-    # Retornar el centroide
-    return (centroid_x, centroid_y)
-
+from cat_common.mqtt_messages import (
+    FrameDetections,
+    MQTTClient,
+)
+from cat_common.kalman import smoother_from_env
+from cat_common.publisher import RateLimitedPublisher
+from cat_common.shm_transport import transport_from_env
+from cat_common.topics import DetectionRouter
+from modules.detectors import YoloFaceBackend, detector_from_env
+from modules.frame_grabber import FrameGrabber
+from modules.frame_sources import frame_source_from_env
+from modules.motion import motion_gate_from_env
+from modules.rate_control import rate_controller_from_env
+from modules.roi import roi_from_env
+from modules.startup import BackgroundLoader, StartupTimer
+from modules.tracking import TRACKED_MAX_RATE, DetectThenTrack, detect_every_from_env
+
+
+DETECTIONS_MAX_RATE = 10  # Mensajes por segundo hacia cat_control
+FRAME_TIMEOUT = 5.0  # Segundos sin frames nuevos antes de dar la cámara por perdida
+FRAME_WIDTH, FRAME_HEIGHT = 1280, 720  # Resolución configurada de la cámara
+
+
+def create_publisher(router: DetectionRouter, start_time: float = None):
+    """Crea el cliente MQTT y empieza a conectarlo en segundo plano, sin bloquear."""
+    # El servicio de video solo publica: no se suscribe para no acumular sus propios mensajes
+    mqtt_client = MQTTClient(topics=(), transport=transport_from_env(), start_time=start_time)
+    mqtt_client.client_start()
+    publisher = RateLimitedPublisher(mqtt_client)
+    max_rate = TRACKED_MAX_RATE if detect_every_from_env() > 1 else DETECTIONS_MAX_RATE
+    for topic in router.topics():
+        publisher.set_rate(topic, max_rate=max_rate)
+    return publisher
+
+
+def publish_detections(
+    publisher: RateLimitedPublisher, router: DetectionRouter, frame_detections: FrameDetections
+):
+    """Publica las caras de un frame en un solo mensaje binario por cada cat_control destino."""
+    # Se serializa al enviarse para que publish_time refleje el envío real
+    for topic, routed in router.route(frame_detections):
+        publisher.publish(topic, routed)
+    print(f"Published {len(frame_detections.detections)} detections")
 
 
 def show_results(img, xyxy, conf, landmarks, class_num, min_area=500):
@@ -137,138 +94,122 @@ def show_results(img, xyxy, conf, landmarks, class_num, min_area=500):
     # Retornar la imagen y el centroide si pasa el filtro de área
     return img, (centroid_x, centroid_y)
 
-def capture_video(centroid_queue):
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")    
-    print("Device is using: ", device)
-    img_size = 640
-    conf_thres = 0.6
-    iou_thres = 0.5  
-    last_processed_time = time.monotonic()
-    fps_interval = 0.5
-    min_area=10000
-    # Definir el pipeline GStreamer para utilizar nvarguscamerasrc
-    gst_pipeline = (
-        "nvarguscamerasrc sensor-id=0 sensor-mode=4 ! "
-        "video/x-raw(memory:NVMM), width=1280, height=720, format=NV12, framerate=30/1 ! "
-        "nvvidconv ! video/x-raw, format=BGRx ! "
-        "videoconvert ! video/x-raw, format=BGR ! "
-        "appsink max-buffers=1 drop=true"
+def capture_video(detections_queue, start_time: float = None):
+    startup = StartupTimer(start_time)
+    # YOLOv5-face (conf 0.6, IoU 0.5, área mínima 10000) salvo que GHOSTLYCAT_DETECTOR diga otro.
+    # Carga y calienta en un hilo (desde la caché de modelos si se puede) mientras se abre la
+    # cámara, con la resolución configurada.
+    # Con GHOSTLYCAT_ROI_EXPAND > 0 se busca alrededor de las últimas caras a resolución nativa
+    loader = BackgroundLoader(
+        lambda: roi_from_env(detector_from_env(default=YoloFaceBackend.name)),
+        startup,
+        frame_shape=(FRAME_HEIGHT, FRAME_WIDTH, 3),
     )
 
-    # Abrir la cámara con el pipeline GStreamer
-    cap = cv2.VideoCapture(gst_pipeline, cv2.CAP_GSTREAMER)
+    # Cámara (nvarguscamerasrc) o la fuente de GHOSTLYCAT_VIDEO_SOURCE; se lee en su propio hilo
+    source = frame_source_from_env(FRAME_WIDTH, FRAME_HEIGHT, sensor_mode=4)
+    # Frecuencia adaptativa: sube con una cara a la vista y baja sin nadie, por calor o carga.
+    # Reproduciendo sin pausas (modo "fast") se procesan todos los frames
+    rate = rate_controller_from_env(source.realtime)
+    cap = FrameGrabber(source)
 
     # Comprobar si la cámara se abrió correctamente
     if not cap.isOpened():
         print("Error: No se pudo abrir la cámara.")
         return
     
+    startup.mark("camera_opened")
     print("OPENCV and camera loaded, loading model..")
-    model = load_model("models/yolov5n-0.5.pt", device)
+    backend = loader.result()
+    # Con GHOSTLYCAT_MOTION_GATE=1 no se corre el modelo mientras la escena no cambie
+    backend = motion_gate_from_env(backend)
+    # Con GHOSTLYCAT_DETECT_EVERY > 1 el detector corre cada N frames y entre ellos se sigue
+    tracker = DetectThenTrack(backend, detect_every_from_env())
     print("Model Loaded")
+    cap.start()
 
-  
     while True:
-        # Capturar frame por frame
-        try:
-            ret, frame = cap.read()
-        except Exception as exc:
-            print(exc)
-
+        # Esperar el turno y tomar el frame más reciente en lugar de leer y descartar
+        rate.wait()
+        grabbed = cap.read(timeout=FRAME_TIMEOUT)
         # Si no se pudo capturar un frame, salir del bucle
-        if not ret:
+        if grabbed is None:
             print("Error: No se pudo recibir el frame.")
             break
 
         if cv2.waitKey(1) & 0xFF == ord("q"):
             break
 
-        current_time = time.monotonic()
-        if current_time - last_processed_time < fps_interval:
-            continue  # Si no ha pasado 1 segundo, continuar sin procesar
-        last_processed_time = current_time
+        started = time.monotonic()
+        frame = grabbed.frame
+        capture_time = grabbed.capture_time
         
-        orgimg = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        img0 = copy.deepcopy(orgimg)
-        im0 = copy.deepcopy(frame)
-        h0, w0 = orgimg.shape[:2]  # orig hw
-        r = img_size / max(h0, w0)  # resize image to img_size
-        if r != 1:  # always resize down, only resize up if training with augmentation
-            interp = cv2.INTER_AREA if r < 1 else cv2.INTER_LINEAR
-            img0 = cv2.resize(img0, (int(w0 * r), int(h0 * r)), interpolation=interp)
-
-        imgsz = check_img_size(img_size, s=model.stride.max())  # check img_size
-
-        img = letterbox(img0, new_shape=imgsz)[0]
-        # Convert from w,h,c to c,w,h
-        img = img.transpose(2, 0, 1).copy()
-
-        img = torch.from_numpy(img).to(device)
-        img = img.float()  # uint8 to fp16/32
-        img /= 255.0  # 0 - 255 to 0.0 - 1.0
-        if img.ndimension() == 3:
-            img = img.unsqueeze(0)
-
-        # Inference
-        pred = model(img)[0]
-        pred = non_max_suppression_face(pred, conf_thres, iou_thres)
-        #print(len(pred[0]), "face" if len(pred[0]) == 1 else "faces")
-
-        for i, det in enumerate(pred):  # detections per image
-            if len(det):
-                # Rescale boxes from img_size to im0 size
-                det[:, :4] = scale_coords(img.shape[2:], det[:, :4], im0.shape).round()
-
-                # Print results
-                for c in det[:, -1].unique():
-                    n = (det[:, -1] == c).sum()  # detections per class
-
-                det[:, 5:15] = scale_coords_landmarks(
-                    img.shape[2:], det[:, 5:15], im0.shape
-                ).round()
-
-                for j in range(det.size()[0]):
-                    xyxy = det[j, :4].view(-1).tolist()
-                    #conf = det[j, 4].cpu().numpy()
-                    #landmarks = det[j, 5:15].view(-1).tolist()
-                    #class_num = det[j, 15].cpu().numpy()
-
-                    #im0, centroid = show_results(im0, xyxy, conf, landmarks, class_num, min_area=min_area)
-                    centroids = calculate_centroid(xyxy, min_area)
-                    if centroids:
-                        centroid_x, centroid_y = centroids
-                        telemetry = CatTelemetry(centroid_x=centroid_x, centroid_y=centroid_y)
-                        centroid_queue.put(telemetry)
-
-        #cv2.imshow("Video de la cámara", im0)
+        tracked = tracker.process(frame)
+        detections = tracked.detections
+        inference_time = time.time()
+        faces = detections.to_faces(track_ids=tracked.track_ids)
+        startup.frame_processed(bool(faces))
+        rate.update(time.monotonic() - started, bool(faces))
+
+        if faces:
+            detections_queue.put(
+                FrameDetections(
+                    frame_seq=grabbed.seq,
+                    capture_time=capture_time,
+                    frame_width=frame.shape[1],
+                    frame_height=frame.shape[0],
+                    detections=tuple(faces),
+                    inference_time=inference_time,
+                )
+            )
+
+        #cv2.imshow("Video de la cámara", frame)
 
         # Salir del bucle si se presiona la tecla 'q'
 
     # Liberar la cámara y cerrar las ventanas
+    print(f"Frame grabber stats: {cap.stats()}")
+    print(f"Tracker stats: {tracker.stats()}")
+    print(f"Detector stats: {backend.stats()}")
+    print(f"Rate stats: {rate.stats()}")
+    rate.write_metrics()
+    print(f"Startup stats: {startup.stats()}")
     cap.release()
     cv2.destroyAllWindows()
 
 
 def start_video_capture():
+    start_time = time.monotonic()
     # Crear un proceso para la captura de video
-    centroid_queue = multiprocessing.Queue()
+    detections_queue = multiprocessing.Queue()
 
-    process = multiprocessing.Process(target=capture_video, args=(centroid_queue,))
+    process = multiprocessing.Process(target=capture_video, args=(detections_queue, start_time))
     process.start()
 
+    # La cámara y el modelo cargan en el proceso de captura mientras el broker se conecta
+    router = DetectionRouter.from_env()
+    publisher = create_publisher(router, start_time)
+    # Centroides filtrados con Kalman (posición y velocidad) si GHOSTLYCAT_CENTROID_FILTER=kalman
+    smoother = smoother_from_env()
+
     # Esperar a que el proceso termine
     try:
         while process.is_alive():
-            if not centroid_queue.empty():
-                telemetry = centroid_queue.get()
-                publish_centroid(telemetry)
-            time.sleep(0.5)
+            try:
+                frame_detections = detections_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if smoother:
+                frame_detections = smoother.apply(frame_detections)
+            publish_detections(publisher, router, frame_detections)
     except KeyboardInterrupt:
         print("Interrupcion detectada, cerrando proceso.")
     finally:
         if process.is_alive():
             process.terminate()
             process.join()
+        publisher.stop()
+        print(f"Publisher stats: {publisher.stats()}")
 
 
 if __name__ == "__main__":
@@ -1,56 +1,52 @@
 import cv2
 import multiprocessing
+import queue
 import time
-import json
-from cat_common.mqtt_messages import CatTelemetry, MQTTClient
+from cat_common.mqtt_messages import (
+    FrameDetections,
+    MQTTClient,
+)
+from cat_common.kalman import smoother_from_env
+from cat_common.publisher import RateLimitedPublisher
+from cat_common.shm_transport import transport_from_env
+from cat_common.topics import DetectionRouter
+from modules.detectors import HaarBackend, detector_from_env
+from modules.frame_grabber import FrameGrabber
+from modules.frame_sources import frame_source_from_env
+from modules.motion import motion_gate_from_env
+from modules.rate_control import rate_controller_from_env
+from modules.roi import roi_from_env
+from modules.startup import BackgroundLoader, StartupTimer
+from modules.tracking import TRACKED_MAX_RATE, DetectThenTrack, detect_every_from_env
 
 
-HAAR_CASCADE_PATH = "models/haarcascade_frontalface_default.xml"
 VIDEO_OUTPUT_PATH = "/var/ghostlycat/videos/output.avi"
 
-mqtt_client = MQTTClient()
-mqtt_client.client_start()
+DETECTIONS_MAX_RATE = 10  # Mensajes por segundo hacia cat_control
+FRAME_TIMEOUT = 5.0  # Segundos sin frames nuevos antes de dar la cámara por perdida
+FRAME_WIDTH, FRAME_HEIGHT = 1920, 1080  # Resolución configurada de la cámara
 
 
-def publish_centroid(telemetry: CatTelemetry):
-    """Publica los centroides en formato JSON a través de MQTT."""
-    payload = json.dumps(telemetry.to_dict())
-    mqtt_client.publish(payload)
-    print(f"Published Centroids {payload}")
+def create_publisher(router: DetectionRouter, start_time: float = None):
+    """Crea el cliente MQTT y empieza a conectarlo en segundo plano, sin bloquear."""
+    # El servicio de video solo publica: no se suscribe para no acumular sus propios mensajes
+    mqtt_client = MQTTClient(topics=(), transport=transport_from_env(), start_time=start_time)
+    mqtt_client.client_start()
+    publisher = RateLimitedPublisher(mqtt_client)
+    max_rate = TRACKED_MAX_RATE if detect_every_from_env() > 1 else DETECTIONS_MAX_RATE
+    for topic in router.topics():
+        publisher.set_rate(topic, max_rate=max_rate)
+    return publisher
 
 
-def calculate_centroid(xyxy, min_area=500):
-    """
-    Calcula el centroide de los bounding boxes y filtra por tamaño.
-
-    Parámetros:
-    - xyxy: Lista de coordenadas [x1, y1, x2, y2] que definen el bounding box.
-    - min_area: Área mínima requerida para considerar el bounding box.
-
-    Retorna:
-    - centroid: Una tupla con las coordenadas (centroid_x, centroid_y) del centroide si pasa el filtro.
-    - None: Si el bounding box es demasiado pequeño.
-    """
-    x1 = int(xyxy[0])
-    y1 = int(xyxy[1])
-    x2 = int(xyxy[2])
-    y2 = int(xyxy[3])
-
-    # Calcular el área del bounding box
-    bbox_width = x2 - x1
-    bbox_height = y2 - y1
-    bbox_area = bbox_width * bbox_height
-
-    # Filtrar bounding boxes que no cumplan con el tamaño mínimo
-    if bbox_area < min_area:
-        return None  # No retornar nada si el área es menor al umbral
-
-    # Calcular el centroide
-    centroid_x = (x1 + x2) / 2
-    centroid_y = (y1 + y2) / 2
-
-    # Retornar el centroide
-    return (centroid_x, centroid_y)
+def publish_detections(
+    publisher: RateLimitedPublisher, router: DetectionRouter, frame_detections: FrameDetections
+):
+    """Publica las caras de un frame en un solo mensaje binario por cada cat_control destino."""
+    # Se serializa al enviarse para que publish_time refleje el envío real
+    for topic, routed in router.route(frame_detections):
+        publisher.publish(topic, routed)
+    print(f"Published {len(frame_detections.detections)} detections")
 
 
 def show_results(img, xyxy, min_area=500):
@@ -86,99 +82,126 @@ def show_results(img, xyxy, min_area=500):
     return img, (centroid_x, centroid_y)
 
 
-def capture_video(centroid_queue):
-    # Cargar el clasificador de Haar para detección de rostros
-    face_cascade = cv2.CascadeClassifier(HAAR_CASCADE_PATH)
-
-    last_processed_time = time.monotonic()
-    fps_interval = 0.2
-    min_area = 500  # Ajusta según lo necesario
-
-    # Definir el pipeline GStreamer para utilizar nvarguscamerasrc
-    gst_pipeline = (
-        "nvarguscamerasrc sensor-id=0 ! "
-        "video/x-raw(memory:NVMM), width=1920, height=1080, format=NV12, framerate=30/1 ! "
-        "nvvidconv ! video/x-raw, format=BGRx ! "
-        "videoconvert ! video/x-raw, format=BGR ! "
-        "appsink max-buffers=1 drop=true"
+def capture_video(detections_queue, start_time: float = None):
+    startup = StartupTimer(start_time)
+    # Cascada de Haar (área mínima 500) salvo que GHOSTLYCAT_DETECTOR diga otro backend.
+    # Carga y calienta en un hilo (desde la caché de modelos si se puede) mientras se abre la
+    # cámara, con la resolución configurada.
+    # Con GHOSTLYCAT_ROI_EXPAND > 0 se busca alrededor de las últimas caras a resolución nativa
+    loader = BackgroundLoader(
+        lambda: roi_from_env(detector_from_env(default=HaarBackend.name)),
+        startup,
+        frame_shape=(FRAME_HEIGHT, FRAME_WIDTH, 3),
     )
 
-    # Abrir la cámara con el pipeline GStreamer
-    cap = cv2.VideoCapture(gst_pipeline, cv2.CAP_GSTREAMER)
-    
+    # Cámara (nvarguscamerasrc) o la fuente de GHOSTLYCAT_VIDEO_SOURCE; se lee en su propio hilo
+    source = frame_source_from_env(FRAME_WIDTH, FRAME_HEIGHT)
+    # Frecuencia adaptativa: sube con una cara a la vista y baja sin nadie, por calor o carga
+    rate = rate_controller_from_env(source.realtime)
+    cap = FrameGrabber(source)
 
     # Comprobar si la cámara se abrió correctamente
     if not cap.isOpened():
         print("Error: No se pudo abrir la cámara.")
         return
     
-    frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    frame_width = cap.frame_width
+    frame_height = cap.frame_height
+    startup.mark("camera_opened")
+    backend = loader.result()
+    # Con GHOSTLYCAT_MOTION_GATE=1 no se corre el modelo mientras la escena no cambie
+    backend = motion_gate_from_env(backend)
+    # Con GHOSTLYCAT_DETECT_EVERY > 1 el detector corre cada N frames y entre ellos se sigue
+    tracker = DetectThenTrack(backend, detect_every_from_env())
+
+    min_area = backend.min_area
     fourcc = cv2.VideoWriter_fourcc(*'XVID')  # Codec para AVI (también puedes usar 'MJPG', 'MP4V', etc.)
     out = cv2.VideoWriter(VIDEO_OUTPUT_PATH, fourcc, 10.0, (frame_width, frame_height))
+    cap.start()
 
     while True:
-        # Capturar frame por frame
-        ret, frame = cap.read()
+        # Esperar el turno y tomar el frame más reciente; los demás se descartan
+        rate.wait()
+        grabbed = cap.read(timeout=FRAME_TIMEOUT)
 
         # Si no se pudo capturar un frame, salir del bucle
-        if not ret:
+        if grabbed is None:
             print("Error: No se pudo recibir el frame.")
             break
-        
-       
-        # Esperar hasta que se cumpla el intervalo de FPS
-        # current_time = time.monotonic()
-        # if current_time - last_processed_time >= fps_interval:
-        #     last_processed_time = current_time
-
-        gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(gray_frame, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
-
-        for (x, y, w, h) in faces:
-            xyxy = [x, y, x + w, y + h]
-            centroid = calculate_centroid(xyxy, min_area)
-            if centroid:
-                centroid_x, centroid_y = centroid
-                telemetry = CatTelemetry(centroid_x=centroid_x, centroid_y=centroid_y)
-                centroid_queue.put(telemetry)
-
-            # Procesar solo un rostro
+        frame = grabbed.frame
+        capture_time = grabbed.capture_time
+        started = time.monotonic()
+
+        tracked = tracker.process(frame)
+        detections = tracked.detections
+        inference_time = time.time()
+        rate.update(time.monotonic() - started, bool(len(detections)))
+        startup.frame_processed(bool(len(detections)))
+
+        for xyxy in detections.boxes:
             frame, _ = show_results(frame, xyxy, min_area=min_area)
-            #break  # Detenemos el loop después de procesar el primer rostro
-        
+
+        if len(detections):
+            detections_queue.put(
+                FrameDetections(
+                    frame_seq=grabbed.seq,
+                    capture_time=capture_time,
+                    frame_width=frame_width,
+                    frame_height=frame_height,
+                    detections=tuple(detections.to_faces(track_ids=tracked.track_ids)),
+                    inference_time=inference_time,
+                )
+            )
+
         out.write(frame)
         # Si se presiona la tecla 'q', salir del loop
         if cv2.waitKey(1) & 0xFF == ord("q"):
             break
 
-    out.write(frame)
     # Liberar la cámara y cerrar las ventanas
+    print(f"Frame grabber stats: {cap.stats()}")
+    print(f"Tracker stats: {tracker.stats()}")
+    print(f"Detector stats: {backend.stats()}")
+    print(f"Rate stats: {rate.stats()}")
+    rate.write_metrics()
+    print(f"Startup stats: {startup.stats()}")
     cap.release()
     out.release()
     cv2.destroyAllWindows()
 
 
 def start_video_capture():
+    start_time = time.monotonic()
     # Crear un proceso para la captura de video
-    centroid_queue = multiprocessing.Queue()
+    detections_queue = multiprocessing.Queue()
 
-    process = multiprocessing.Process(target=capture_video, args=(centroid_queue,))
+    process = multiprocessing.Process(target=capture_video, args=(detections_queue, start_time))
     process.start()
 
+    # La cámara y el modelo cargan en el proceso de captura mientras el broker se conecta
+    router = DetectionRouter.from_env()
+    publisher = create_publisher(router, start_time)
+    # Centroides filtrados con Kalman (posición y velocidad) si GHOSTLYCAT_CENTROID_FILTER=kalman
+    smoother = smoother_from_env()
+
     # Esperar a que el proceso termine
     try:
         while process.is_alive():
-            if not centroid_queue.empty():
-                telemetry = centroid_queue.get()
-                publish_centroid(telemetry)
-            time.sleep(0.5)
+            try:
+                frame_detections = detections_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if smoother:
+                frame_detections = smoother.apply(frame_detections)
+            publish_detections(publisher, router, frame_detections)
     except KeyboardInterrupt:
         print("Interrupcion detectada, cerrando proceso.")
     finally:
         if process.is_alive():
             process.terminate()
             process.join()
+        publisher.stop()
+        print(f"Publisher stats: {publisher.stats()}")
 
 
 if __name__ == "__main__":
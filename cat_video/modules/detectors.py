@@ -0,0 +1,856 @@
+"""Backends de detección de caras con una interfaz común.
+
+Cada modelo (SSD de Caffe, cascada de Haar, YOLOv5-face) se expone como un ``DetectorBackend``
+que regresa cajas, confianzas y landmarks opcionales en coordenadas del frame original. El
+backend se elige con GHOSTLYCAT_DETECTOR; con "auto" se mide cada backend disponible en el
+hardware actual y se usa el más rápido que cumpla los objetivos de latencia y precisión.
+"""
+import abc
+import json
+import os
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+from cat_common.mqtt_messages import FaceDetection
+from modules.model_cache import ModelCache, model_cache_from_env
+from modules.postprocess import (
+    box_centroids,
+    keep_mask,
+    non_max_suppression_face,
+    scale_coords_landmarks,
+    scale_to_frame,
+)
+from modules.preprocess import LetterboxPreprocessor
+
+DETECTOR_ENV = "GHOSTLYCAT_DETECTOR"
+MAX_LATENCY_ENV = "GHOSTLYCAT_DETECTOR_MAX_LATENCY"
+MIN_RECALL_ENV = "GHOSTLYCAT_DETECTOR_MIN_RECALL"
+CALIBRATION_SOURCE_ENV = "GHOSTLYCAT_CALIBRATION_SOURCE"
+DETECTOR_AUTO = "auto"
+CALIBRATION_FRAMES = 20
+MIN_DISTINCT_CALIBRATION_FRAMES = 10  # Menos que esto no representa la escena
+CALIBRATION_WARMUP = 2
+CALIBRATION_METRICS_PATH = Path("/var/ghostlycat/metrics/detector_calibration.json")
+MATCH_IOU = 0.5  # IoU mínimo para considerar que dos backends encontraron la misma cara
+
+SSD_MODEL_PATH = Path("models/res10_300x300_ssd_iter_140000.caffemodel")
+SSD_PROTOTXT_PATH = Path("models/deploy.prototxt.txt")
+HAAR_CASCADE_PATH = Path("models/haarcascade_frontalface_default.xml")
+YOLO_WEIGHTS_PATH = Path("models/yolov5n-0.5.pt")
+YOLO_ONNX_PATH = Path("models/yolov5n-0.5.onnx")  # Generado con export_onnx.py
+ONNX_MODEL_ENV = "GHOSTLYCAT_ONNX_MODEL"
+ONNX_RUNTIME_ENV = "GHOSTLYCAT_ONNX_RUNTIME"
+INFERENCE_THREADS_ENV = "GHOSTLYCAT_INFERENCE_THREADS"
+MAX_TRACED_SHAPES = 4  # Formas de entrada de YOLOv5-face trazadas y guardadas en caché
+HAAR_WIDTH_ENV = "GHOSTLYCAT_HAAR_WIDTH"
+HAAR_TILES_ENV = "GHOSTLYCAT_HAAR_TILES"
+HAAR_DETECT_WIDTH = 640  # Ancho del frame en el que busca la cascada
+
+
+@dataclass
+class Detections:
+    """Caras de un frame en pixeles del frame original."""
+
+    boxes: np.ndarray  # (N, 4) x1, y1, x2, y2
+    confidences: np.ndarray  # (N,)
+    landmarks: Optional[np.ndarray] = None  # (N, 10) cinco puntos x, y (solo YOLOv5-face)
+
+    @staticmethod
+    def empty():
+        return Detections(np.zeros((0, 4), np.float32), np.zeros((0,), np.float32))
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def filter(self, keep: np.ndarray):
+        return Detections(
+            self.boxes[keep],
+            self.confidences[keep],
+            None if self.landmarks is None else self.landmarks[keep],
+        )
+
+    def to_faces(self, identities=None, track_ids=None) -> List[FaceDetection]:
+        if not len(self):
+            return []
+        identities = identities or [""] * len(self)
+        track_ids = track_ids or [0] * len(self)
+        # Enteros y centroides de todas las cajas a la vez, como FaceDetection.from_box
+        boxes = self.boxes.astype(np.int64)
+        rows = np.concatenate([boxes, box_centroids(boxes)], axis=1).tolist()
+        return [
+            FaceDetection(*row, confidence, identity, int(track_id))
+            for row, confidence, identity, track_id in zip(
+                rows, self.confidences.tolist(), identities, track_ids
+            )
+        ]
+
+
+def parse_grid(spec: str):
+    """Convierte "2x2" en (2, 2): columnas y filas."""
+    columns, rows = (int(value) for value in spec.lower().split("x"))
+    return columns, rows
+
+
+def merge_boxes(boxes: np.ndarray, scores: np.ndarray, overlap_threshold: float = 0.5):
+    """Une cajas (N, 4) x1, y1, x2, y2 repetidas; regresa las cajas y puntajes que quedan.
+
+    Como ``groupRectangles`` de OpenCV, una caja que queda casi dentro de otra con más puntaje
+    también se descarta: el traslape se mide contra el área de la menor de las dos.
+    """
+    order = np.argsort(-scores, kind="stable")
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    keep = []
+    for index in order:
+        if keep:
+            kept, box = boxes[keep], boxes[index]
+            width = np.minimum(kept[:, 2], box[2]) - np.maximum(kept[:, 0], box[0])
+            height = np.minimum(kept[:, 3], box[3]) - np.maximum(kept[:, 1], box[1])
+            intersection = np.clip(width, 0, None) * np.clip(height, 0, None)
+            smaller = np.minimum(areas[keep], areas[index])
+            if (intersection / np.maximum(smaller, 1e-9) >= overlap_threshold).any():
+                continue
+        keep.append(index)
+    return boxes[keep], scores[keep]
+
+
+class DetectorBackend(abc.ABC):
+    """Interfaz común: ``load()`` una vez y ``detect(frame)`` por cada frame BGR."""
+
+    name = ""
+
+    def __init__(self, conf_threshold: float = 0.5, min_area: float = 0):
+        self.conf_threshold = conf_threshold
+        self.min_area = min_area
+
+    def available(self):
+        """Si el backend puede cargarse aquí (archivos del modelo y dependencias)."""
+        return True
+
+    @abc.abstractmethod
+    def load(self):
+        """Carga el modelo; se llama una vez antes del primer ``detect``."""
+
+    @abc.abstractmethod
+    def _detect(self, frame) -> Detections:
+        """Detecciones del frame sin filtrar; ``detect`` aplica la confianza y el área mínima."""
+
+    def detect(self, frame) -> Detections:
+        detections = self._detect(frame)
+        if not len(detections):
+            return detections
+        keep = keep_mask(
+            detections.boxes, detections.confidences, self.conf_threshold, self.min_area
+        )
+        return detections.filter(keep)
+
+    def release(self):
+        """Suelta el modelo cargado; el backend puede volver a cargarse con ``load()``."""
+
+    def warm_up(self, frame_shape, runs: int = 2):
+        """Paga la primera inferencia (reservas, trazado) con frames en negro del tamaño dado."""
+        frame = np.zeros(frame_shape, np.uint8)
+        for _ in range(runs):
+            self.detect(frame)
+
+    def stats(self):
+        return {}
+
+
+class SSDBackend(DetectorBackend):
+    """SSD ResNet-10 de Caffe (OpenCV DNN) a 300x300."""
+
+    name = "ssd"
+
+    def __init__(
+        self,
+        model_path: Path = SSD_MODEL_PATH,
+        prototxt_path: Path = SSD_PROTOTXT_PATH,
+        conf_threshold: float = 0.5,
+        min_area: float = 0,
+    ):
+        super().__init__(conf_threshold, min_area)
+        self.model_path = Path(model_path)
+        self.prototxt_path = Path(prototxt_path)
+        self.net = None
+
+    def available(self):
+        return self.model_path.exists() and self.prototxt_path.exists()
+
+    def load(self):
+        self.net = cv2.dnn.readNetFromCaffe(str(self.prototxt_path), str(self.model_path))
+
+    def release(self):
+        self.net = None
+
+    def _detect(self, frame):
+        height, width = frame.shape[:2]
+        blob = cv2.dnn.blobFromImage(
+            frame, 1.0, (300, 300), (104.0, 177.0, 123.0), swapRB=False, crop=False
+        )
+        self.net.setInput(blob)
+        output = self.net.forward()[0, 0]  # (N, 7): _, clase, confianza, x1, y1, x2, y2
+        scale = np.array([width, height, width, height], np.float32)
+        return Detections(output[:, 3:7] * scale, output[:, 2].astype(np.float32))
+
+
+class HaarBackend(DetectorBackend):
+    """Cascada de Haar de OpenCV sobre el frame en escala de grises, reducido a ``detect_width``.
+
+    Las caras suelen ser grandes, así que se buscan en el frame reducido y las cajas se llevan
+    de vuelta a resolución completa. ``min_size`` y ``max_size`` están en pixeles del frame
+    original y se escalan; el mínimo efectivo nunca es menor que la ventana de la cascada
+    (24 pixeles en el frame reducido). Con ``tiles`` (columnas, filas) el frame reducido se
+    parte en mosaicos traslapados que se procesan en paralelo: cada mosaico busca las caras de
+    hasta el tamaño del traslape y una pasada sobre el frame completo, ya sin las escalas
+    pequeñas que son las costosas, busca las más grandes. Los duplicados se unen con
+    ``merge_boxes``. GHOSTLYCAT_HAAR_WIDTH y GHOSTLYCAT_HAAR_TILES (p. ej. "2x2") configuran
+    el backend creado por entorno y GHOSTLYCAT_INFERENCE_THREADS limita los hilos.
+    """
+
+    name = "haar"
+
+    def __init__(
+        self,
+        cascade_path: Path = HAAR_CASCADE_PATH,
+        scale_factor: float = 1.1,
+        min_neighbors: int = 5,
+        min_size=(30, 30),
+        max_size=None,
+        min_area: float = 500,
+        detect_width: int = None,
+        tiles=None,
+        workers: int = None,
+        tile_overlap: float = 0.25,
+    ):
+        # La cascada no da confianza: todas las cajas se reportan con 1.0
+        super().__init__(conf_threshold=0.0, min_area=min_area)
+        self.cascade_path = Path(cascade_path)
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+        self.max_size = max_size
+        if detect_width is None:
+            detect_width = int(os.environ.get(HAAR_WIDTH_ENV, HAAR_DETECT_WIDTH))
+        self.detect_width = detect_width  # 0 = resolución completa
+        self.tiles = tiles or parse_grid(os.environ.get(HAAR_TILES_ENV, "1x1"))
+        self.workers = workers or int(os.environ.get(INFERENCE_THREADS_ENV, 0)) or os.cpu_count()
+        self.tile_overlap = tile_overlap
+        self.cascade = None
+        self.window = (24, 24)
+        self.executor = None
+        self.local = threading.local()
+
+    def available(self):
+        return self.cascade_path.exists()
+
+    def load(self):
+        self.cascade = cv2.CascadeClassifier(str(self.cascade_path))
+        if not self.cascade.empty():
+            self.window = tuple(self.cascade.getOriginalWindowSize())
+        if self.tiles != (1, 1) and self.workers > 1:
+            # detectMultiScale suelta el GIL, así que los mosaicos corren en paralelo con hilos
+            self.executor = ThreadPoolExecutor(max_workers=self.workers)
+
+    def release(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+        self.cascade = None
+        self.local = threading.local()
+
+    def _thread_cascade(self):
+        """Una cascada por hilo: ``detectMultiScale`` no admite llamadas simultáneas."""
+        if self.executor is None:
+            return self.cascade
+        cascade = getattr(self.local, "cascade", None)
+        if cascade is None:
+            cascade = self.local.cascade = cv2.CascadeClassifier(str(self.cascade_path))
+        return cascade
+
+    def _scaled_size(self, size, scale):
+        """Tamaño del frame original al reducido, sin bajar de la ventana de la cascada."""
+        return (
+            max(self.window[0], int(round(size[0] * scale))),
+            max(self.window[1], int(round(size[1] * scale))),
+        )
+
+    def _search(self, gray, min_size, max_size, offset=(0, 0)):
+        """Cajas (N, 4) x1, y1, x2, y2 y vecinos de cada una sobre ``gray``."""
+        if min_size[0] > max_size[0] or min_size[1] > max_size[1]:
+            return np.zeros((0, 4), np.float32), np.zeros((0,), np.float32)
+        faces, neighbors = self._thread_cascade().detectMultiScale2(
+            gray,
+            scaleFactor=self.scale_factor,
+            minNeighbors=self.min_neighbors,
+            minSize=min_size,
+            maxSize=max_size,
+        )
+        if not len(faces):
+            return np.zeros((0, 4), np.float32), np.zeros((0,), np.float32)
+        faces = np.asarray(faces, np.float32)
+        faces[:, :2] += offset
+        boxes = np.concatenate([faces[:, :2], faces[:, :2] + faces[:, 2:4]], axis=1)
+        return boxes, np.asarray(neighbors, np.float32).reshape(-1)
+
+    def _tile_searches(self, gray, min_size, max_size):
+        """Búsquedas (mosaicos y frame completo) que cubren todos los tamaños de cara."""
+        height, width = gray.shape
+        columns, rows = self.tiles
+        tile_width, tile_height = width / columns, height / rows
+        overlap = int(min(tile_width, tile_height) * self.tile_overlap)
+        # Una cara de hasta ``overlap`` pixeles cabe completa en algún mosaico
+        tile_max = (min(max_size[0], overlap), min(max_size[1], overlap))
+        searches = []
+        for row in range(rows):
+            for column in range(columns):
+                x1 = max(0, int(column * tile_width) - overlap // 2)
+                y1 = max(0, int(row * tile_height) - overlap // 2)
+                x2 = min(width, int((column + 1) * tile_width) + overlap // 2)
+                y2 = min(height, int((row + 1) * tile_height) + overlap // 2)
+                searches.append((gray[y1:y2, x1:x2], min_size, tile_max, (x1, y1)))
+        # Las caras más grandes que el traslape, en el frame completo
+        large_min = (max(min_size[0], overlap), max(min_size[1], overlap))
+        searches.append((gray, large_min, max_size, (0, 0)))
+        return searches
+
+    def _detect(self, frame):
+        height, width = frame.shape[:2]
+        scale = 1.0
+        if self.detect_width and width > self.detect_width:
+            scale = self.detect_width / width
+            small = cv2.resize(
+                frame, (self.detect_width, int(round(height * scale))), interpolation=cv2.INTER_AREA
+            )
+        else:
+            small = frame
+        gray_frame = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+        min_size = self._scaled_size(self.min_size, scale)
+        max_size = self._scaled_size(self.max_size or (width, height), scale)
+        if self.tiles == (1, 1):
+            boxes, neighbors = self._search(gray_frame, min_size, max_size)
+        else:
+            searches = self._tile_searches(gray_frame, min_size, max_size)
+            if self.executor is not None:
+                results = list(self.executor.map(lambda args: self._search(*args), searches))
+            else:
+                results = [self._search(*args) for args in searches]
+            boxes = np.concatenate([result[0] for result in results])
+            neighbors = np.concatenate([result[1] for result in results])
+            if len(boxes) > 1:
+                # La misma cara en dos búsquedas, o partes de una cara grande encontradas en un
+                # mosaico: se queda la caja con más vecinos
+                boxes, neighbors = merge_boxes(boxes, neighbors)
+        if not len(boxes):
+            return Detections.empty()
+        return Detections(boxes / scale, np.ones(len(boxes), np.float32))
+
+    def stats(self):
+        return {"detect_width": self.detect_width, "tiles": "{}x{}".format(*self.tiles)}
+
+
+class YoloFaceBackend(DetectorBackend):
+    """YOLOv5-face (PyTorch) con landmarks; usa CUDA si está disponible.
+
+    torch y el repositorio yolov5-face se importan hasta ``load`` para que los otros backends
+    funcionen en equipos sin ellos. ``warm_up`` traza el modelo fusionado (TorchScript) para
+    cada forma de entrada que recibe, hasta ``MAX_TRACED_SHAPES``, y lo guarda en la caché de
+    modelos; al reiniciar se cargan los trazados sin pasar por ``attempt_load``. Durante la
+    inferencia nunca se traza: una forma sin trazar corre con el modelo original. Con
+    ``trace=False`` siempre se usa el modelo original, sin caché.
+    """
+
+    name = "yolo"
+
+    def __init__(
+        self,
+        weights: Path = YOLO_WEIGHTS_PATH,
+        img_size: int = 640,
+        conf_threshold: float = 0.6,
+        iou_threshold: float = 0.5,
+        min_area: float = 10000,
+        device: str = None,
+        cache: ModelCache = None,
+        trace: bool = True,
+    ):
+        super().__init__(conf_threshold, min_area)
+        self.weights = Path(weights)
+        self.img_size = img_size
+        self.iou_threshold = iou_threshold
+        self.device_name = device
+        self.cache = cache or model_cache_from_env()
+        self.cache_status = None
+        self.trace = trace
+        self.model = None
+        self.traced = {}  # Forma de entrada (alto, ancho) -> modelo trazado
+        self.tracing = False  # Solo durante warm_up
+
+    def available(self):
+        if not self.weights.exists():
+            return False
+        try:
+            import torch  # noqa: F401
+            import models.experimental  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def load(self):
+        import torch
+        from utils.general import check_img_size, non_max_suppression_face
+
+        self.torch = torch
+        self.non_max_suppression_face = non_max_suppression_face
+        self.device = torch.device(
+            self.device_name or ("cuda" if torch.cuda.is_available() else "cpu")
+        )
+        print("Device is using: ", self.device)
+        # Con los modelos trazados en caché no hace falta attempt_load (carga y fusión de capas)
+        self.cache_key = self.cache.key(
+            self.weights, torch.__version__, self.device.type, self.img_size
+        )
+        pattern = f"{self.weights.stem}-*x*"
+        cached = self.cache.lookup_all(pattern, self.cache_key, ".pt") if self.trace else []
+        for path, info in cached[:MAX_TRACED_SHAPES]:
+            module = torch.jit.load(str(path), map_location=self.device)
+            self.traced[tuple(info["input_shape"])] = module
+        if self.traced:
+            stride = info["stride"]
+            self.cache_status = "hit"
+        else:
+            self._load_model()
+            stride = int(self.model.stride.max())
+            self.cache_status = "miss" if self.trace and self.cache.enabled else "off"
+        print(f"Caché de modelos: {self.cache_status}")
+        self.imgsz = check_img_size(self.img_size, s=stride)  # check img_size
+        # Buffers del letterbox y tensor de entrada reservados una vez por resolución
+        self.preprocessor = LetterboxPreprocessor(self.imgsz, stride, torch, self.device)
+
+    def release(self):
+        self.model = None
+        self.traced = {}
+        self.preprocessor = None
+        if self.device.type == "cuda":
+            self.torch.cuda.empty_cache()
+
+    def _load_model(self):
+        if self.model is None:
+            from models.experimental import attempt_load
+
+            # load FP32 model
+            self.model = attempt_load(str(self.weights), map_location=self.device)
+
+    def _trace(self, img):
+        """Traza el modelo fusionado para la forma de entrada de ``img`` y lo guarda en caché."""
+        self._load_model()  # Sin caché para esta forma hace falta el modelo completo
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", self.torch.jit.TracerWarning)
+            traced = self.torch.jit.trace(self.model, img, strict=False)
+        shape = tuple(img.shape[2:])
+        self.traced[shape] = traced
+        info = {
+            "input_shape": list(shape),
+            "stride": int(self.model.stride.max()),
+            "weights": str(self.weights),
+            "torch": self.torch.__version__,
+            "device": self.device.type,
+        }
+        self.cache.store(
+            "{}-{}x{}".format(self.weights.stem, *shape),
+            self.cache_key,
+            ".pt",
+            lambda path: self.torch.jit.save(traced, str(path)),
+            info,
+        )
+        return traced
+
+    def warm_up(self, frame_shape, runs: int = 2):
+        self.tracing = self.trace
+        try:
+            super().warm_up(frame_shape, runs)
+        finally:
+            self.tracing = False
+
+    def _forward(self, img):
+        """Trazado de la forma de ``img``; fuera de warm_up las formas nuevas van sin trazar."""
+        shape = tuple(img.shape[2:])
+        module = self.traced.get(shape)
+        if module is None:
+            if self.tracing and len(self.traced) < MAX_TRACED_SHAPES:
+                module = self._trace(img)
+            else:
+                self._load_model()
+                module = self.model
+        return module(img)[0]
+
+    def _detect(self, frame):
+        img = self.preprocessor.to_tensor(frame)
+        with self.torch.no_grad():
+            pred = self._forward(img)
+        det = self.non_max_suppression_face(pred, self.conf_threshold, self.iou_threshold)[0]
+        if not len(det):
+            return Detections.empty()
+
+        # Cajas y landmarks de la entrada del modelo al frame, todas las caras a la vez
+        det = det.cpu().numpy()
+        boxes = np.round(scale_to_frame(img.shape[2:], det[:, :4], frame.shape))
+        landmarks = np.round(scale_coords_landmarks(img.shape[2:], det[:, 5:15], frame.shape))
+        return Detections(boxes, det[:, 4], landmarks)
+
+    def stats(self):
+        return {"model_cache": self.cache_status}
+
+
+class YoloOnnxBackend(DetectorBackend):
+    """YOLOv5-face exportado a ONNX (ver export_onnx.py), en CPU sin torch.
+
+    Corre con ONNX Runtime si está instalado y si no con OpenCV DNN. El modelo puede estar en
+    FP32, FP16 o cuantizado a INT8; su tamaño de entrada fijo y su precisión vienen en el JSON
+    que export_onnx.py deja junto al .onnx. ``threads`` limita los hilos de inferencia. Con
+    ONNX Runtime el grafo ya optimizado se guarda en la caché de modelos.
+    """
+
+    name = "yolo_onnx"
+
+    def __init__(
+        self,
+        model_path: Path = None,
+        runtime: str = None,
+        threads: int = None,
+        conf_threshold: float = 0.6,
+        iou_threshold: float = 0.5,
+        min_area: float = 10000,
+        cache: ModelCache = None,
+    ):
+        super().__init__(conf_threshold, min_area)
+        self.model_path = Path(model_path or os.environ.get(ONNX_MODEL_ENV, YOLO_ONNX_PATH))
+        self.runtime = runtime or os.environ.get(ONNX_RUNTIME_ENV)  # "onnxruntime" u "opencv"
+        self.threads = threads or int(os.environ.get(INFERENCE_THREADS_ENV, 0)) or None
+        self.iou_threshold = iou_threshold
+        self.cache = cache or model_cache_from_env()
+        self.cache_status = None
+        self.info = {}
+        self.session = None
+        self.net = None
+
+    def available(self):
+        return self.model_path.exists()
+
+    def load(self):
+        info_path = self.model_path.with_suffix(".json")
+        if info_path.exists():
+            self.info = json.loads(info_path.read_text())
+        input_shape = tuple(self.info.get("input_shape", (384, 640)))
+
+        onnxruntime = None
+        if self.runtime != "opencv":
+            try:
+                import onnxruntime
+            except ImportError:
+                if self.runtime == "onnxruntime":
+                    raise
+        if onnxruntime is not None:
+            self._create_session(onnxruntime)
+            self.input_name = self.session.get_inputs()[0].name
+            self.runtime = "onnxruntime"
+        else:
+            if self.threads:
+                cv2.setNumThreads(self.threads)
+            self.net = cv2.dnn.readNetFromONNX(str(self.model_path))
+            self.runtime = "opencv"
+        print(f"YOLOv5-face ONNX {self.info.get('precision', '?')} con {self.runtime}")
+        self.preprocessor = LetterboxPreprocessor(
+            max(input_shape), self.info.get("stride", 32), input_shape=input_shape
+        )
+
+    def release(self):
+        self.session = None
+        self.net = None
+        self.preprocessor = None
+
+    def _create_session(self, onnxruntime):
+        """Sesión de ONNX Runtime; el grafo optimizado (capas fusionadas) se guarda en caché."""
+        levels = onnxruntime.GraphOptimizationLevel
+        options = onnxruntime.SessionOptions()
+        if self.threads:
+            options.intra_op_num_threads = self.threads
+        # El grafo optimizado puede usar instrucciones del CPU: la clave incluye la arquitectura
+        key = self.cache.key(self.model_path, onnxruntime.__version__)
+        cached = self.cache.lookup(self.model_path.stem, key, ".onnx")
+        if cached is not None:
+            # Ya optimizado: no repetir las optimizaciones al cargar
+            options.graph_optimization_level = levels.ORT_DISABLE_ALL
+            self.session = onnxruntime.InferenceSession(
+                str(cached[0]), options, providers=["CPUExecutionProvider"]
+            )
+            self.cache_status = "hit"
+            return
+
+        options.graph_optimization_level = levels.ORT_ENABLE_ALL
+
+        def optimize(path):
+            options.optimized_model_filepath = str(path)
+            self.session = onnxruntime.InferenceSession(
+                str(self.model_path), options, providers=["CPUExecutionProvider"]
+            )
+
+        info = {**self.info, "onnxruntime": onnxruntime.__version__}
+        if self.cache.store(self.model_path.stem, key, ".onnx", optimize, info) is not None:
+            self.cache_status = "miss"
+        else:
+            self.cache_status = "off"
+            options.optimized_model_filepath = ""
+            self.session = onnxruntime.InferenceSession(
+                str(self.model_path), options, providers=["CPUExecutionProvider"]
+            )
+
+    def _detect(self, frame):
+        blob = self.preprocessor.to_blob(frame)
+        if self.session is not None:
+            pred = self.session.run(None, {self.input_name: blob})[0]
+        else:
+            self.net.setInput(blob)
+            pred = self.net.forward()
+        det = non_max_suppression_face(pred[0], self.conf_threshold, self.iou_threshold)
+        if not len(det):
+            return Detections.empty()
+
+        boxes = np.round(scale_to_frame(blob.shape[2:], det[:, :4], frame.shape))
+        landmarks = np.round(scale_coords_landmarks(blob.shape[2:], det[:, 5:15], frame.shape))
+        return Detections(boxes, det[:, 4], landmarks)
+
+    def stats(self):
+        return {"runtime": self.runtime, "model_cache": self.cache_status}
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (SSDBackend, HaarBackend, YoloFaceBackend, YoloOnnxBackend)
+}
+# Del más preciso al menos preciso: el primero disponible es la referencia de la calibración
+ACCURACY_ORDER = (YoloFaceBackend.name, YoloOnnxBackend.name, SSDBackend.name, HaarBackend.name)
+
+
+def create_backend(name: str, **kwargs) -> DetectorBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Backend de detección desconocido: {name}")
+    return BACKENDS[name](**kwargs)
+
+
+def box_iou(box_a, boxes_b):
+    """IoU de una caja contra un arreglo de cajas (N, 4)."""
+    x1 = np.maximum(box_a[0], boxes_b[:, 0])
+    y1 = np.maximum(box_a[1], boxes_b[:, 1])
+    x2 = np.minimum(box_a[2], boxes_b[:, 2])
+    y2 = np.minimum(box_a[3], boxes_b[:, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (box_a[2] - box_a[0]) * (box_a[3] - box_a[1])
+    areas_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    return intersection / np.maximum(area_a + areas_b - intersection, 1e-9)
+
+
+def matched_faces(reference: Detections, candidate: Detections, min_iou: float = MATCH_IOU):
+    """Cuántas caras de ``reference`` encontró también ``candidate``."""
+    matched = 0
+    unused = np.ones(len(candidate), bool)
+    for box in reference.boxes:
+        if not unused.any():
+            break
+        ious = np.where(unused, box_iou(box, candidate.boxes), 0.0)
+        best = int(np.argmax(ious))
+        if ious[best] >= min_iou:
+            unused[best] = False
+            matched += 1
+    return matched
+
+
+@dataclass
+class CalibrationResult:
+    name: str
+    latency_p50: float  # Segundos por frame
+    latency_p95: float
+    # Fracción de las caras de la referencia que también encontró; None si la referencia no
+    # encontró ninguna y no hay con qué comparar
+    recall: Optional[float]
+    meets_target: bool = False
+
+
+def calibrate(
+    backends: List[DetectorBackend],
+    frames: list,
+    max_latency: float = None,
+    min_recall: float = 0.8,
+    warmup: int = CALIBRATION_WARMUP,
+):
+    """Mide cada backend (ya cargado) sobre los mismos frames.
+
+    La precisión se mide contra el primer backend de la lista, que debe ser el más preciso:
+    ``recall`` es la fracción de sus caras que el backend también encontró, o None si la
+    referencia no encontró ninguna (p. ej. la cámara viendo un cuarto vacío). ``backends``
+    puede ser un generador que cargue cada backend justo antes de medirlo.
+    """
+    reference_detections = None
+    results = []
+    for backend in backends:
+        for frame in frames[:warmup]:
+            backend.detect(frame)
+        latencies = []
+        detections = []
+        for frame in frames:
+            start = time.perf_counter()
+            detections.append(backend.detect(frame))
+            latencies.append(time.perf_counter() - start)
+        if reference_detections is None:
+            reference_detections = detections
+
+        expected = sum(len(reference) for reference in reference_detections)
+        found = sum(
+            matched_faces(reference, candidate)
+            for reference, candidate in zip(reference_detections, detections)
+        )
+        latencies.sort()
+        result = CalibrationResult(
+            name=backend.name,
+            latency_p50=latencies[len(latencies) // 2],
+            latency_p95=latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+            recall=found / expected if expected else None,
+        )
+        result.meets_target = (
+            result.recall is not None
+            and result.recall >= min_recall
+            and (not max_latency or result.latency_p50 <= max_latency)
+        )
+        results.append(result)
+    return results
+
+
+def select_backend(results: List[CalibrationResult]):
+    """El más rápido que cumple los objetivos; si ninguno, la referencia (la más precisa)."""
+    if results[0].recall is None:
+        print(
+            "La referencia no encontró caras en los frames de calibración: resultado no "
+            f"concluyente, usando {results[0].name}"
+        )
+        return results[0].name
+    candidates = [result for result in results if result.meets_target]
+    if not candidates:
+        print("Ningún backend cumple los objetivos de calibración, usando el más preciso")
+        return results[0].name
+    return min(candidates, key=lambda result: result.latency_p50).name
+
+
+def format_recall(recall: Optional[float]):
+    return "n/a" if recall is None else f"{recall:.2f}"
+
+
+def calibration_frames(spec: str, count: int = CALIBRATION_FRAMES):
+    from modules.frame_sources import open_frame_source
+
+    source = open_frame_source(spec, realtime=False)
+    frames = []
+    while len(frames) < count:
+        ret, frame = source.read()
+        if not ret:
+            break
+        frames.append(frame)
+    source.release()
+    return frames
+
+
+def auto_select_backend(
+    max_latency: float = None,
+    min_recall: float = 0.8,
+    source_spec: str = "images+loop",
+    metrics_path: Path = CALIBRATION_METRICS_PATH,
+):
+    """Calibra los backends disponibles y regresa el elegido, ya cargado.
+
+    Los backends se cargan de uno en uno y se sueltan después de medirlos, para no dejar en
+    memoria (o en la GPU) los modelos que no se eligieron; al final se vuelve a cargar el
+    elegido.
+    """
+    from modules.frame_sources import distinct_frames
+
+    names = []
+    for name in ACCURACY_ORDER:
+        if create_backend(name).available():
+            names.append(name)
+        else:
+            print(f"Backend {name} no disponible")
+    if not names:
+        raise RuntimeError("No hay backends de detección disponibles")
+
+    frames = calibration_frames(source_spec)
+    if not frames:
+        print(f"Sin frames de calibración en {source_spec}, usando {names[0]}")
+        backend = create_backend(names[0])
+        backend.load()
+        return backend
+    distinct = distinct_frames(frames)
+    if distinct < MIN_DISTINCT_CALIBRATION_FRAMES:
+        print(
+            f"Advertencia: solo {distinct} frames distintos de calibración en {source_spec}; "
+            f"la latencia y el recall medidos no son representativos "
+            f"(ver {CALIBRATION_SOURCE_ENV})"
+        )
+
+    def load_one_at_a_time():
+        for name in names:
+            backend = create_backend(name)
+            backend.load()
+            yield backend
+            backend.release()
+
+    results = calibrate(load_one_at_a_time(), frames, max_latency, min_recall)
+    for result in results:
+        print(
+            f"{result.name}: p50={result.latency_p50 * 1000:.1f} ms "
+            f"p95={result.latency_p95 * 1000:.1f} ms recall={format_recall(result.recall)}"
+        )
+    selected = select_backend(results)
+    print(f"Backend seleccionado: {selected}")
+
+    try:
+        metrics_path.parent.mkdir(parents=True, exist_ok=True)
+        metrics_path.write_text(
+            json.dumps(
+                {"selected": selected, "results": [asdict(result) for result in results]},
+                indent=2,
+            )
+        )
+    except OSError as exc:
+        print(f"No se pudo guardar la calibración: {exc}")
+
+    backend = create_backend(selected)
+    backend.load()
+    return backend
+
+
+def detector_from_env(default: str = SSDBackend.name) -> DetectorBackend:
+    """Backend configurado por entorno, ya cargado.
+
+    GHOSTLYCAT_DETECTOR: "ssd", "haar", "yolo", "yolo_onnx" o "auto".
+    GHOSTLYCAT_ONNX_MODEL / GHOSTLYCAT_ONNX_RUNTIME / GHOSTLYCAT_INFERENCE_THREADS: ver
+    ``YoloOnnxBackend``.
+    GHOSTLYCAT_DETECTOR_MAX_LATENCY: segundos por frame aceptables en modo auto (0 = sin límite).
+    GHOSTLYCAT_DETECTOR_MIN_RECALL: fracción mínima de caras frente al backend más preciso.
+    GHOSTLYCAT_CALIBRATION_SOURCE: frames de calibración (ver ``open_frame_source``).
+    """
+    name = os.environ.get(DETECTOR_ENV, default)
+    if name == DETECTOR_AUTO:
+        return auto_select_backend(
+            max_latency=float(os.environ.get(MAX_LATENCY_ENV, 0)) or None,
+            min_recall=float(os.environ.get(MIN_RECALL_ENV, 0.8)),
+            source_spec=os.environ.get(CALIBRATION_SOURCE_ENV, "images+loop"),
+        )
+    backend = create_backend(name)
+    backend.load()
+    return backend
@@ -4,9 +4,16 @@ import numpy as np
 from pathlib import Path
 import json
 import random
+from modules.frame_sources import ArgusSource, FrameSource, frame_source_from_env
 
 class FaceTrainer:
-    def __init__(self, encodings_path: Path, prototxt_path: Path, model_path: Path):
+    def __init__(
+        self,
+        encodings_path: Path,
+        prototxt_path: Path,
+        model_path: Path,
+        source: FrameSource = None,
+    ):
         self.encodings_path = encodings_path
         self.known_face_encodings = []
         self.known_face_names = []
@@ -14,12 +21,8 @@ class FaceTrainer:
         self.model_path = model_path
         self.net = cv2.dnn.readNetFromCaffe(str(prototxt_path), str(model_path))
 
-        # GStreamer pipeline
-        self.gst_pipeline = (
-            "nvarguscamerasrc sensor-id=0 ! "
-            "video/x-raw(memory:NVMM), width=1920, height=1080, format=NV12, framerate=30/1 ! "
-            "nvvidconv ! video/x-raw, format=BGRx ! videoconvert ! appsink max-buffers=1 drop=true"
-        )
+        # Fuente de video para process_video; se abre hasta usarla
+        self.source = source
 
         # Cargar encodings previos si existen
         if self.encodings_path.exists():
@@ -126,8 +129,8 @@ class FaceTrainer:
             print("No se detectó ningún rostro.")
 
     def process_video(self):
-        """Procesar video en tiempo real para reconocimiento facial usando GStreamer"""
-        cap = cv2.VideoCapture(self.gst_pipeline, cv2.CAP_GSTREAMER)
+        """Procesar video en tiempo real para reconocimiento facial (por defecto la cámara)"""
+        cap = self.source or ArgusSource(1920, 1080)
 
         if not cap.isOpened():
             print("Error: No se pudo abrir el pipeline de video.")
@@ -159,7 +162,7 @@ if __name__ == "__main__":
     ENCODINGS_PATH = Path("/var/ghostlycat/face_encodings/encodings.json")
     IMAGES_FOLDER = Path("/var/ghostlycat/face_images/")
 
-    trainer = FaceTrainer(ENCODINGS_PATH, PROTOTXT_PATH, MODEL_PATH)
+    trainer = FaceTrainer(ENCODINGS_PATH, PROTOTXT_PATH, MODEL_PATH, source=frame_source_from_env())
 
     # Entrenar los rostros (cargar imágenes de la carpeta)
     trainer.train(IMAGES_FOLDER, epochs=1)  # Aquí puedes especificar las epochs
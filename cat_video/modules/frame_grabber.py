@@ -0,0 +1,151 @@
+import threading
+import time
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+
+@dataclass
+class GrabbedFrame:
+    frame: np.ndarray
+    seq: int  # Número de frame leído de la fuente, empieza en 1
+    capture_time: float  # time.time() al terminar de leer el frame
+
+
+class FrameGrabber:
+    """Lee la cámara continuamente en su propio hilo y guarda solo el frame más reciente.
+
+    La inferencia toma siempre el último frame sin esperar a la cámara; los frames que la
+    cámara entrega mientras la inferencia está ocupada se sobrescriben en lugar de acumularse.
+    Sirve con el pipeline de GStreamer, con cualquier fuente que abra ``cv2.VideoCapture`` o
+    con un ``FrameSource``. Con ``lossless`` el hilo espera a que se lea cada frame antes de
+    leer el siguiente (fuentes grabadas reproducidas sin pausas, para medir rendimiento).
+
+    Contadores:
+    - dropped: frames sobrescritos antes de que alguien los leyera.
+    """
+
+    def __init__(self, source, api_preference: int = cv2.CAP_ANY, lossless: bool = None):
+        if isinstance(source, str):
+            self.cap = cv2.VideoCapture(source, api_preference)
+        else:
+            self.cap = source
+        if lossless is None:
+            lossless = not getattr(source, "realtime", True)
+        self.lossless = lossless
+        self.condition = threading.Condition()
+        self.latest = None
+        self.delivered_seq = 0  # Último seq entregado por read()
+        self.seq = 0
+        self.dropped = 0
+        self.running = False
+        self.ended = False
+        self.thread = None
+        self.started = None
+        self.delivered = 0  # Frames entregados por read()
+        self.release_lock = threading.Lock()
+        self.release_requested = False
+        self.capture_released = False
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    @property
+    def frame_width(self):
+        return int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+
+    @property
+    def frame_height(self):
+        return int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    def start(self):
+        if self.thread is None:
+            self.running = True
+            self.started = time.monotonic()
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self._read_loop()
+        finally:
+            # Si release() dejó de esperar a este hilo, aquí se libera la cámara, fuera de read()
+            if self.release_requested:
+                self._release_capture()
+
+    def _read_loop(self):
+        while self.running:
+            if self.lossless:
+                with self.condition:
+                    self.condition.wait_for(
+                        lambda: not self.running
+                        or self.latest is None
+                        or self.latest.seq <= self.delivered_seq
+                    )
+                if not self.running:
+                    return
+            ret, frame = self.cap.read()
+            capture_time = time.time()
+            with self.condition:
+                if not ret:
+                    print("Error: No se pudo recibir el frame.")
+                    self.ended = True
+                    self.condition.notify_all()
+                    return
+                self.seq += 1
+                if self.latest is not None and self.latest.seq > self.delivered_seq:
+                    self.dropped += 1
+                self.latest = GrabbedFrame(frame, self.seq, capture_time)
+                self.condition.notify_all()
+
+    def read(self, timeout: float = None):
+        """Regresa el frame más reciente, o None si la fuente terminó o se agotó ``timeout``.
+
+        Espera a que llegue un frame que no se haya entregado antes: nunca repite un frame.
+        """
+        with self.condition:
+            self.condition.wait_for(
+                lambda: self.ended
+                or not self.running
+                or (self.latest is not None and self.latest.seq > self.delivered_seq),
+                timeout,
+            )
+            latest = self.latest
+            if latest is None or latest.seq <= self.delivered_seq:
+                return None
+            self.delivered += 1
+            self.delivered_seq = latest.seq
+            self.condition.notify_all()
+            return latest
+
+    def stats(self):
+        with self.condition:
+            elapsed = time.monotonic() - self.started if self.started else 0.0
+            return {
+                "captured": self.seq,
+                "delivered": self.delivered,
+                "dropped": self.dropped,
+                "delivered_fps": round(self.delivered / elapsed, 2) if elapsed else 0.0,
+            }
+
+    def _release_capture(self):
+        with self.release_lock:
+            if not self.capture_released:
+                self.capture_released = True
+                self.cap.release()
+
+    def release(self):
+        self.release_requested = True
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+        if self.thread is not None and self.thread.is_alive():
+            # Bloqueado en cap.read() (cámara colgada): liberarla desde aquí la destruiría bajo
+            # la lectura en curso, así que la libera el propio hilo al salir
+            print("El hilo de captura sigue en read(); la cámara se liberará cuando termine")
+            return
+        self._release_capture()
@@ -0,0 +1,243 @@
+import abc
+import hashlib
+import os
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+SOURCE_ENV = "GHOSTLYCAT_VIDEO_SOURCE"
+PACING_ENV = "GHOSTLYCAT_VIDEO_PACING"
+PACING_REALTIME = "realtime"  # Respetar los fps de la fuente, como una cámara
+PACING_FAST = "fast"  # Entregar los frames tan rápido como se pidan, sin descartar ninguno
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class FrameSource(abc.ABC):
+    """Fuente de frames con la misma interfaz que ``cv2.VideoCapture`` (read/get/isOpened/release).
+
+    Las fuentes que no son una cámara (archivos, imágenes, sintética) se pueden reproducir a
+    su velocidad original (``realtime=True``) o tan rápido como se lean, para medir el
+    rendimiento del detector de forma reproducible sin la cámara del Jetson.
+    """
+
+    live = False  # La fuente marca su propio ritmo (cámara) y no necesita pausas
+
+    def __init__(self, width: int, height: int, fps: float = 30.0, realtime: bool = True):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.realtime = realtime or self.live
+        self.next_frame_time = None
+
+    @abc.abstractmethod
+    def _read(self):
+        """(ret, frame) como ``cv2.VideoCapture.read``, sin el ritmo de ``realtime``."""
+
+    def read(self):
+        ret, frame = self._read()
+        if ret and self.realtime and not self.live:
+            self._pace()
+        return ret, frame
+
+    def _pace(self):
+        now = time.monotonic()
+        if self.next_frame_time is not None and self.next_frame_time > now:
+            time.sleep(self.next_frame_time - now)
+            now = self.next_frame_time
+        self.next_frame_time = now + 1.0 / self.fps
+
+    def isOpened(self):
+        return True
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.width
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.height
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        return 0
+
+    def release(self):
+        pass
+
+
+class ArgusSource(FrameSource):
+    """Cámara CSI del Jetson a través de nvarguscamerasrc y GStreamer."""
+
+    live = True
+
+    def __init__(
+        self, width: int = 1920, height: int = 1080, fps: int = 30, sensor_mode: int = None
+    ):
+        super().__init__(width, height, fps)
+        sensor = "sensor-id=0"
+        if sensor_mode is not None:
+            sensor += f" sensor-mode={sensor_mode}"
+        self.pipeline = (
+            f"nvarguscamerasrc {sensor} ! "
+            f"video/x-raw(memory:NVMM), width={width}, height={height}, "
+            f"format=NV12, framerate={fps}/1 ! "
+            "nvvidconv ! video/x-raw, format=BGRx ! "
+            "videoconvert ! video/x-raw, format=BGR ! "
+            "appsink max-buffers=1 drop=true"
+        )
+        self.cap = cv2.VideoCapture(self.pipeline, cv2.CAP_GSTREAMER)
+
+    def _read(self):
+        return self.cap.read()
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def release(self):
+        self.cap.release()
+
+
+class VideoFileSource(FrameSource):
+    """Video grabado (cualquier formato que lea OpenCV), opcionalmente en bucle."""
+
+    def __init__(self, path: Path, realtime: bool = True, loop: bool = False):
+        self.cap = cv2.VideoCapture(str(path))
+        super().__init__(
+            int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            self.cap.get(cv2.CAP_PROP_FPS) or 30.0,
+            realtime,
+        )
+        self.loop = loop
+
+    def _read(self):
+        ret, frame = self.cap.read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        return ret, frame
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def release(self):
+        self.cap.release()
+
+
+class ImageDirectorySource(FrameSource):
+    """Imágenes de una carpeta (o una sola imagen, p. ej. images/zidane.jpg) como frames."""
+
+    def __init__(self, path: Path, fps: float = 30.0, realtime: bool = True, loop: bool = False):
+        path = Path(path)
+        if path.is_dir():
+            self.paths = sorted(p for p in path.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+        else:
+            self.paths = [path]
+        self.loop = loop
+        self.index = 0
+        first = cv2.imread(str(self.paths[0])) if self.paths else None
+        height, width = first.shape[:2] if first is not None else (0, 0)
+        super().__init__(width, height, fps, realtime)
+
+    def _read(self):
+        while self.index < len(self.paths) or (self.loop and self.paths):
+            if self.index >= len(self.paths):
+                self.index = 0
+            image_path = self.paths[self.index]
+            self.index += 1
+            frame = cv2.imread(str(image_path))
+            if frame is not None:
+                return True, frame
+            print(f"No se pudo leer {image_path}")
+        return False, None
+
+    def isOpened(self):
+        return bool(self.paths)
+
+
+class SyntheticSource(FrameSource):
+    """Frames generados: un rectángulo claro que recorre un fondo con ruido.
+
+    No contiene caras reales; sirve para medir el costo de captura, preprocesamiento e
+    inferencia con una carga fija.
+    """
+
+    def __init__(
+        self,
+        width: int = 1280,
+        height: int = 720,
+        fps: float = 30.0,
+        realtime: bool = True,
+        frames: int = None,
+        seed: int = 0,
+    ):
+        super().__init__(width, height, fps, realtime)
+        self.frames = frames
+        self.count = 0
+        rng = np.random.default_rng(seed)
+        self.background = rng.integers(0, 64, (height, width, 3), dtype=np.uint8)
+
+    def _read(self):
+        if self.frames is not None and self.count >= self.frames:
+            return False, None
+        frame = self.background.copy()
+        box = min(self.width, self.height) // 4
+        x = int((self.width - box) * (0.5 + 0.5 * np.sin(self.count / 30.0)))
+        y = (self.height - box) // 2
+        frame[y:y + box, x:x + box] = 200
+        self.count += 1
+        return True, frame
+
+
+def distinct_frames(frames) -> int:
+    """Cuántos frames distintos hay (``images+loop`` repite las mismas imágenes)."""
+    return len({hashlib.sha1(frame.tobytes()).digest() for frame in frames})
+
+
+def open_frame_source(
+    spec: str,
+    width: int = 1920,
+    height: int = 1080,
+    sensor_mode: int = None,
+    realtime: bool = True,
+):
+    """Abre una fuente a partir de su descripción.
+
+    - "argus": cámara del Jetson con la resolución dada.
+    - "synthetic" o "synthetic:640x480@30": frames generados.
+    - una carpeta o una imagen: ImageDirectorySource.
+    - cualquier otro archivo: VideoFileSource.
+    Un sufijo "+loop" en carpetas, imágenes y videos los repite indefinidamente.
+    """
+    loop = spec.endswith("+loop")
+    if loop:
+        spec = spec[: -len("+loop")]
+
+    if spec == "argus":
+        return ArgusSource(width, height, sensor_mode=sensor_mode)
+    if spec.startswith("synthetic"):
+        _, _, size = spec.partition(":")
+        fps = 30.0
+        if size:
+            size, _, fps_text = size.partition("@")
+            width, height = (int(value) for value in size.split("x"))
+            fps = float(fps_text) if fps_text else fps
+        return SyntheticSource(width, height, fps, realtime)
+
+    path = Path(spec)
+    if path.is_dir() or path.suffix.lower() in IMAGE_EXTENSIONS:
+        return ImageDirectorySource(path, realtime=realtime, loop=loop)
+    return VideoFileSource(path, realtime=realtime, loop=loop)
+
+
+def frame_source_from_env(width: int = 1920, height: int = 1080, sensor_mode: int = None):
+    """Fuente configurada por entorno.
+
+    GHOSTLYCAT_VIDEO_SOURCE: ver ``open_frame_source`` (por defecto "argus").
+    GHOSTLYCAT_VIDEO_PACING: "realtime" (por defecto) o "fast".
+    """
+    spec = os.environ.get(SOURCE_ENV, "argus")
+    realtime = os.environ.get(PACING_ENV, PACING_REALTIME) != PACING_FAST
+    return open_frame_source(spec, width, height, sensor_mode, realtime)
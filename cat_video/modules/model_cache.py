@@ -0,0 +1,105 @@
+"""Caché de modelos ya compilados en /var/ghostlycat para arrancar más rápido.
+
+Cada entrada se identifica por el hash de los pesos de origen y las versiones del runtime (y
+el dispositivo), así que cambiar el modelo o actualizar torch/ONNX Runtime genera una entrada
+nueva en lugar de cargar una incompatible. Junto a cada archivo queda un .json con lo necesario
+para usarlo sin abrir los pesos originales (forma de entrada, stride).
+"""
+import hashlib
+import json
+import os
+import platform
+from pathlib import Path
+
+MODEL_CACHE_ENV = "GHOSTLYCAT_MODEL_CACHE"
+MODEL_CACHE_DIR = Path("/var/ghostlycat/model_cache")
+MODEL_CACHE_OFF = "off"
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as stream:
+        for chunk in iter(lambda: stream.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelCache:
+    """Directorio de modelos serializados, uno por combinación de pesos y runtime.
+
+    Con ``directory=None`` la caché está deshabilitada: ``lookup`` nunca encuentra nada y
+    ``store`` no escribe.
+    """
+
+    def __init__(self, directory: Path = MODEL_CACHE_DIR):
+        self.directory = Path(directory) if directory else None
+
+    @property
+    def enabled(self):
+        return self.directory is not None
+
+    @staticmethod
+    def key(weights: Path, *runtime):
+        """Clave corta a partir del hash de los pesos y las versiones (runtime, dispositivo)."""
+        digest = hashlib.sha256(file_sha256(weights).encode())
+        for part in (platform.machine(),) + runtime:
+            digest.update(str(part).encode())
+        return digest.hexdigest()[:16]
+
+    def path(self, name: str, key: str, suffix: str):
+        return self.directory / f"{name}-{key}{suffix}"
+
+    def lookup(self, name: str, key: str, suffix: str):
+        """(ruta del modelo, metadatos) si la entrada existe, si no None."""
+        if not self.enabled:
+            return None
+        path = self.path(name, key, suffix)
+        info_path = path.with_suffix(".json")
+        if not path.exists() or not info_path.exists():
+            return None
+        try:
+            return path, json.loads(info_path.read_text())
+        except (OSError, ValueError) as exc:
+            print(f"Entrada de la caché de modelos ilegible ({info_path}): {exc}")
+            return None
+
+    def lookup_all(self, pattern: str, key: str, suffix: str):
+        """[(ruta, metadatos)] de las entradas cuyo nombre coincide con ``pattern`` (glob)."""
+        if not self.enabled or not self.directory.exists():
+            return []
+        entries = []
+        for path in sorted(self.directory.glob(f"{pattern}-{key}{suffix}")):
+            entry = self.lookup(path.name[: -len(f"-{key}{suffix}")], key, suffix)
+            if entry is not None:
+                entries.append(entry)
+        return entries
+
+    def store(self, name: str, key: str, suffix: str, save, info: dict):
+        """Guarda con ``save(ruta)`` en un archivo temporal y lo reemplaza al terminar.
+
+        Los metadatos se escriben al final, así una entrada a medio escribir nunca se usa.
+        """
+        if not self.enabled:
+            return None
+        path = self.path(name, key, suffix)
+        tmp_path = path.with_name(path.name + ".tmp")
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            save(tmp_path)
+            tmp_path.replace(path)
+            info_tmp = path.with_suffix(".json.tmp")
+            info_tmp.write_text(json.dumps(info, indent=2))
+            info_tmp.replace(path.with_suffix(".json"))
+        except OSError as exc:
+            print(f"No se pudo guardar el modelo en la caché: {exc}")
+            return None
+        return path
+
+
+def model_cache_from_env():
+    """Caché configurada por entorno.
+
+    GHOSTLYCAT_MODEL_CACHE: directorio de la caché (/var/ghostlycat/model_cache) u "off".
+    """
+    directory = os.environ.get(MODEL_CACHE_ENV, str(MODEL_CACHE_DIR))
+    return ModelCache(None if directory == MODEL_CACHE_OFF else Path(directory))
@@ -0,0 +1,107 @@
+"""Compuerta de movimiento delante del detector.
+
+Con el cuarto vacío la escena no cambia durante horas y cada inferencia repite el mismo
+resultado. ``MotionGatedDetector`` compara una versión gris diminuta del frame contra la del
+último frame en que corrió el detector: si la fracción de pixeles que cambió es menor al umbral,
+regresa las detecciones anteriores sin llamar al modelo. Cada ``heartbeat`` segundos se fuerza
+una detección aunque no haya movimiento (cambios de luz lentos, caras muy quietas).
+"""
+import os
+import time
+
+import cv2
+
+from modules.detectors import DetectorBackend, Detections
+
+MOTION_GATE_ENV = "GHOSTLYCAT_MOTION_GATE"
+MOTION_HEARTBEAT_ENV = "GHOSTLYCAT_MOTION_HEARTBEAT"
+
+
+class MotionGate:
+    """Diferencia de frames sobre una imagen gris reducida a ``width`` pixeles de ancho."""
+
+    def __init__(self, width: int = 160, pixel_threshold: int = 25, min_changed: float = 0.002):
+        self.width = width
+        self.pixel_threshold = pixel_threshold  # Diferencia de intensidad que cuenta como cambio
+        self.min_changed = min_changed  # Fracción de pixeles cambiados que cuenta como movimiento
+        self.reference = None
+
+    def _small(self, frame):
+        height, width = frame.shape[:2]
+        size = (self.width, max(1, int(height * self.width / width)))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        # El desenfoque quita el ruido del sensor, que si no cuenta como movimiento
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def changed_fraction(self, frame):
+        """Fracción de pixeles que cambiaron respecto a la referencia (1.0 si no hay)."""
+        small = self._small(frame)
+        if self.reference is None or self.reference.shape != small.shape:
+            return 1.0, small
+        diff = cv2.absdiff(small, self.reference)
+        _, mask = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        return cv2.countNonZero(mask) / diff.size, small
+
+
+class MotionGatedDetector(DetectorBackend):
+    """Envuelve un DetectorBackend y se salta la inferencia mientras la escena no cambie."""
+
+    def __init__(self, backend: DetectorBackend, gate: MotionGate = None, heartbeat: float = 5.0):
+        super().__init__(backend.conf_threshold, backend.min_area)
+        self.backend = backend
+        self.gate = gate or MotionGate()
+        self.heartbeat = heartbeat
+        self.last_detections = None
+        self.last_detection_time = None
+        self.frames = 0
+        self.gated_frames = 0
+        self.heartbeats = 0
+
+    @property
+    def name(self):
+        return self.backend.name
+
+    def available(self):
+        return self.backend.available()
+
+    def load(self):
+        self.backend.load()
+
+    def _detect(self, frame) -> Detections:
+        self.frames += 1
+        now = time.monotonic()
+        changed, small = self.gate.changed_fraction(frame)
+        if self.last_detections is not None and changed < self.gate.min_changed:
+            if now - self.last_detection_time < self.heartbeat:
+                self.gated_frames += 1
+                return self.last_detections
+            self.heartbeats += 1
+
+        # La referencia es el frame de la última inferencia: así el movimiento lento se acumula
+        self.gate.reference = small
+        self.last_detections = self.backend.detect(frame)
+        self.last_detection_time = now
+        return self.last_detections
+
+    def stats(self):
+        return {
+            **self.backend.stats(),
+            "gated_frames": self.gated_frames,
+            "gated_fraction": round(self.gated_frames / self.frames, 3) if self.frames else 0.0,
+            "heartbeats": self.heartbeats,
+        }
+
+
+def motion_gate_from_env(backend: DetectorBackend) -> DetectorBackend:
+    """Envuelve el backend en un MotionGatedDetector si la configuración lo pide.
+
+    GHOSTLYCAT_MOTION_GATE: "1" para saltarse la inferencia con la escena quieta.
+    GHOSTLYCAT_MOTION_HEARTBEAT: segundos máximos sin correr el detector (5 por defecto).
+    """
+    if os.environ.get(MOTION_GATE_ENV, "0") != "1":
+        return backend
+    return MotionGatedDetector(
+        backend, heartbeat=float(os.environ.get(MOTION_HEARTBEAT_ENV, 5.0))
+    )
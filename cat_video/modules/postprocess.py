@@ -0,0 +1,111 @@
+"""Post-procesamiento vectorizado de las detecciones.
+
+Filtrar por confianza y área, llevar cajas y landmarks de la entrada del modelo al frame
+original y calcular centroides se hace con operaciones sobre el arreglo completo (N, ...) en
+lugar de un ciclo de Python por caja. Las funciones que modifican coordenadas trabajan en su
+lugar y aceptan arreglos de numpy o tensores de torch, para servir también a detect_face.py.
+"""
+import cv2
+import numpy as np
+
+
+def box_areas(boxes: np.ndarray) -> np.ndarray:
+    """Área de cada caja (N, 4) x1, y1, x2, y2."""
+    return (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+
+def keep_mask(boxes, confidences, conf_threshold: float, min_area: float) -> np.ndarray:
+    """Máscara de las cajas con confianza y área suficientes."""
+    return (confidences >= conf_threshold) & (box_areas(boxes) >= min_area)
+
+
+def box_centroids(boxes: np.ndarray) -> np.ndarray:
+    """Centroides enteros (N, 2) con el mismo redondeo que ``FaceDetection.from_box``."""
+    boxes = boxes.astype(np.int64)
+    return (boxes[:, :2] + boxes[:, 2:4]) // 2
+
+
+def clip_xy(coords, width: float, height: float):
+    """Limita en su lugar columnas alternadas x, y al frame."""
+    if hasattr(coords, "clamp_"):
+        coords[:, 0::2].clamp_(0, width)
+        coords[:, 1::2].clamp_(0, height)
+    else:
+        np.clip(coords[:, 0::2], 0, width, out=coords[:, 0::2])
+        np.clip(coords[:, 1::2], 0, height, out=coords[:, 1::2])
+    return coords
+
+
+def letterbox_ratio_pad(input_shape, frame_shape):
+    """Escala y relleno (x, y) del letterbox, como los calcula ``scale_coords`` de yolov5."""
+    gain = min(input_shape[0] / frame_shape[0], input_shape[1] / frame_shape[1])
+    pad = (
+        (input_shape[1] - frame_shape[1] * gain) / 2,
+        (input_shape[0] - frame_shape[0] * gain) / 2,
+    )
+    return (gain, gain), pad
+
+
+def scale_to_frame(input_shape, coords, frame_shape, ratio_pad=None):
+    """Lleva coordenadas de la entrada con letterbox del modelo al frame original.
+
+    ``coords`` tiene columnas x, y alternadas (cajas o landmarks) y se modifica en su lugar;
+    el resultado se limita a los bordes del frame.
+    """
+    if ratio_pad is None:
+        ratio_pad = letterbox_ratio_pad(input_shape, frame_shape)
+    gain = ratio_pad[0][0]
+    pad = ratio_pad[1]
+    coords[:, 0::2] -= pad[0]
+    coords[:, 1::2] -= pad[1]
+    coords /= gain
+    return clip_xy(coords, frame_shape[1], frame_shape[0])
+
+
+def scale_coords_landmarks(img1_shape, coords, img0_shape, ratio_pad=None):
+    """Landmarks (N, 10) de img1_shape a img0_shape; misma firma que en yolov5-face."""
+    scale_to_frame(img1_shape, coords[:, :10], img0_shape, ratio_pad)
+    return coords
+
+
+def normalized_boxes(boxes: np.ndarray, width: int, height: int) -> np.ndarray:
+    """Cajas en fracciones del frame (el formato de los encodings de FaceTrainer)."""
+    return boxes / np.array([width, height, width, height], np.float32)
+
+
+def non_max_suppression_face(prediction: np.ndarray, conf_thres: float = 0.25, iou_thres=0.45):
+    """NMS de YOLOv5-face en numpy, para los modelos que corren sin torch (ONNX).
+
+    ``prediction`` es la salida (N, 16) de una imagen: cx, cy, w, h, objectness, 10 landmarks y
+    la confianza de la clase. Regresa (M, 16): x1, y1, x2, y2, confianza, landmarks y clase,
+    igual que ``utils.general.non_max_suppression_face``.
+    """
+    candidates = prediction[prediction[:, 4] > conf_thres]
+    if not len(candidates):
+        return np.zeros((0, 16), np.float32)
+    class_scores = candidates[:, 15:] * candidates[:, 4:5]
+    classes = class_scores.argmax(axis=1)
+    scores = class_scores.max(axis=1)
+    keep = scores > conf_thres
+    candidates, classes, scores = candidates[keep], classes[keep], scores[keep]
+    if not len(candidates):
+        return np.zeros((0, 16), np.float32)
+
+    top_left = candidates[:, :2] - candidates[:, 2:4] / 2
+    indices = cv2.dnn.NMSBoxes(
+        np.concatenate([top_left, candidates[:, 2:4]], axis=1).astype(np.float64),
+        scores.astype(np.float64),
+        conf_thres,
+        iou_thres,
+    )
+    indices = np.asarray(indices, np.int64).reshape(-1)
+    return np.concatenate(
+        [
+            top_left,
+            top_left + candidates[:, 2:4],
+            scores[:, None],
+            candidates[:, 5:15],
+            classes[:, None].astype(np.float32),
+        ],
+        axis=1,
+    )[indices].astype(np.float32)
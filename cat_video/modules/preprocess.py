@@ -0,0 +1,171 @@
+"""Preprocesamiento de YOLOv5-face sin reservar memoria por frame.
+
+El camino original hacía por cada frame cvtColor, dos copias completas del frame, resize,
+letterbox (otra imagen nueva), transpose().copy() y una conversión a float en un tensor nuevo:
+varios MB por frame en una placa con poca memoria. ``LetterboxPreprocessor`` calcula la
+geometría del letterbox una vez por resolución y escribe el resize y la conversión a RGB
+directamente dentro de un buffer con el relleno ya puesto. El tensor de entrada se reserva
+una vez y se llena con una copia uint8 y una conversión a float en el mismo dispositivo.
+"""
+import collections
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+LETTERBOX_COLOR = 114  # Gris del relleno, igual que utils.datasets.letterbox
+
+
+@dataclass(frozen=True)
+class LetterboxGeometry:
+    width: int  # Tamaño de la entrada del modelo (múltiplo de stride)
+    height: int
+    resized_width: int  # Tamaño del frame ya escalado, sin relleno
+    resized_height: int
+    left: int  # Relleno a la izquierda y arriba
+    top: int
+
+    @classmethod
+    def for_shape(cls, frame_shape, img_size: int, stride: int = 32, input_shape=None):
+        """Misma geometría que el resize previo + ``letterbox(auto=True)`` de yolov5-face.
+
+        Con ``input_shape`` (alto, ancho) fijo, como el de un modelo exportado a ONNX, el frame
+        se escala para caber en él y el resto se rellena.
+        """
+        height, width = frame_shape[:2]
+        if input_shape is not None:
+            ratio = min(input_shape[0] / height, input_shape[1] / width)
+        else:
+            ratio = img_size / max(height, width)
+        resized_width = int(round(width * ratio))
+        resized_height = int(round(height * ratio))
+        if input_shape is not None:
+            pad_width = input_shape[1] - resized_width
+            pad_height = input_shape[0] - resized_height
+        else:
+            pad_width = (img_size - resized_width) % stride
+            pad_height = (img_size - resized_height) % stride
+        return cls(
+            width=resized_width + pad_width,
+            height=resized_height + pad_height,
+            resized_width=resized_width,
+            resized_height=resized_height,
+            left=int(round(pad_width / 2 - 0.1)),
+            top=int(round(pad_height / 2 - 0.1)),
+        )
+
+
+class _LetterboxBuffers:
+    """Buffers de una geometría: resize, letterbox, blob de numpy y tensores de torch."""
+
+    def __init__(self, geometry: LetterboxGeometry, torch=None, device=None):
+        self.resized = np.empty((geometry.resized_height, geometry.resized_width, 3), np.uint8)
+        self.padded = np.full((geometry.height, geometry.width, 3), LETTERBOX_COLOR, np.uint8)
+        self.blob = np.empty((1, 3, geometry.height, geometry.width), np.float32)
+        self.host_tensor = self.tensor = self.device_u8 = None
+        if torch is not None:
+            # El tensor uint8 comparte memoria con ``padded``: no hay copia en CPU
+            self.host_tensor = torch.from_numpy(self.padded)
+            self.tensor = torch.empty(
+                (1, 3, geometry.height, geometry.width), dtype=torch.float32, device=device
+            )
+            if self.tensor.device.type == "cpu":
+                self.device_u8 = self.host_tensor
+            else:
+                self.device_u8 = torch.empty_like(self.host_tensor, device=device)
+
+
+class LetterboxPreprocessor:
+    """Convierte frames BGR en la entrada (1, 3, H, W) float en [0, 1] del modelo.
+
+    Los buffers se reutilizan entre frames: el arreglo y el tensor regresados se sobrescriben
+    en la siguiente llamada. Se guardan por geometría del letterbox, no por forma del frame,
+    y se conservan los de las últimas ``max_geometries``: el frame completo y los recortes
+    del ROI (que con el mismo aspecto comparten geometría) se alternan sin volver a reservar.
+    """
+
+    def __init__(
+        self,
+        img_size: int = 640,
+        stride: int = 32,
+        torch=None,
+        device=None,
+        input_shape=None,
+        max_geometries: int = 4,
+    ):
+        self.img_size = img_size
+        self.stride = stride
+        self.input_shape = input_shape  # (alto, ancho) fijo del modelo, o None
+        self.torch = torch  # Opcional: sin torch solo se usa ``to_array``
+        self.device = device
+        self.max_geometries = max_geometries
+        self.buffers = collections.OrderedDict()  # LetterboxGeometry -> _LetterboxBuffers
+        self.frame_shape = None
+        self.geometry = None
+        self.resized = None
+        self.padded = None
+        self.blob = None
+        self.tensor = None
+        self.host_tensor = None
+        self.device_u8 = None
+
+    def _prepare(self, frame_shape):
+        if frame_shape == self.frame_shape:
+            return
+        self.frame_shape = frame_shape
+        geometry = self.geometry = LetterboxGeometry.for_shape(
+            frame_shape, self.img_size, self.stride, self.input_shape
+        )
+        buffers = self.buffers.get(geometry)
+        if buffers is None:
+            if len(self.buffers) >= self.max_geometries:
+                self.buffers.popitem(last=False)
+            buffers = self.buffers[geometry] = _LetterboxBuffers(geometry, self.torch, self.device)
+        else:
+            self.buffers.move_to_end(geometry)
+        self.resized = buffers.resized
+        self.padded = buffers.padded
+        self.blob = buffers.blob
+        self.tensor = buffers.tensor
+        self.host_tensor = buffers.host_tensor
+        self.device_u8 = buffers.device_u8
+
+    def to_array(self, frame) -> np.ndarray:
+        """Frame con letterbox en RGB, uint8 (H, W, 3)."""
+        self._prepare(frame.shape)
+        geometry = self.geometry
+        height, width = frame.shape[:2]
+        if (width, height) == (geometry.resized_width, geometry.resized_height):
+            resized = frame
+        else:
+            interpolation = cv2.INTER_AREA if width > geometry.resized_width else cv2.INTER_LINEAR
+            resized = cv2.resize(
+                frame,
+                (geometry.resized_width, geometry.resized_height),
+                dst=self.resized,
+                interpolation=interpolation,
+            )
+        top, left = geometry.top, geometry.left
+        # La conversión a RGB escribe directo en la zona sin relleno del buffer
+        cv2.cvtColor(
+            resized,
+            cv2.COLOR_BGR2RGB,
+            dst=self.padded[top:top + geometry.resized_height, left:left + geometry.resized_width],
+        )
+        return self.padded
+
+    def to_tensor(self, frame):
+        """Entrada del modelo (1, 3, H, W) float32 en [0, 1], en ``device``."""
+        self.to_array(frame)
+        if self.device_u8 is not self.host_tensor:
+            self.device_u8.copy_(self.host_tensor)
+        # HWC -> CHW y uint8 -> float en una sola copia, sin tensores intermedios
+        self.tensor[0].copy_(self.device_u8.permute(2, 0, 1))
+        self.tensor.mul_(1.0 / 255.0)
+        return self.tensor
+
+    def to_blob(self, frame) -> np.ndarray:
+        """Entrada (1, 3, H, W) float32 en [0, 1] en numpy, para ONNX Runtime u OpenCV DNN."""
+        padded = self.to_array(frame)
+        np.multiply(padded.transpose(2, 0, 1), 1.0 / 255.0, out=self.blob[0])
+        return self.blob
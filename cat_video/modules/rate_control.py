@@ -0,0 +1,208 @@
+"""Control adaptativo de la frecuencia de inferencia.
+
+En lugar de un intervalo fijo, ``RateController`` elige cuántos frames por segundo procesar:
+sube hasta ``max_rate`` mientras hay una cara a la vista, baja a ``idle_rate`` cuando no hay
+nadie y nunca pide más de lo que el detector puede sostener (tiempo medido por frame). Si el
+Jetson está caliente o la CPU saturada, la frecuencia se reduce a la mitad hasta que se
+recupera. La frecuencia elegida y el motivo quedan en las estadísticas y en
+/var/ghostlycat/metrics/inference_rate.json.
+"""
+import collections
+import glob
+import json
+import os
+import time
+from pathlib import Path
+
+RATE_MIN_ENV = "GHOSTLYCAT_RATE_MIN"
+RATE_MAX_ENV = "GHOSTLYCAT_RATE_MAX"
+RATE_IDLE_ENV = "GHOSTLYCAT_RATE_IDLE"
+RATE_HOT_TEMP_ENV = "GHOSTLYCAT_RATE_HOT_TEMP"
+RATE_METRICS_PATH = Path("/var/ghostlycat/metrics/inference_rate.json")
+THERMAL_ZONES = "/sys/class/thermal/thermal_zone*/temp"
+
+# Motivo de la frecuencia elegida
+REASON_TRACKING = "tracking"  # Hay una cara: max_rate
+REASON_IDLE = "idle"  # Nadie a la vista: idle_rate
+REASON_BUDGET = "budget"  # Limitada por el tiempo de procesamiento medido
+REASON_THERMAL = "thermal"  # Reducida por temperatura
+REASON_CPU = "cpu"  # Reducida por carga de CPU
+REASON_REPLAY = "replay"  # Fuente sin ritmo propio: sin límite
+
+
+class SystemLoad:
+    """Temperatura máxima de las zonas térmicas (°C) y carga de CPU por núcleo.
+
+    Se leen como mucho una vez cada ``interval`` segundos para que medir no cueste.
+    """
+
+    def __init__(self, interval: float = 1.0, zones: str = THERMAL_ZONES):
+        self.interval = interval
+        self.zone_paths = glob.glob(zones)
+        self.cpus = os.cpu_count() or 1
+        self.sample_time = None
+        self.temperature = None
+        self.cpu_load = None
+
+    def _read_temperature(self):
+        temperatures = []
+        for path in self.zone_paths:
+            try:
+                with open(path) as zone:
+                    temperatures.append(int(zone.read().strip()) / 1000.0)
+            except (OSError, ValueError):
+                continue
+        return max(temperatures) if temperatures else None
+
+    def sample(self, now: float):
+        """Actualiza las lecturas si toca; regresa True si hubo muestra nueva."""
+        if self.sample_time is not None and now - self.sample_time < self.interval:
+            return False
+        self.sample_time = now
+        self.temperature = self._read_temperature()
+        try:
+            self.cpu_load = os.getloadavg()[0] / self.cpus
+        except OSError:
+            self.cpu_load = None
+        return True
+
+
+class RateController:
+    """Elige la frecuencia de procesamiento dentro de [min_rate, max_rate] (frames/s)."""
+
+    def __init__(
+        self,
+        min_rate: float = 0.5,
+        max_rate: float = 30.0,
+        idle_rate: float = 2.0,
+        idle_after: float = 3.0,
+        max_busy: float = 0.8,
+        hot_temp: float = 75.0,
+        max_cpu_load: float = 0.9,
+        realtime: bool = True,
+        load: SystemLoad = None,
+        metrics_path: Path = RATE_METRICS_PATH,
+        metrics_interval: float = 10.0,
+    ):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.idle_rate = idle_rate
+        self.idle_after = idle_after  # Segundos sin caras antes de bajar a idle_rate
+        self.max_busy = max_busy  # Fracción del tiempo que puede ocupar el procesamiento
+        self.hot_temp = hot_temp
+        self.max_cpu_load = max_cpu_load
+        self.realtime = realtime
+        self.load = load or SystemLoad()
+        self.metrics_path = metrics_path
+        self.metrics_interval = metrics_interval
+        self.processing_time = None  # Promedio móvil exponencial, en segundos
+        self.last_face_time = None
+        self.last_start = None
+        self.throttle = 1.0  # Factor por temperatura o carga, se ajusta una vez por muestra
+        self.throttle_reason = None
+        self.rate = idle_rate if realtime else 0.0
+        self.reason = REASON_IDLE if realtime else REASON_REPLAY
+        self.reason_frames = collections.Counter()
+        self.last_metrics_time = time.monotonic()
+
+    @property
+    def interval(self):
+        return 1.0 / self.rate if self.rate > 0 else 0.0
+
+    def wait(self):
+        """Duerme hasta que toque procesar el siguiente frame."""
+        now = time.monotonic()
+        if self.last_start is not None:
+            remaining = self.last_start + self.interval - now
+            if remaining > 0:
+                time.sleep(remaining)
+                now += remaining
+        self.last_start = now
+
+    def update(self, processing_time: float, faces: bool):
+        """Registra cuánto tardó el frame y si había caras; recalcula la frecuencia."""
+        now = time.monotonic()
+        if self.processing_time is None:
+            self.processing_time = processing_time
+        else:
+            self.processing_time += 0.2 * (processing_time - self.processing_time)
+        if faces:
+            self.last_face_time = now
+
+        if self.realtime:
+            self._adjust_throttle(now)
+            self.rate, self.reason = self._choose(now)
+        self.reason_frames[self.reason] += 1
+
+        if now - self.last_metrics_time >= self.metrics_interval:
+            self.last_metrics_time = now
+            self.write_metrics()
+
+    def _adjust_throttle(self, now: float):
+        if not self.load.sample(now):
+            return
+        constrained = None
+        if self.load.temperature is not None and self.load.temperature >= self.hot_temp:
+            constrained = REASON_THERMAL
+        elif self.load.cpu_load is not None and self.load.cpu_load >= self.max_cpu_load:
+            constrained = REASON_CPU
+        if constrained:
+            self.throttle = max(self.throttle / 2, self.min_rate / self.max_rate)
+            self.throttle_reason = constrained
+        else:
+            # Se recupera poco a poco; el motivo se conserva mientras siga reducida
+            self.throttle = min(1.0, self.throttle * 1.25)
+
+    def _choose(self, now: float):
+        tracking = self.last_face_time is not None and now - self.last_face_time < self.idle_after
+        if tracking:
+            rate, reason = self.max_rate, REASON_TRACKING
+        else:
+            rate, reason = self.idle_rate, REASON_IDLE
+        if self.processing_time:
+            sustainable = self.max_busy / self.processing_time
+            if sustainable < rate:
+                rate, reason = sustainable, REASON_BUDGET
+        if self.throttle < 1.0 and self.max_rate * self.throttle < rate:
+            rate, reason = self.max_rate * self.throttle, self.throttle_reason
+        return min(max(rate, self.min_rate), self.max_rate), reason
+
+    def stats(self):
+        frames = sum(self.reason_frames.values())
+        processing_ms = self.processing_time * 1000 if self.processing_time else None
+        return {
+            "rate": round(self.rate, 2),
+            "reason": self.reason,
+            "processing_ms": round(processing_ms, 1) if processing_ms is not None else None,
+            "temperature": self.load.temperature,
+            "cpu_load": round(self.load.cpu_load, 2) if self.load.cpu_load is not None else None,
+            "reason_fraction": {
+                reason: round(count / frames, 3) for reason, count in self.reason_frames.items()
+            },
+        }
+
+    def write_metrics(self):
+        try:
+            self.metrics_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.metrics_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(self.stats(), indent=2))
+            tmp_path.replace(self.metrics_path)
+        except OSError as exc:
+            print(f"No se pudieron guardar las métricas de frecuencia: {exc}")
+
+
+def rate_controller_from_env(realtime: bool = True, idle_rate: float = 2.0):
+    """Controlador configurado por entorno.
+
+    GHOSTLYCAT_RATE_MIN / GHOSTLYCAT_RATE_MAX: límites en frames por segundo (0.5 y 30).
+    GHOSTLYCAT_RATE_IDLE: frecuencia sin caras a la vista (``idle_rate`` por defecto).
+    GHOSTLYCAT_RATE_HOT_TEMP: °C a partir de los que se reduce la frecuencia (75).
+    Con una fuente sin ritmo propio (``realtime=False``) se procesan todos los frames.
+    """
+    return RateController(
+        min_rate=float(os.environ.get(RATE_MIN_ENV, 0.5)),
+        max_rate=float(os.environ.get(RATE_MAX_ENV, 30.0)),
+        idle_rate=float(os.environ.get(RATE_IDLE_ENV, idle_rate)),
+        hot_temp=float(os.environ.get(RATE_HOT_TEMP_ENV, 75.0)),
+        realtime=realtime,
+    )
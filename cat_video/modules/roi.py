@@ -0,0 +1,146 @@
+"""Re-detección en una región de interés alrededor de las últimas caras.
+
+El detector reduce el frame completo a su tamaño de entrada (300x300 el SSD, 640 YOLO), así que
+las caras pequeñas o lejanas se pierden y la mayor parte del cómputo se va en el fondo. Después
+de una detección, ``RoiDetector`` corre el backend solo sobre un recorte ampliado alrededor de
+las cajas anteriores, a resolución nativa. El frame completo se revisa cada ``full_every``
+frames o en cuanto la región no encuentra ninguna cara.
+
+El recorte es cuadrado y su lado se redondea hacia arriba a un múltiplo de ``bucket``: así sus
+formas son pocas y, como todas tienen el mismo aspecto, el letterbox del backend las lleva a
+la misma entrada del modelo (mismos buffers, mismo modelo trazado) en lugar de una por frame.
+"""
+import os
+
+import numpy as np
+
+from modules.detectors import DetectorBackend, Detections
+
+ROI_EXPAND_ENV = "GHOSTLYCAT_ROI_EXPAND"
+ROI_FULL_EVERY_ENV = "GHOSTLYCAT_ROI_FULL_EVERY"
+
+
+class RoiDetector(DetectorBackend):
+    """Envuelve un DetectorBackend y limita la búsqueda a la región de las últimas caras."""
+
+    def __init__(
+        self,
+        backend: DetectorBackend,
+        expand: float = 2.5,
+        full_every: int = 10,
+        min_size: int = 320,
+        max_fraction: float = 0.6,
+        bucket: int = 64,
+    ):
+        super().__init__(backend.conf_threshold, backend.min_area)
+        self.backend = backend
+        self.expand = expand  # Tamaño del recorte respecto a la caja anterior
+        self.full_every = full_every
+        self.min_size = min_size  # Lado mínimo del recorte en pixeles, para dar contexto
+        self.max_fraction = max_fraction  # Si el recorte cubre más del frame, buscar en todo
+        self.bucket = bucket  # El lado del recorte se redondea a múltiplos de esto
+        self.last_boxes = None
+        self.frames_since_full = 0
+        self.full_frames = 0
+        self.roi_frames = 0
+        self.roi_losses = 0
+        self.roi_area = 0.0
+
+    @property
+    def name(self):
+        return self.backend.name
+
+    def available(self):
+        return self.backend.available()
+
+    def load(self):
+        self.backend.load()
+
+    def region(self, frame_shape):
+        """Recorte cuadrado (x1, y1, x2, y2) que contiene las últimas cajas ampliadas, o None."""
+        if self.last_boxes is None or not len(self.last_boxes):
+            return None
+        height, width = frame_shape[:2]
+        boxes = self.last_boxes
+        centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+        half_sizes = np.maximum((boxes[:, 2:] - boxes[:, :2]) * self.expand, self.min_size) / 2
+        low = (centers - half_sizes).min(axis=0)
+        high = (centers + half_sizes).max(axis=0)
+        side = -(-int(np.ceil((high - low).max())) // self.bucket) * self.bucket
+        # Si no cabe completo se recorta al frame; el aspecto cambia solo en ese caso
+        crop_width, crop_height = min(side, width), min(side, height)
+        if crop_width * crop_height > self.max_fraction * width * height:
+            return None
+        center_x, center_y = (low + high) / 2
+        x1 = int(min(max(center_x - crop_width / 2, 0), width - crop_width))
+        y1 = int(min(max(center_y - crop_height / 2, 0), height - crop_height))
+        return x1, y1, x1 + crop_width, y1 + crop_height
+
+    def warm_up(self, frame_shape, runs: int = 2):
+        """Calienta el backend con el frame completo y con un recorte cuadrado del ROI."""
+        self.backend.warm_up(frame_shape, runs)
+        side = min(self.min_size, *frame_shape[:2])
+        self.backend.warm_up((side, side, 3), runs)
+
+    def _detect_full(self, frame):
+        self.frames_since_full = 0
+        self.full_frames += 1
+        return self.backend.detect(frame)
+
+    def _detect(self, frame) -> Detections:
+        roi = None
+        if self.frames_since_full + 1 < self.full_every:
+            roi = self.region(frame.shape)
+
+        if roi is None:
+            detections = self._detect_full(frame)
+        else:
+            x1, y1, x2, y2 = roi
+            detections = self.backend.detect(frame[y1:y2, x1:x2])
+            self.frames_since_full += 1
+            self.roi_frames += 1
+            self.roi_area += (x2 - x1) * (y2 - y1) / (frame.shape[0] * frame.shape[1])
+            if len(detections):
+                detections = _offset(detections, x1, y1)
+            else:
+                # Se perdió la cara en la región: buscar en el frame completo de inmediato
+                self.roi_losses += 1
+                detections = self._detect_full(frame)
+
+        self.last_boxes = detections.boxes if len(detections) else None
+        return detections
+
+    def stats(self):
+        frames = self.full_frames + self.roi_frames
+        mean_area = float(self.roi_area) / self.roi_frames if self.roi_frames else 0.0
+        return {
+            **self.backend.stats(),
+            "full_frames": self.full_frames,
+            "roi_frames": self.roi_frames,
+            "roi_losses": self.roi_losses,
+            "roi_fraction": round(self.roi_frames / frames, 3) if frames else 0.0,
+            "mean_roi_area": round(mean_area, 3),
+        }
+
+
+def _offset(detections: Detections, x: int, y: int) -> Detections:
+    """Lleva las cajas (y landmarks) del recorte a coordenadas del frame completo."""
+    boxes = detections.boxes + np.array([x, y, x, y], detections.boxes.dtype)
+    landmarks = detections.landmarks
+    if landmarks is not None:
+        landmarks = landmarks + np.tile(np.array([x, y], landmarks.dtype), 5)
+    return Detections(boxes, detections.confidences, landmarks)
+
+
+def roi_from_env(backend: DetectorBackend) -> DetectorBackend:
+    """Envuelve el backend en un RoiDetector si la configuración lo pide.
+
+    GHOSTLYCAT_ROI_EXPAND: tamaño del recorte respecto a la caja (0 = desactivado).
+    GHOSTLYCAT_ROI_FULL_EVERY: cada cuántos frames se revisa el frame completo.
+    """
+    expand = float(os.environ.get(ROI_EXPAND_ENV, 0))
+    if expand <= 0:
+        return backend
+    return RoiDetector(
+        backend, expand=expand, full_every=int(os.environ.get(ROI_FULL_EVERY_ENV, 10))
+    )
@@ -0,0 +1,99 @@
+"""Arranque en frío: cargar el detector mientras la cámara inicializa y medir cuánto tarda.
+
+``BackgroundLoader`` carga el modelo (desde la caché de modelos si se puede) y corre las
+primeras inferencias en un hilo mientras el proceso principal abre la cámara. ``StartupTimer``
+registra cada etapa desde que arrancó el proceso hasta la primera inferencia y la primera cara
+detectada, las imprime y las guarda en /var/ghostlycat/metrics/startup.json.
+"""
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+
+from modules.detectors import DetectorBackend
+
+STARTUP_METRICS_PATH = Path("/var/ghostlycat/metrics/startup.json")
+
+
+class StartupTimer:
+    """Segundos desde ``start_time`` (time.monotonic) hasta cada etapa del arranque."""
+
+    def __init__(self, start_time: float = None, metrics_path: Path = STARTUP_METRICS_PATH):
+        self.start_time = time.monotonic() if start_time is None else start_time
+        self.metrics_path = metrics_path
+        self.stages = {}
+        self.info = {}
+
+    def mark(self, stage: str):
+        """Registra la etapa la primera vez que ocurre; regresa su tiempo."""
+        if stage not in self.stages:
+            self.stages[stage] = round(time.monotonic() - self.start_time, 3)
+        return self.stages[stage]
+
+    def frame_processed(self, faces: bool):
+        """Llamar después de cada inferencia; reporta la primera y la primera con caras."""
+        if "first_inference" not in self.stages:
+            print(f"Time to first inference: {self.mark('first_inference'):.2f} s")
+            self.write_metrics()
+        if faces and "first_detection" not in self.stages:
+            print(f"Time to first detection: {self.mark('first_detection'):.2f} s")
+            self.write_metrics()
+
+    def stats(self):
+        return {**self.info, **self.stages}
+
+    def write_metrics(self):
+        try:
+            self.metrics_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.metrics_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(self.stats(), indent=2))
+            tmp_path.replace(self.metrics_path)
+        except OSError as exc:
+            print(f"No se pudieron guardar las métricas de arranque: {exc}")
+
+
+class BackgroundLoader:
+    """Carga el detector en un hilo y corre detrás las primeras inferencias (``warm_up``).
+
+    Las dos tareas corren en el mismo hilo, en orden, mientras el llamador abre la cámara:
+    con ``frame_shape`` (la resolución configurada, que se conoce antes de abrirla) el
+    calentamiento se encola junto con la carga. ``result()`` espera a que terminen y regresa
+    el backend listo (o relanza el error).
+    """
+
+    def __init__(
+        self,
+        load: Callable[[], DetectorBackend],
+        timer: StartupTimer = None,
+        frame_shape=None,
+    ):
+        self.timer = timer or StartupTimer()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="detector-loader")
+        self.loading = self.executor.submit(self._load, load)
+        self.warming = None
+        if frame_shape is not None:
+            self.warm_up(frame_shape)
+
+    def _load(self, load):
+        backend = load()
+        self.timer.mark("model_loaded")
+        self.timer.info["detector"] = backend.name
+        self.timer.info.update(backend.stats())
+        return backend
+
+    def _warm_up(self, frame_shape):
+        backend = self.loading.result()
+        backend.warm_up(frame_shape)
+        self.timer.mark("warmed_up")
+
+    def warm_up(self, frame_shape):
+        """Encola inferencias sobre frames en negro de ``frame_shape`` (alto, ancho, 3)."""
+        self.warming = self.executor.submit(self._warm_up, frame_shape)
+
+    def result(self) -> DetectorBackend:
+        backend = self.loading.result()
+        if self.warming is not None:
+            self.warming.result()
+        self.executor.shutdown(wait=False)
+        return backend
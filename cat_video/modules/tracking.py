@@ -0,0 +1,201 @@
+"""Modo detectar-y-seguir: el detector corre cada N frames y entre ellos se siguen las cajas.
+
+Cada cara detectada se convierte en un track con id estable. En los frames intermedios las
+cajas se mueven con flujo óptico (Lucas-Kanade) sobre puntos de la cara en una imagen gris
+reducida, que cuesta una fracción de la inferencia. La detección completa corre cada
+``detect_every`` frames o antes si la calidad del seguimiento de algún track cae.
+"""
+import itertools
+import os
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+from modules.detectors import DetectorBackend, Detections, box_iou
+
+DETECT_EVERY_ENV = "GHOSTLYCAT_DETECT_EVERY"
+TRACKED_MAX_RATE = 30  # Mensajes por segundo cuando se publica a la velocidad de la cámara
+
+_LK_PARAMS = dict(
+    winSize=(15, 15),
+    maxLevel=2,
+    criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03),
+)
+
+
+def detect_every_from_env():
+    """GHOSTLYCAT_DETECT_EVERY: N > 1 activa el seguimiento entre detecciones."""
+    return max(1, int(os.environ.get(DETECT_EVERY_ENV, 1)))
+
+
+@dataclass
+class Track:
+    track_id: int
+    box: np.ndarray  # x1, y1, x2, y2 en pixeles del frame original
+    confidence: float  # Confianza del detector en la última detección
+    points: np.ndarray  # Puntos seguidos, en la imagen reducida, forma (N, 1, 2)
+    initial_points: int
+    quality: float = 1.0  # Fracción de los puntos iniciales que se siguen bien
+
+
+@dataclass
+class TrackedFrame:
+    detections: Detections
+    track_ids: list
+    detected: bool  # True si en este frame corrió el detector
+
+
+class DetectThenTrack:
+    """Envuelve un DetectorBackend y sigue sus caras entre detecciones."""
+
+    def __init__(
+        self,
+        backend: DetectorBackend,
+        detect_every: int = 5,
+        min_quality: float = 0.5,
+        match_iou: float = 0.3,
+        track_width: int = 640,
+        max_points: int = 40,
+        max_fb_error: float = 1.0,
+    ):
+        self.backend = backend
+        self.detect_every = detect_every
+        self.min_quality = min_quality
+        self.match_iou = match_iou
+        self.track_width = track_width
+        self.max_points = max_points
+        self.max_fb_error = max_fb_error
+        self.tracks = []
+        self.ids = itertools.count(1)
+        self.prev_gray = None
+        self.scale = 1.0
+        self.frames_since_detection = 0
+        self.detections_run = 0
+        self.tracked_frames = 0
+        self.forced_detections = 0
+
+    @property
+    def name(self):
+        return self.backend.name
+
+    @property
+    def enabled(self):
+        return self.detect_every > 1
+
+    def _gray(self, frame):
+        height, width = frame.shape[:2]
+        self.scale = min(1.0, self.track_width / width)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.scale < 1.0:
+            size = (int(width * self.scale), int(height * self.scale))
+            gray = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+        return gray
+
+    def _seed_points(self, gray, box):
+        x1, y1, x2, y2 = (box * self.scale).astype(int)
+        mask = np.zeros_like(gray)
+        mask[max(y1, 0):max(y2, 0), max(x1, 0):max(x2, 0)] = 255
+        points = cv2.goodFeaturesToTrack(
+            gray, self.max_points, qualityLevel=0.01, minDistance=3, mask=mask
+        )
+        return points if points is not None else np.zeros((0, 1, 2), np.float32)
+
+    def _update_track(self, track: Track, gray):
+        if len(track.points) < 3:
+            track.quality = 0.0
+            return
+        forward, status, _ = cv2.calcOpticalFlowPyrLK(
+            self.prev_gray, gray, track.points, None, **_LK_PARAMS
+        )
+        # Se regresan los puntos al frame anterior: si no caen donde empezaron, se perdieron
+        backward, back_status, _ = cv2.calcOpticalFlowPyrLK(
+            gray, self.prev_gray, forward, None, **_LK_PARAMS
+        )
+        fb_error = np.linalg.norm(track.points - backward, axis=2).ravel()
+        good = (status.ravel() == 1) & (back_status.ravel() == 1) & (fb_error < self.max_fb_error)
+        track.quality = good.sum() / max(track.initial_points, 1)
+        if good.sum() < 3:
+            track.quality = 0.0
+            return
+
+        old = track.points[good].reshape(-1, 2)
+        new = forward[good].reshape(-1, 2)
+        shift = np.median(new - old, axis=0) / self.scale
+        # Escala: cambio mediano de la distancia de los puntos a su centro
+        old_spread = np.linalg.norm(old - old.mean(axis=0), axis=1)
+        new_spread = np.linalg.norm(new - new.mean(axis=0), axis=1)
+        valid = old_spread > 1e-3
+        scale = float(np.median(new_spread[valid] / old_spread[valid])) if valid.any() else 1.0
+
+        center = (track.box[:2] + track.box[2:]) / 2 + shift
+        half_size = (track.box[2:] - track.box[:2]) / 2 * scale
+        track.box = np.concatenate([center - half_size, center + half_size]).astype(np.float32)
+        track.points = forward[good].reshape(-1, 1, 2)
+
+    def _associate(self, detections: Detections, gray):
+        """Conserva el id de los tracks que coinciden con una detección y descarta el resto."""
+        unmatched = list(self.tracks)
+        tracks = []
+        for box, confidence in zip(detections.boxes, detections.confidences):
+            track_id = None
+            if unmatched:
+                ious = box_iou(box, np.array([track.box for track in unmatched]))
+                best = int(np.argmax(ious))
+                if ious[best] >= self.match_iou:
+                    track_id = unmatched.pop(best).track_id
+            points = self._seed_points(gray, box)
+            tracks.append(
+                Track(
+                    track_id=track_id if track_id is not None else next(self.ids),
+                    box=np.asarray(box, np.float32),
+                    confidence=float(confidence),
+                    points=points,
+                    initial_points=len(points),
+                )
+            )
+        self.tracks = tracks
+
+    def _result(self, detected):
+        if not self.tracks:
+            return TrackedFrame(Detections.empty(), [], detected)
+        detections = Detections(
+            np.array([track.box for track in self.tracks], np.float32),
+            np.array([track.confidence for track in self.tracks], np.float32),
+        )
+        return TrackedFrame(detections, [track.track_id for track in self.tracks], detected)
+
+    def process(self, frame) -> TrackedFrame:
+        if not self.enabled:
+            self.detections_run += 1
+            return TrackedFrame(self.backend.detect(frame), [], detected=True)
+
+        gray = self._gray(frame)
+        due = self.frames_since_detection + 1 >= self.detect_every
+        if self.tracks and self.prev_gray is not None and not due:
+            for track in self.tracks:
+                self._update_track(track, gray)
+            if all(track.quality >= self.min_quality for track in self.tracks):
+                self.prev_gray = gray
+                self.frames_since_detection += 1
+                self.tracked_frames += 1
+                return self._result(detected=False)
+            self.forced_detections += 1
+
+        detections = self.backend.detect(frame)
+        self._associate(detections, gray)
+        self.prev_gray = gray
+        self.frames_since_detection = 0
+        self.detections_run += 1
+        return self._result(detected=True)
+
+    def stats(self):
+        frames = self.detections_run + self.tracked_frames
+        return {
+            "frames": frames,
+            "detections_run": self.detections_run,
+            "tracked_frames": self.tracked_frames,
+            "forced_detections": self.forced_detections,
+            "detection_fraction": round(self.detections_run / frames, 3) if frames else 0.0,
+            "active_tracks": len(self.tracks),
+        }
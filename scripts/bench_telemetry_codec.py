@@ -0,0 +1,53 @@
+"""Compara el throughput de codificación/decodificación de CatTelemetry: JSON vs binario.
+
+Uso:
+    python3 scripts/bench_telemetry_codec.py --iterations 200000
+"""
+import argparse
+import json
+import timeit
+
+from cat_common.mqtt_messages import CatTelemetry
+
+
+def json_encode(telemetry: CatTelemetry):
+    return telemetry.to_json_bytes()
+
+
+def json_decode(payload):
+    data = json.loads(payload.decode("utf-8"))
+    return CatTelemetry(centroid_x=data["centroid_x"], centroid_y=data["centroid_y"])
+
+
+def report(name, iterations, seconds):
+    rate = iterations / seconds
+    print(f"{name:<16} {rate:>12,.0f} msg/s  {seconds / iterations * 1e6:>8.3f} us/msg")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200000)
+    opt = parser.parse_args()
+
+    telemetry = CatTelemetry(centroid_x=960, centroid_y=540)
+    json_payload = json_encode(telemetry)
+    binary_payload = telemetry.to_bytes()
+    print(
+        f"Tamaño del payload: JSON={len(json_payload)} bytes, "
+        f"binario={len(binary_payload)} bytes"
+    )
+
+    cases = [
+        ("json encode", lambda: json_encode(telemetry)),
+        ("binary encode", telemetry.to_bytes),
+        ("json decode", lambda: json_decode(json_payload)),
+        ("binary decode", lambda: CatTelemetry.from_bytes(binary_payload)),
+        ("compat decode", lambda: CatTelemetry.from_bytes(json_payload)),
+    ]
+    for name, func in cases:
+        seconds = min(timeit.repeat(func, number=opt.iterations, repeat=3))
+        report(name, opt.iterations, seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Mide la latencia publicación-recepción de MQTT (broker local) y de la memoria compartida.
+
+El publicador corre en otro proceso y manda en cada payload su time.monotonic(), que en Linux
+es el mismo reloj para todos los procesos del host.
+
+Uso:
+    python3 scripts/bench_transport_latency.py --transport shm --count 2000 --rate 200
+    python3 scripts/bench_transport_latency.py --transport mqtt
+"""
+import argparse
+import multiprocessing
+import queue
+import struct
+import time
+
+from cat_common.mqtt_messages import MQTTClient
+from cat_common.shm_transport import SharedMemoryTransport
+
+BENCH_TOPIC = "cat/bench"
+_PAYLOAD = struct.Struct("<Id")
+
+
+def make_client(transport_kind, topics):
+    if transport_kind == "shm":
+        return MQTTClient(topics=topics, transport=SharedMemoryTransport(name="ghostlycat-bench"))
+    return MQTTClient(topics=topics)
+
+
+def publisher(transport_kind, count, rate):
+    client = make_client(transport_kind, topics=())
+    client.client_start()
+    time.sleep(1.0)  # Dar tiempo a que el suscriptor se conecte
+    for i in range(count):
+        client.publish(BENCH_TOPIC, _PAYLOAD.pack(i, time.monotonic()))
+        time.sleep(1.0 / rate)
+    time.sleep(0.5)
+    client.disconnect()
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--transport", choices=["mqtt", "shm"], default="shm")
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=200.0, help="mensajes por segundo")
+    opt = parser.parse_args()
+
+    client = make_client(opt.transport, topics=(BENCH_TOPIC,))
+    client.client_start()
+
+    process = multiprocessing.Process(
+        target=publisher, args=(opt.transport, opt.count, opt.rate)
+    )
+    process.start()
+
+    latencies = []
+    while len(latencies) < opt.count:
+        try:
+            _, payload = client.get_message(timeout=5.0)
+        except queue.Empty:
+            break
+        _, sent = _PAYLOAD.unpack(payload)
+        latencies.append((time.monotonic() - sent) * 1e6)
+
+    process.join()
+    client.disconnect()
+
+    if not latencies:
+        print("No se recibió ningún mensaje")
+        return
+    latencies.sort()
+    print(
+        f"{opt.transport}: recibidos {len(latencies)}/{opt.count}  "
+        f"p50={percentile(latencies, 0.50):.0f}us  p95={percentile(latencies, 0.95):.0f}us  "
+        f"p99={percentile(latencies, 0.99):.0f}us  max={latencies[-1]:.0f}us"
+    )
+
+
+if __name__ == "__main__":
+    main()